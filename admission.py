@@ -0,0 +1,168 @@
+import math
+import time
+from collections import OrderedDict
+from functools import partial
+from threading import Condition, Lock
+
+from graphql.backend.base import GraphQLBackend, GraphQLDocument
+
+from cost import operation_cost
+
+
+class Rejected(Exception):
+    """An operation turned away by admission control; the view answers it
+    with a 429 asking to retry after ``retry_after`` seconds.
+    """
+
+    def __init__(self, message, retry_after):
+        super(Rejected, self).__init__(message)
+        self.message = message
+        self.retry_after = max(int(math.ceil(retry_after)), 1)
+
+
+class TokenBucket(object):
+    """Holds up to ``capacity`` tokens, refilled at ``rate`` tokens per
+    second.
+    """
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, amount, now):
+        """Takes ``amount`` tokens (at most a full bucket). Returns 0 when it
+        could, otherwise the seconds until there are enough of them.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        amount = min(amount, self.capacity)
+
+        if amount <= self.tokens:
+            self.tokens -= amount
+            return 0
+
+        return (amount - self.tokens) / self.rate
+
+
+class RateLimiter(object):
+    """A token bucket per client: each operation takes as many tokens as it
+    costs, so a client may run ``rate`` units of cost per second, in bursts
+    of up to ``capacity``. Only the ``max_clients`` clients seen last are
+    remembered; a forgotten client starts again with a full bucket.
+    """
+
+    def __init__(self, rate, capacity, max_clients=10000, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_clients = max_clients
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = Lock()
+
+    def take(self, client, amount):
+        with self._lock:
+            now = self.clock()
+            bucket = self._buckets.get(client)
+
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.capacity, now)
+
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+
+            return bucket.take(amount, now)
+
+
+class ConcurrencyLimiter(object):
+    """Lets at most ``max_concurrent`` executions run at once. Up to
+    ``max_waiting`` more wait, at most ``timeout`` seconds, for one to
+    finish; any other is turned away at once.
+    """
+
+    def __init__(self, max_concurrent, max_waiting=0, timeout=1.0):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.running = 0
+        self.waiting = 0
+        self._condition = Condition()
+
+    def acquire(self):
+        with self._condition:
+            if self.running < self.max_concurrent:
+                self.running += 1
+                return True
+
+            if self.waiting >= self.max_waiting:
+                return False
+
+            self.waiting += 1
+
+            try:
+                if not self._condition.wait_for(lambda: self.running < self.max_concurrent, self.timeout):
+                    return False
+            finally:
+                self.waiting -= 1
+
+            self.running += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self.running -= 1
+            self._condition.notify()
+
+
+class AdmissionBackend(GraphQLBackend):
+    """Wraps ``backend`` so operations are admitted before they execute.
+
+    Each operation takes its cost (see ``operation_cost``, 1 when unknown)
+    from the bucket of the client returned by ``client()`` in ``limiter``,
+    then a slot of ``concurrency``. An operation short of tokens or of a
+    slot is ``Rejected`` without running any resolver.
+    """
+
+    def __init__(self, backend, limiter=None, concurrency=None, client=None, metrics=None):
+        self.backend = backend
+        self.limiter = limiter
+        self.concurrency = concurrency
+        self.client = client
+        self.metrics = metrics
+
+    def document_from_string(self, schema, request_string):
+        document = self.backend.document_from_string(schema, request_string)
+
+        return GraphQLDocument(
+            schema=document.schema,
+            document_string=document.document_string,
+            document_ast=document.document_ast,
+            execute=partial(self.execute, document),
+        )
+
+    def execute(self, document, *args, **kwargs):
+        if self.limiter is not None:
+            wait = self.limiter.take(self.client(), operation_cost.get() or 1)
+
+            if wait:
+                self.reject('rate_limited', 'Limite de requisições excedido', wait)
+
+        if self.concurrency is None:
+            return document.execute(*args, **kwargs)
+
+        if not self.concurrency.acquire():
+            self.reject('overloaded', 'Servidor sobrecarregado', self.concurrency.timeout)
+
+        try:
+            return document.execute(*args, **kwargs)
+        finally:
+            self.concurrency.release()
+
+    def reject(self, reason, message, wait):
+        if self.metrics is not None:
+            self.metrics.reject(reason)
+
+        raise Rejected(message, wait)
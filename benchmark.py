@@ -0,0 +1,429 @@
+"""In-process benchmarks of every query and mutation of the schema.
+
+Each run seeds a fresh SQLite database in a temporary directory, drives
+``/graphql`` through the Flask test client and saves, for every scenario,
+throughput, p50/p99 latency, SQL statements per request and the peak memory
+allocated by a request as JSON, so runs can be compared between commits::
+
+    $ python benchmark.py --scale 100k --output before.json
+    $ python benchmark.py --scale 100k --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+
+from sqlalchemy import event
+
+from main import Job, Post, User, create_app, db
+
+SCALES = {
+    '1k': 1000,
+    '100k': 100000,
+    '1m': 1000000,
+}
+
+# posts per user of the seeded dataset
+POSTS_PER_USER = 10
+SEED_CHUNK_SIZE = 10000
+# ids of the users DeleteUser removes, past any the other scenarios create
+DELETED_USERS_START = 10 ** 9
+# ids of the jobs jobStatus reads, past any the mutations enqueue
+JOBS_START = 10 ** 9
+
+Dataset = namedtuple('Dataset', 'posts users')
+
+# ``variables(dataset, i)`` gives the variables of the i-th request of the
+# scenario; ``setup(dataset, count)`` runs once, untimed, before it
+Scenario = namedtuple('Scenario', 'name query variables setup')
+Scenario.__new__.__defaults__ = (None, None)
+
+
+def parse_scale(value):
+    if value.lower() in SCALES:
+        return SCALES[value.lower()]
+
+    return int(value)
+
+
+def random_text(rng, length):
+    return ''.join(rng.choices(string.ascii_lowercase + ' ', k=length))
+
+
+def seed(posts, seed_value=0):
+    """Fills the (empty) database of the current app with ``posts`` posts
+    spread over ``posts / POSTS_PER_USER`` users; the same ``seed_value``
+    gives the same rows, with ids ``1..posts`` and ``1..users``.
+    """
+    rng = random.Random(seed_value)
+    users = max(posts // POSTS_PER_USER, 1)
+
+    db.create_all()
+
+    with db.engine.begin() as connection:
+        for start in range(0, users, SEED_CHUNK_SIZE):
+            connection.execute(User.__table__.insert(), [
+                {'uuid': uuid, 'username': 'user%d' % uuid, 'password': random_text(rng, 16)}
+                for uuid in range(start + 1, min(start + SEED_CHUNK_SIZE, users) + 1)
+            ])
+
+        for start in range(0, posts, SEED_CHUNK_SIZE):
+            connection.execute(Post.__table__.insert(), [
+                {
+                    'uuid': uuid,
+                    'title': random_text(rng, 32),
+                    'body': random_text(rng, 256),
+                    'author_id': rng.randint(1, users),
+                }
+                for uuid in range(start + 1, min(start + SEED_CHUNK_SIZE, posts) + 1)
+            ])
+
+    return Dataset(posts=posts, users=users)
+
+
+def add_users(dataset, count):
+    """Users without posts for DeleteUser to remove."""
+    with db.engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {'uuid': DELETED_USERS_START + i, 'username': 'deleted%d' % i, 'password': 'x'}
+            for i in range(count)
+        ])
+
+
+def add_jobs(dataset, count):
+    """Finished jobs for jobStatus to read."""
+    with db.engine.begin() as connection:
+        connection.execute(Job.__table__.insert(), [
+            {'uuid': JOBS_START + i, 'kind': 'import_posts', 'status': 'done', 'progress': 100, 'total': 100}
+            for i in range(count)
+        ])
+
+
+def post_id(dataset, i):
+    return i % dataset.posts + 1
+
+
+def user_id(dataset, i):
+    return i % dataset.users + 1
+
+
+SCENARIOS = [
+    Scenario('getAllPosts', '''
+        query {
+            getAllPosts { uuid title body authorId }
+        }
+    ''', lambda dataset, i: {}),
+    Scenario('getAllPosts.author', '''
+        query {
+            getAllPosts { uuid title author { uuid username } }
+        }
+    ''', lambda dataset, i: {}),
+    Scenario('getAllPosts.where', '''
+        query ($username: String, $prefix: String) {
+            getAllPosts (where: {authorUsername: $username, title: {startsWith: $prefix}}, orderBy: UUID_DESC) {
+                uuid title
+            }
+        }
+    ''', lambda dataset, i: {'username': 'user%d' % user_id(dataset, i), 'prefix': 'abcdefghij'[i % 10]}),
+    Scenario('getAllUsers', '''
+        query {
+            getAllUsers { uuid username }
+        }
+    ''', lambda dataset, i: {}),
+    Scenario('getAllUsers.where', '''
+        query ($prefix: String) {
+            getAllUsers (where: {username: {startsWith: $prefix}}, orderBy: USERNAME_DESC) { uuid username }
+        }
+    ''', lambda dataset, i: {'prefix': 'user%d' % (i % 10)}),
+    Scenario('getAllUsers.posts', '''
+        query {
+            getAllUsers { uuid username posts { uuid title } }
+        }
+    ''', lambda dataset, i: {}),
+    Scenario('getAllUsers.postCount', '''
+        query {
+            getAllUsers { uuid username postCount latestPost { uuid title } }
+        }
+    ''', lambda dataset, i: {}),
+    Scenario('getPost', '''
+        query ($postId: Int) {
+            getPost (postId: $postId) { uuid title body authorId }
+        }
+    ''', lambda dataset, i: {'postId': post_id(dataset, i * 7919)}),
+    Scenario('getPost.author.posts', '''
+        query ($postId: Int) {
+            getPost (postId: $postId) { title author { username posts { title } } }
+        }
+    ''', lambda dataset, i: {'postId': post_id(dataset, i * 7919)}),
+    Scenario('getUser', '''
+        query ($userId: Int) {
+            getUser (userId: $userId) { uuid username }
+        }
+    ''', lambda dataset, i: {'userId': user_id(dataset, i * 7919)}),
+    Scenario('getUser.posts.author', '''
+        query ($userId: Int) {
+            getUser (userId: $userId) { username posts { title author { username } } }
+        }
+    ''', lambda dataset, i: {'userId': user_id(dataset, i * 7919)}),
+    Scenario('posts', '''
+        query {
+            posts (first: 100) { edges { node { uuid title author { username } } } pageInfo { endCursor } }
+        }
+    ''', lambda dataset, i: {}),
+    Scenario('users', '''
+        query {
+            users (first: 100) { edges { node { uuid username posts { title } } } pageInfo { endCursor } }
+        }
+    ''', lambda dataset, i: {}),
+    Scenario('searchPosts', '''
+        query ($query: String!) {
+            searchPosts (query: $query, first: 20) { edges { rank snippet node { uuid title } } }
+        }
+    ''', lambda dataset, i: {'query': string.ascii_lowercase[i % 26] + string.ascii_lowercase[i * 7 % 26] + '*'}),
+    Scenario('jobStatus', '''
+        query ($id: Int!) {
+            jobStatus (id: $id) { status progress total message }
+        }
+    ''', lambda dataset, i: {'id': JOBS_START + i}, add_jobs),
+    Scenario('CreatePost', '''
+        mutation ($title: String!, $body: String!, $username: String!) {
+            CreatePost (title: $title, body: $body, username: $username) { ok post { uuid } }
+        }
+    ''', lambda dataset, i: {'title': 'title %d' % i, 'body': 'body', 'username': 'user%d' % user_id(dataset, i)}),
+    Scenario('UpdatePost', '''
+        mutation ($postId: Int, $title: String) {
+            UpdatePost (postId: $postId, title: $title) { ok post { title } }
+        }
+    ''', lambda dataset, i: {'postId': post_id(dataset, i), 'title': 'updated %d' % i}),
+    Scenario('DeletePost', '''
+        mutation ($postId: Int) {
+            DeletePost (postId: $postId) { ok }
+        }
+    ''', lambda dataset, i: {'postId': dataset.posts - i}),
+    Scenario('CreatePosts', '''
+        mutation ($posts: [PostInput!]!) {
+            CreatePosts (posts: $posts) { ok }
+        }
+    ''', lambda dataset, i: {'posts': [
+        {'title': 'bulk %d' % n, 'body': 'body', 'username': 'user%d' % user_id(dataset, n)}
+        for n in range(i * 100, (i + 1) * 100)
+    ]}),
+    Scenario('DeletePosts', '''
+        mutation ($postIds: [Int!]!) {
+            DeletePosts (postIds: $postIds) { ok }
+        }
+    ''', lambda dataset, i: {'postIds': list(range(dataset.posts // 2 + i * 100, dataset.posts // 2 + (i + 1) * 100))}),
+    Scenario('ImportPosts', '''
+        mutation ($posts: [PostInput!]!) {
+            ImportPosts (posts: $posts) { ok job { uuid } }
+        }
+    ''', lambda dataset, i: {'posts': [
+        {'title': 'imported %d' % n, 'body': 'body', 'username': 'user%d' % user_id(dataset, n)}
+        for n in range(i * 100, (i + 1) * 100)
+    ]}),
+    Scenario('CreateUser', '''
+        mutation ($username: String, $password: String) {
+            CreateUser (username: $username, password: $password) { ok user { uuid } }
+        }
+    ''', lambda dataset, i: {'username': 'created%d' % i, 'password': 'x'}),
+    Scenario('UpdateUser', '''
+        mutation ($userId: Int, $password: String) {
+            UpdateUser (userId: $userId, password: $password) { ok user { username } }
+        }
+    ''', lambda dataset, i: {'userId': user_id(dataset, i), 'password': 'updated %d' % i}),
+    Scenario('DeleteUser', '''
+        mutation ($userId: Int) {
+            DeleteUser (userId: $userId) { ok }
+        }
+    ''', lambda dataset, i: {'userId': DELETED_USERS_START + i}, add_users),
+    Scenario('CreateUsers', '''
+        mutation ($users: [UserInput!]!) {
+            CreateUsers (users: $users) { ok }
+        }
+    ''', lambda dataset, i: {'users': [
+        {'username': 'bulk%d' % n, 'password': 'x'} for n in range(i * 100, (i + 1) * 100)
+    ]}),
+    Scenario('ImportUsers', '''
+        mutation ($users: [UserInput!]!) {
+            ImportUsers (users: $users) { ok job { uuid } }
+        }
+    ''', lambda dataset, i: {'users': [
+        {'username': 'imported%d' % n, 'password': 'x'} for n in range(i * 100, (i + 1) * 100)
+    ]}),
+]
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+
+    return ordered[min(int(round(p / 100.0 * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+class StatementCounter(object):
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self.on_execute)
+
+    def on_execute(self, *args):
+        self.count += 1
+
+
+def run_scenario(client, counter, dataset, scenario, iterations, warmup):
+    def request(i):
+        response = client.post('/graphql', json={'query': scenario.query, 'variables': scenario.variables(dataset, i)})
+
+        return response.status_code != 200 or 'errors' in response.get_json()
+
+    if scenario.setup:
+        scenario.setup(dataset, warmup + iterations + 1)
+
+    for i in range(warmup):
+        request(i)
+
+    latencies = []
+    errors = 0
+    statements = counter.count
+    started = time.perf_counter()
+
+    for i in range(warmup, warmup + iterations):
+        start = time.perf_counter()
+        errors += request(i)
+        latencies.append(time.perf_counter() - start)
+
+    elapsed = time.perf_counter() - started
+    statements = counter.count - statements
+
+    # a request of its own: tracing allocations slows down the timed ones
+    tracemalloc.start()
+    request(warmup + iterations)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'iterations': iterations,
+        'errors': errors,
+        'throughput': iterations / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'sql_statements': statements / float(iterations),
+        'peak_memory_kib': peak / 1024.0,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(posts, iterations=50, warmup=5, profile='testing', only=None, seed_value=0):
+    """Seeds a temporary database with ``posts`` posts and benchmarks the
+    scenarios (all of them, or the names in ``only``) against it.
+    """
+    scenarios = [scenario for scenario in SCENARIOS if not only or scenario.name in only]
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(profile, SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(directory, 'benchmark.sqlite'))
+
+        with app.app_context():
+            started = time.perf_counter()
+            dataset = seed(posts, seed_value)
+            seed_time = time.perf_counter() - started
+
+            counter = StatementCounter(db.engine)
+            client = app.test_client()
+
+            results = {}
+
+            for scenario in scenarios:
+                results[scenario.name] = run_scenario(client, counter, dataset, scenario, iterations, warmup)
+
+            db.session.remove()
+            db.engine.dispose()
+
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'profile': profile,
+            'posts': dataset.posts,
+            'users': dataset.users,
+            'seed': seed_value,
+            'iterations': iterations,
+            'warmup': warmup,
+            'seed_seconds': seed_time,
+            # ru_maxrss is in KiB on Linux, bytes on macOS
+            'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current):
+    """Lines with the relative change of each metric from ``baseline``."""
+    lines = []
+
+    for name, metrics in current['results'].items():
+        before = baseline['results'].get(name)
+
+        if not before:
+            continue
+
+        changes = [
+            '%s %+.1f%%' % (metric, (value - before[metric]) / before[metric] * 100)
+            for metric, value in metrics.items()
+            if metric not in ('iterations', 'errors') and before.get(metric)
+        ]
+        lines.append('%-24s %s' % (name, '  '.join(changes)))
+
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=parse_scale, default='1k', help='posts to seed: 1k, 100k, 1m or a number')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--profile', default='testing', help='configuration profile of the app')
+    parser.add_argument('--scenario', action='append', dest='only', help='run only this scenario (repeatable)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='file to save the results to, as JSON')
+    parser.add_argument('--compare', help='results of a previous run to compare with')
+    args = parser.parse_args(argv)
+
+    report = run(args.scale, args.iterations, args.warmup, args.profile, args.only, args.seed)
+
+    for name, metrics in report['results'].items():
+        print('%-24s %9.1f req/s  p50 %7.2f ms  p99 %7.2f ms  %6.1f sql  %9.1f KiB  %d errors' % (
+            name, metrics['throughput'], metrics['p50_ms'], metrics['p99_ms'],
+            metrics['sql_statements'], metrics['peak_memory_kib'], metrics['errors']
+        ))
+
+    if args.compare:
+        with open(args.compare) as f:
+            print('\nChange from %s:' % args.compare)
+            print('\n'.join(compare(json.load(f), report)))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
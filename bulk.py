@@ -0,0 +1,21 @@
+from itertools import islice
+
+# SQLite builds before 3.32 accept at most 999 bound parameters per statement
+IN_CHUNK_SIZE = 500
+
+
+def chunked(items, size=IN_CHUNK_SIZE):
+    iterator = iter(items)
+    chunk = list(islice(iterator, size))
+
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def select_in(query, column, keys):
+    """Yields the rows of ``query`` whose ``column`` is in ``keys``, with one
+    ``IN`` query per chunk of keys.
+    """
+    for chunk in chunked(set(keys)):
+        yield from query.filter(column.in_(chunk))
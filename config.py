@@ -0,0 +1,171 @@
+import os
+
+from sqlalchemy.pool import QueuePool
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'data.sqlite'))
+    SQLALCHEMY_COMMIT_ON_TEARDOWN = True
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    MIGRATIONS_DIR = os.path.join(basedir, 'migrations')
+
+    # read-only copies of the database: query operations read from one of them,
+    # picked 'round_robin' or by 'least_connections', leaving out those more
+    # than MAX_LAG seconds behind as measured by LAG(primary, replica) (by
+    # default, for SQLite, from the modification times of the files)
+    SQLALCHEMY_REPLICAS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url]
+    SQLALCHEMY_REPLICA_STRATEGY = 'round_robin'
+    SQLALCHEMY_REPLICA_MAX_LAG = 5
+    SQLALCHEMY_REPLICA_LAG = None
+
+    # PRAGMAs run on every new SQLite connection
+    SQLITE_PRAGMAS = {}
+
+    GRAPHIQL = False
+
+    # upper bound of rows returned by the non-paginated list fields
+    GRAPHQL_LIST_LIMIT = 1000
+    GRAPHQL_PAGE_SIZE = 20
+    GRAPHQL_MAX_PAGE_SIZE = 100
+
+    # parsed and validated documents, and automatic persisted queries
+    GRAPHQL_DOCUMENT_CACHE_SIZE = 1000
+    GRAPHQL_PERSISTED_QUERIES_SIZE = 10000
+
+    # operations deeper or costlier than this are rejected before execution
+    GRAPHQL_MAX_DEPTH = 10
+    GRAPHQL_MAX_COST = 50000
+    GRAPHQL_FIELD_COSTS = {}
+    GRAPHQL_LIST_SIZES = {
+        'Query.getAllPosts': GRAPHQL_LIST_LIMIT,
+        'Query.getAllUsers': GRAPHQL_LIST_LIMIT,
+    }
+    GRAPHQL_DEFAULT_LIST_SIZE = 10
+
+    # responses holding a list of at least this many items are streamed, this
+    # many items at a time; None always encodes the whole response at once
+    GRAPHQL_STREAM_MIN_ITEMS = 500
+    GRAPHQL_STREAM_CHUNK_ITEMS = 200
+
+    # a POST may carry a list of operations, run in order in the same request
+    GRAPHQL_BATCH = True
+    GRAPHQL_MAX_BATCH_SIZE = 20
+    GRAPHQL_MAX_BATCH_COST = GRAPHQL_MAX_COST
+
+    # 'sync', 'threads' or 'gevent': how the root fields of a query are resolved
+    GRAPHQL_EXECUTOR = 'sync'
+    GRAPHQL_EXECUTOR_WORKERS = 4
+
+    # admission control: each client (told apart by CLIENT_HEADER, set by a
+    # trusted proxy, or else by address) may run RATE_LIMIT units of cost per
+    # second in bursts of RATE_LIMIT_BURST (None for no limit); at most
+    # MAX_CONCURRENT operations run at once, MAX_WAITING more wait up to
+    # QUEUE_TIMEOUT seconds for a slot; the others get a 429 with Retry-After
+    GRAPHQL_CLIENT_HEADER = None
+    GRAPHQL_RATE_LIMIT = 5000
+    GRAPHQL_RATE_LIMIT_BURST = 2 * GRAPHQL_MAX_COST
+    GRAPHQL_MAX_CONCURRENT = 16
+    GRAPHQL_MAX_WAITING = 64
+    GRAPHQL_QUEUE_TIMEOUT = 1.0
+
+    # seconds an operation may run, by operation name or else TIMEOUT (None
+    # for no limit); past it the SQL statement running is interrupted and
+    # the fields not yet resolved are null, with a DEADLINE_EXCEEDED error
+    GRAPHQL_TIMEOUT = 10
+    GRAPHQL_OPERATION_TIMEOUTS = {}
+
+    # results of query operations, invalidated by the writes to what they read
+    GRAPHQL_RESPONSE_CACHE = True
+    GRAPHQL_RESPONSE_CACHE_SIZE = 10000
+    GRAPHQL_RESPONSE_CACHE_TTL = 60
+
+    # GET queries get an ETag from the versions of the tables (bumped by
+    # triggers on every write) and this Cache-Control; a matching
+    # If-None-Match is answered 304 without executing the query
+    GRAPHQL_HTTP_CACHE = True
+    GRAPHQL_CACHE_CONTROL = 'no-cache'
+
+    # requests with this header get the timings of every resolver and the SQL
+    # statements of every field in extensions.tracing; None turns it off
+    GRAPHQL_TRACING_HEADER = 'X-GraphQL-Tracing'
+
+    # maximum number of items of a single CreatePosts/CreateUsers/DeletePosts
+    GRAPHQL_MAX_BULK_SIZE = 10000
+
+    # DeleteUser, ImportPosts and ImportUsers run as jobs (saved in the jobs
+    # table) on WORKERS background threads, or inline with 0; each commits
+    # every CHUNK_SIZE items, and a job left running for STALE_AFTER seconds
+    # without progress is taken over; ImportPosts/ImportUsers take at most
+    # MAX_IMPORT_SIZE items
+    GRAPHQL_JOB_WORKERS = 2
+    GRAPHQL_JOB_CHUNK_SIZE = 500
+    GRAPHQL_JOB_STALE_AFTER = 300
+    GRAPHQL_MAX_IMPORT_SIZE = 100000
+
+    # postCreated/postUpdated/postDeleted over Server-Sent Events at
+    # /graphql/subscriptions; a Broker shared by every node (None for an
+    # in-process one), the frames a slow client may fall behind before it is
+    # dropped, and the seconds between keepalive comments
+    GRAPHQL_SUBSCRIPTION_BROKER = None
+    GRAPHQL_SUBSCRIPTION_QUEUE_SIZE = 100
+    GRAPHQL_SUBSCRIPTION_KEEPALIVE = 15
+
+    # Prometheus metrics at /metrics; with a directory, the metrics of every
+    # worker process sharing it are aggregated (flushed at most every interval)
+    GRAPHQL_METRICS = True
+    GRAPHQL_METRICS_DIR = os.environ.get('GRAPHQL_METRICS_DIR')
+    GRAPHQL_METRICS_FLUSH_INTERVAL = 1.0
+
+    # distinct operation names labelling the metrics and tracing totals; later
+    # ones are labelled 'other'
+    GRAPHQL_METRICS_MAX_OPERATIONS = 100
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    SQLALCHEMY_TRACK_MODIFICATIONS = True
+    GRAPHIQL = True
+
+
+class ProductionConfig(Config):
+    # WAL lets readers go on while a writer commits; with synchronous=NORMAL
+    # a commit no longer waits for an fsync of the WAL file
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+    }
+
+    # keep connections (and their page cache) open instead of reconnecting on
+    # every checkout; enough of them for every worker thread plus a burst
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': QueuePool,
+        'pool_size': int(os.environ.get('DATABASE_POOL_SIZE', 10)),
+        'max_overflow': 10,
+        'pool_timeout': 10,
+        'connect_args': {'check_same_thread': False},
+    }
+
+    GRAPHQL_EXECUTOR = 'threads'
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+    GRAPHQL_RESPONSE_CACHE = False
+    GRAPHQL_RATE_LIMIT = None
+    # an in-memory database is only seen by the thread that opened it
+    GRAPHQL_JOB_WORKERS = 0
+
+
+configs = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
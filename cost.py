@@ -0,0 +1,231 @@
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from graphql import GraphQLError
+from graphql.backend.base import GraphQLBackend, GraphQLDocument
+from graphql.execution import ExecutionResult
+from graphql.execution.base import get_operation_root_type
+from graphql.execution.values import get_variable_values
+from graphql.language import ast
+from graphql.type import GraphQLList, GraphQLObjectType, get_named_type, get_nullable_type
+from graphql.utils.value_from_ast import value_from_ast
+
+Cost = namedtuple('Cost', 'cost depth')
+
+# ``[cost]`` left to the operations of the batch being executed, if any
+batch_budget = ContextVar('batch_budget', default=None)
+
+# the cost of the operation being executed, once analyzed
+operation_cost = ContextVar('operation_cost', default=None)
+
+
+@contextmanager
+def budget(max_cost):
+    """Lets the operations run inside it cost at most ``max_cost`` in total."""
+    token = batch_budget.set([max_cost] if max_cost is not None else None)
+
+    try:
+        yield
+    finally:
+        batch_budget.reset(token)
+
+
+def get_operation(document_ast, operation_name):
+    operations = [
+        definition for definition in document_ast.definitions
+        if isinstance(definition, ast.OperationDefinition)
+    ]
+
+    if operation_name is None:
+        return operations[0] if len(operations) == 1 else None
+
+    for operation in operations:
+        if operation.name and operation.name.value == operation_name:
+            return operation
+
+
+class CostAnalyzer(object):
+    """Estimates the depth and the cost of an operation from its AST.
+
+    A field costs its weight (``field_costs['Type.field']``, 1 for object
+    fields and 0 for scalars by default) plus the cost of its selections;
+    for list fields the cost of the selections is multiplied by the number
+    of items the field may return: its ``first`` argument when it has one
+    (between 0 and ``max_page_size``, like the page the resolver returns),
+    otherwise ``list_sizes['Type.field']`` or ``default_list_size``.
+    """
+
+    def __init__(self, max_depth=None, max_cost=None, field_costs=None, list_sizes=None,
+                 default_list_size=10, default_page_size=20, max_page_size=None):
+        self.max_depth = max_depth
+        self.max_cost = max_cost
+        self.field_costs = field_costs or {}
+        self.list_sizes = list_sizes or {}
+        self.default_list_size = default_list_size
+        self.default_page_size = default_page_size
+        self.max_page_size = max_page_size
+
+    def analyze(self, schema, document_ast, operation_name=None, variable_values=None):
+        operation = get_operation(document_ast, operation_name)
+
+        if operation is None:
+            return None
+
+        variables = get_variable_values(schema, operation.variable_definitions or [], variable_values)
+        fragments = {
+            definition.name.value: definition for definition in document_ast.definitions
+            if isinstance(definition, ast.FragmentDefinition)
+        }
+
+        root_type = get_operation_root_type(schema, operation)
+
+        return self.selection_set_cost(schema, root_type, operation.selection_set, fragments, variables, ())
+
+    def selection_set_cost(self, schema, parent_type, selection_set, fragments, variables, visited):
+        cost = depth = 0
+
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.Field):
+                selection_cost = self.field_cost(schema, parent_type, selection, fragments, variables, visited)
+            elif isinstance(selection, ast.InlineFragment):
+                fragment_type = parent_type
+                if selection.type_condition:
+                    fragment_type = schema.get_type(selection.type_condition.name.value)
+                selection_cost = self.selection_set_cost(
+                    schema, fragment_type, selection.selection_set, fragments, variables, visited
+                )
+            else:
+                name = selection.name.value
+                fragment = fragments.get(name)
+                if fragment is None or name in visited:
+                    continue
+                selection_cost = self.selection_set_cost(
+                    schema, schema.get_type(fragment.type_condition.name.value), fragment.selection_set,
+                    fragments, variables, visited + (name,)
+                )
+
+            cost += selection_cost.cost
+            depth = max(depth, selection_cost.depth)
+
+        return Cost(cost, depth)
+
+    def field_cost(self, schema, parent_type, field_ast, fragments, variables, visited):
+        name = field_ast.name.value
+
+        # introspection is answered from the schema and never reaches the database
+        if name.startswith('__') or not isinstance(parent_type, GraphQLObjectType):
+            return Cost(0, 0)
+
+        field = parent_type.fields.get(name)
+
+        if field is None:
+            return Cost(0, 0)
+
+        key = '%s.%s' % (parent_type.name, name)
+        field_type = get_named_type(field.type)
+
+        if not field_ast.selection_set:
+            return Cost(self.field_costs.get(key, 0), 1)
+
+        children = self.selection_set_cost(schema, field_type, field_ast.selection_set, fragments, variables, visited)
+        multiplier = self.list_size(key, parent_type, field, field_ast, variables)
+
+        return Cost(self.field_costs.get(key, 1) + multiplier * children.cost, children.depth + 1)
+
+    def list_size(self, key, parent_type, field, field_ast, variables):
+        # the edges of a connection are already counted by its ``first``
+        if field_ast.name.value == 'edges' and 'pageInfo' in parent_type.fields:
+            return 1
+
+        if 'first' in field.args:
+            for argument in field_ast.arguments or []:
+                if argument.name.value == 'first':
+                    first = value_from_ast(argument.value, field.args['first'].type, variables)
+                    if first is not None:
+                        # as the resolver clamps it (see pagination.page_size)
+                        first = max(first, 0)
+                        return first if self.max_page_size is None else min(first, self.max_page_size)
+
+            return self.default_page_size
+
+        if isinstance(get_nullable_type(field.type), GraphQLList):
+            return self.list_sizes.get(key, self.default_list_size)
+
+        return 1
+
+    def check(self, cost):
+        if self.max_depth is not None and cost.depth > self.max_depth:
+            return 'A consulta excede a profundidade máxima de %d (profundidade %d)' % (self.max_depth, cost.depth)
+
+        if self.max_cost is not None and cost.cost > self.max_cost:
+            return 'A consulta excede o custo máximo de %d (custo %d)' % (self.max_cost, cost.cost)
+
+
+class CostAnalysisBackend(GraphQLBackend):
+    """Wraps ``backend`` so every operation is analyzed before it executes.
+
+    Operations over the analyzer's budgets are rejected without running any
+    resolver; the others report their cost in ``extensions.cost``. Inside
+    ``budget()``, e.g. for the operations of a batch, each operation also
+    spends its cost from the budget, and is rejected once it runs out.
+    """
+
+    def __init__(self, backend, analyzer):
+        self.backend = backend
+        self.analyzer = analyzer
+
+    def document_from_string(self, schema, request_string):
+        document = self.backend.document_from_string(schema, request_string)
+
+        return GraphQLDocument(
+            schema=document.schema,
+            document_string=document.document_string,
+            document_ast=document.document_ast,
+            execute=partial(self.execute, document),
+        )
+
+    def execute(self, document, *args, **kwargs):
+        try:
+            cost = self.analyzer.analyze(
+                document.schema, document.document_ast,
+                kwargs.get('operation_name'), kwargs.get('variable_values')
+            )
+        except GraphQLError:
+            # bad variables are reported by the execution itself
+            cost = None
+
+        if cost is not None:
+            error = self.analyzer.check(cost) or self.spend(cost)
+
+            if error:
+                return ExecutionResult(errors=[GraphQLError(error)], invalid=True)
+
+        token = operation_cost.set(cost.cost if cost is not None else None)
+
+        try:
+            result = document.execute(*args, **kwargs)
+        finally:
+            operation_cost.reset(token)
+
+        if cost is not None and not result.invalid:
+            result.extensions['cost'] = {
+                'requestedQueryCost': cost.cost,
+                'maximumAvailable': self.analyzer.max_cost,
+                'depth': cost.depth,
+            }
+
+        return result
+
+    @staticmethod
+    def spend(cost):
+        remaining = batch_budget.get()
+
+        if remaining is None:
+            return None
+
+        if cost.cost > remaining[0]:
+            return 'O lote excede o custo máximo restante de %d (custo %d)' % (remaining[0], cost.cost)
+
+        remaining[0] -= cost.cost
@@ -0,0 +1,52 @@
+from types import MethodType
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import Delete, Insert, Update
+
+
+def set_sqlite_pragmas(engine, pragmas):
+    """Runs ``PRAGMA name = value`` for each of ``pragmas`` on every new
+    connection of ``engine``, before the pool hands it out.
+    """
+    if not pragmas or engine.dialect.name != 'sqlite':
+        return
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+
+        for name, value in pragmas.items():
+            cursor.execute('PRAGMA %s = %s' % (name, value))
+
+        cursor.close()
+
+    event.listen(engine, 'connect', on_connect)
+
+
+def returning_supported(dialect):
+    """Tells whether ``INSERT``, ``UPDATE`` and ``DELETE`` statements can
+    take a ``RETURNING`` clause on ``dialect``: SQLite runs it since 3.35.
+    """
+    if dialect.name == 'sqlite':
+        return dialect.dbapi.sqlite_version_info >= (3, 35)
+
+    return bool(dialect.full_returning)
+
+
+def sqlite_returning_clause(compiler, stmt, returning_cols):
+    columns = select(*returning_cols).selected_columns
+
+    return 'RETURNING ' + ', '.join(compiler.preparer.format_column(column) for column in columns)
+
+
+@compiles(Insert, 'sqlite')
+@compiles(Update, 'sqlite')
+@compiles(Delete, 'sqlite')
+def visit_sqlite_dml(element, compiler, **kw):
+    """Renders the ``RETURNING`` clause the SQLite dialect of SQLAlchemy 1.4
+    does not know about; statements without one compile as usual.
+    """
+    if element._returning and returning_supported(compiler.dialect):
+        compiler.returning_clause = MethodType(sqlite_returning_clause, compiler)
+
+    return getattr(compiler, 'visit_%s' % element.__visit_name__)(element, **kw)
@@ -0,0 +1,146 @@
+import time
+from contextvars import ContextVar
+from functools import partial
+
+from graphql import GraphQLError
+from graphql.backend.base import GraphQLBackend, GraphQLDocument
+from graphql.execution.middleware import MiddlewareManager
+from promise import Promise, is_thenable
+from sqlalchemy import event
+
+from cost import get_operation
+
+clock = time.monotonic
+
+# clock() by which the operation being executed must be done, if any
+current_deadline = ContextVar('current_deadline', default=None)
+
+TIMEOUT_CODE = 'DEADLINE_EXCEEDED'
+
+
+def deadline_passed():
+    deadline = current_deadline.get()
+
+    return deadline is not None and clock() >= deadline
+
+
+class DeadlineExceeded(GraphQLError):
+
+    def __init__(self, timeout):
+        super(DeadlineExceeded, self).__init__(
+            'Tempo limite da operação excedido', extensions={'code': TIMEOUT_CODE, 'timeout': timeout}
+        )
+
+
+def interrupt_on_deadline(engine, instructions=1000):
+    """Makes SQLite check, every ``instructions`` virtual machine
+    instructions, whether the deadline of the operation running the
+    statement passed, and interrupt the statement if so.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    def on_connect(dbapi_connection, connection_record):
+        dbapi_connection.set_progress_handler(deadline_passed, instructions)
+
+    event.listen(engine, 'connect', on_connect)
+
+
+class DeadlineMiddleware(object):
+    """Fails the fields resolved once the deadline passed, and the fields
+    whose resolver (or the promise it returned) failed because of it, e.g.
+    on a SQL statement SQLite interrupted.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+
+    def resolve(self, next, root, info, **args):
+        if deadline_passed():
+            raise DeadlineExceeded(self.timeout)
+
+        try:
+            result = next(root, info, **args)
+        except Exception as error:
+            raise self.timed_out(error)
+
+        if is_thenable(result):
+            return Promise.resolve(result).catch(self.reject)
+
+        return result
+
+    def timed_out(self, error):
+        return DeadlineExceeded(self.timeout) if deadline_passed() else error
+
+    def reject(self, error):
+        raise self.timed_out(error)
+
+
+def with_middleware(middleware, extra):
+    if isinstance(middleware, MiddlewareManager):
+        middleware = middleware.middlewares
+
+    return list(middleware or []) + [extra]
+
+
+def is_timeout(error):
+    return isinstance(getattr(error, 'original_error', error), DeadlineExceeded)
+
+
+class DeadlineBackend(GraphQLBackend):
+    """Wraps ``backend`` so each operation runs for at most
+    ``timeouts[<operation name>]`` seconds, or ``timeout`` for the others
+    (None for no limit).
+
+    Past it, the remaining fields resolve to null and the result holds the
+    data resolved so far, plus a single ``DEADLINE_EXCEEDED`` error counting
+    the fields that timed out. ``on_timeout()`` runs after such operations,
+    e.g. to roll back a transaction SQLite interrupted.
+    """
+
+    def __init__(self, backend, timeout=None, timeouts=None, metrics=None, on_timeout=None):
+        self.backend = backend
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.metrics = metrics
+        self.on_timeout = on_timeout
+
+    def document_from_string(self, schema, request_string):
+        document = self.backend.document_from_string(schema, request_string)
+
+        return GraphQLDocument(
+            schema=document.schema,
+            document_string=document.document_string,
+            document_ast=document.document_ast,
+            execute=partial(self.execute, document),
+        )
+
+    def execute(self, document, *args, **kwargs):
+        operation = get_operation(document.document_ast, kwargs.get('operation_name'))
+        name = operation.name.value if operation and operation.name else 'anonymous'
+        timeout = self.timeouts.get(name, self.timeout)
+
+        if timeout is None:
+            return document.execute(*args, **kwargs)
+
+        kwargs['middleware'] = with_middleware(kwargs.get('middleware'), DeadlineMiddleware(timeout))
+        token = current_deadline.set(clock() + timeout)
+
+        try:
+            result = document.execute(*args, **kwargs)
+        finally:
+            current_deadline.reset(token)
+
+        timeouts = [error for error in result.errors or [] if is_timeout(error)]
+
+        if timeouts:
+            timeouts[0].extensions['fields'] = len(timeouts)
+            result.errors = [error for error in result.errors if not is_timeout(error)] + timeouts[:1]
+
+            if self.metrics is not None:
+                self.metrics.time_out(name)
+
+            if self.on_timeout is not None:
+                self.on_timeout()
+
+        return result
@@ -0,0 +1,122 @@
+from collections import OrderedDict, namedtuple
+from hashlib import sha256
+from threading import Lock
+
+from graphql import GraphQLCoreBackend
+from graphql.backend.base import GraphQLBackend
+from graphql.execution import ExecutionResult
+from graphql.validation import validate
+
+from tracing import phase
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+
+def query_hash(query):
+    return sha256(query.encode('utf8')).hexdigest()
+
+
+class LRUCache(object):
+    """A thread-safe mapping that keeps at most ``maxsize`` entries, evicting
+    the least recently used one, and counts its hits and misses.
+    """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+
+class CachedDocumentBackend(GraphQLBackend):
+    """Parses and validates each distinct query string once and keeps the
+    resulting document in an LRU cache keyed by the sha256 of the query.
+
+    Documents that fail validation are cached as well, so a client repeating
+    a broken query does not pay for the validation again either.
+    """
+
+    def __init__(self, backend=None, maxsize=1000):
+        self.backend = backend or GraphQLCoreBackend()
+        self.cache = LRUCache(maxsize)
+
+    def document_from_string(self, schema, request_string):
+        key = (schema, query_hash(request_string))
+        document = self.cache.get(key)
+
+        if document is None:
+            with phase('parsing'):
+                document = self.backend.document_from_string(schema, request_string)
+
+            with phase('validation'):
+                self.validate(document)
+
+            self.cache.set(key, document)
+
+        return document
+
+    @staticmethod
+    def validate(document):
+        errors = validate(document.schema, document.document_ast)
+        execute = document.execute
+
+        if errors:
+            document.execute = lambda *args, **kwargs: ExecutionResult(errors=errors, invalid=True)
+        else:
+            document.execute = lambda *args, **kwargs: execute(*args, validate=False, **kwargs)
+
+    def cache_info(self):
+        return self.cache.cache_info()
+
+
+class PersistedQueries(object):
+    """Automatic Persisted Queries: maps the sha256 of a query to its text.
+
+    Clients send only ``extensions.persistedQuery.sha256Hash``; when the hash
+    is unknown they retry once with the full query, which registers it.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.cache = LRUCache(maxsize)
+
+    def lookup(self, sha256_hash):
+        return self.cache.get(sha256_hash)
+
+    def register(self, sha256_hash, query):
+        if query_hash(query) != sha256_hash:
+            return False
+
+        self.cache.set(sha256_hash, query)
+
+        return True
+
+    def cache_info(self):
+        return self.cache.cache_info()
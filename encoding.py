@@ -0,0 +1,105 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# a response is streamed when it holds a list of at least this many items,
+# encoded this many at a time
+STREAM_MIN_ITEMS = 500
+STREAM_CHUNK_ITEMS = 200
+
+# pieces are buffered up to this many bytes before being sent
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def dumps(value):
+    """Encodes ``value`` as compact JSON bytes, with orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(value)
+
+    return json.dumps(value, separators=(',', ':')).encode('utf8')
+
+
+def encode(data, pretty=False):
+    """The ``encode`` of the GraphQL view: fast unless pretty printing."""
+    if pretty:
+        return json.dumps(data, indent=2, separators=(',', ': '))
+
+    return dumps(data)
+
+
+def has_large_list(value, min_items=STREAM_MIN_ITEMS):
+    """Tells whether following the objects of ``value`` reaches a list of
+    at least ``min_items`` items; lists themselves are not looked into.
+    """
+    if isinstance(value, list):
+        return len(value) >= min_items
+
+    if isinstance(value, dict):
+        return any(has_large_list(item, min_items) for item in value.values())
+
+    return False
+
+
+def iter_pieces(value, min_items, chunk_items):
+    if isinstance(value, list) and len(value) >= min_items:
+        yield b'['
+
+        for start in range(0, len(value), chunk_items):
+            if start:
+                yield b','
+            # the items of the chunk, without the brackets of the list
+            yield dumps(value[start:start + chunk_items])[1:-1]
+
+        yield b']'
+
+    elif isinstance(value, dict) and has_large_list(value, min_items):
+        yield b'{'
+
+        for i, (key, item) in enumerate(value.items()):
+            yield (b',' if i else b'') + dumps(key) + b':'
+            yield from iter_pieces(item, min_items, chunk_items)
+
+        yield b'}'
+
+    else:
+        yield dumps(value)
+
+
+def iter_batch_pieces(values, min_items, chunk_items):
+    yield b'['
+
+    for i, value in enumerate(values):
+        if i:
+            yield b','
+        yield from iter_pieces(value, min_items, chunk_items)
+
+    yield b']'
+
+
+def iter_encode(value, min_items=STREAM_MIN_ITEMS, chunk_items=STREAM_CHUNK_ITEMS, buffer_size=STREAM_BUFFER_SIZE,
+                batch=False):
+    """Yields ``value`` as JSON in pieces of about ``buffer_size`` bytes.
+
+    Lists of at least ``min_items`` items are encoded ``chunk_items`` at a
+    time, so the whole document never exists as a single string. With
+    ``batch``, ``value`` is the list of the results of a batch, each of
+    them streamed that way.
+    """
+    buffer = []
+    size = 0
+    pieces = iter_batch_pieces if batch else iter_pieces
+
+    for piece in pieces(value, min_items, chunk_items):
+        buffer.append(piece)
+        size += len(piece)
+
+        if size >= buffer_size:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+
+    if buffer:
+        yield b''.join(buffer)
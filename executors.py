@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from contextvars import copy_context
+
+from graphql.execution.base import ResolveInfo
+from graphql.execution.executors.utils import process
+from promise import Promise
+
+try:
+    import gevent
+except ImportError:
+    gevent = None
+
+
+def is_concurrent_field(args):
+    """Root fields of a query selecting more than one field are independent
+    of each other; mutation fields must keep running one after another.
+    """
+    info = args[1] if len(args) > 1 else None
+
+    return (
+        isinstance(info, ResolveInfo)
+        and len(info.path) == 1
+        and info.operation.operation == 'query'
+        and len(info.operation.selection_set.selections) > 1
+    )
+
+
+class RootFieldExecutor(object):
+    """Resolves the root fields of a query concurrently and every other
+    field inline, like the default synchronous executor.
+
+    Each concurrent field runs inside ``scope()``, e.g. an application
+    context, so it gets its own scoped database session, and sees the
+    context variables of the request that spawned it.
+    """
+
+    def __init__(self, scope=None):
+        self.scope = scope or nullcontext
+        self.jobs = []
+
+    def execute(self, fn, *args, **kwargs):
+        if not is_concurrent_field(args):
+            return fn(*args, **kwargs)
+
+        promise = Promise()
+        self.jobs.append(self.spawn(copy_context().run, self.run, promise, fn, args, kwargs))
+
+        return promise
+
+    def run(self, promise, fn, args, kwargs):
+        with self.scope():
+            process(promise, fn, args, kwargs)
+
+    def wait_until_finished(self):
+        while self.jobs:
+            jobs, self.jobs = self.jobs, []
+            self.join(jobs)
+
+    def clean(self):
+        self.jobs = []
+
+    def spawn(self, fn, *args):
+        raise NotImplementedError
+
+    def join(self, jobs):
+        raise NotImplementedError
+
+
+class ThreadPoolRootExecutor(RootFieldExecutor):
+
+    def __init__(self, pool, scope=None):
+        super(ThreadPoolRootExecutor, self).__init__(scope)
+        self.pool = pool
+
+    def spawn(self, fn, *args):
+        return self.pool.submit(fn, *args)
+
+    def join(self, jobs):
+        wait(jobs)
+
+
+class GeventRootExecutor(RootFieldExecutor):
+    """Runs root fields in greenlets; only useful with a monkey-patched
+    server (e.g. gunicorn's gevent worker), where database calls yield.
+    """
+
+    def spawn(self, fn, *args):
+        return gevent.spawn(fn, *args)
+
+    def join(self, jobs):
+        gevent.joinall(jobs)
+
+
+def executor_factory(kind, workers=4, scope=None):
+    """Returns a callable that builds a fresh executor for each request, or
+    None for the default synchronous executor.
+    """
+    if kind == 'sync':
+        return None
+
+    if kind == 'threads':
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='graphql')
+        return lambda: ThreadPoolRootExecutor(pool, scope)
+
+    if kind == 'gevent':
+        # fails when the app is created rather than on its first query
+        if gevent is None:
+            raise ValueError("The 'gevent' executor needs gevent installed")
+
+        return lambda: GeventRootExecutor(scope)
+
+    raise ValueError('Unknown executor %r' % kind)
@@ -0,0 +1,89 @@
+import operator
+import sys
+
+import graphene
+from sqlalchemy import inspect
+
+# every predicate below compiles to a comparison an index can seek to; there
+# is no "contains" or "ends with", which would read the whole table
+
+
+class IntFilter(graphene.InputObjectType):
+    eq = graphene.Int()
+    gt = graphene.Int()
+    gte = graphene.Int()
+    lt = graphene.Int()
+    lte = graphene.Int()
+
+
+class StringFilter(graphene.InputObjectType):
+    eq = graphene.String()
+    starts_with = graphene.String()
+
+
+def prefix_range(column, prefix):
+    """``column`` starting with ``prefix``, as the range ``prefix <= column
+    < <prefix with its last character incremented>``: unlike ``LIKE``, which
+    SQLite only runs on an index for case sensitive matches, a range seeks
+    on the plain index of ``column``.
+    """
+    if not prefix:
+        return []
+
+    last = ord(prefix[-1])
+
+    if last == sys.maxunicode:
+        return [column >= prefix]
+
+    return [column >= prefix, column < prefix[:-1] + chr(last + 1)]
+
+
+INT_OPERATORS = {'eq': operator.eq, 'gt': operator.gt, 'gte': operator.ge, 'lt': operator.lt, 'lte': operator.le}
+
+
+def int_predicates(column, value):
+    return [INT_OPERATORS[name](column, bound) for name, bound in value.items() if bound is not None]
+
+
+def string_predicates(column, value):
+    predicates = []
+
+    if value.get('eq') is not None:
+        predicates.append(column == value['eq'])
+
+    if value.get('starts_with') is not None:
+        predicates += prefix_range(column, value['starts_with'])
+
+    return predicates
+
+
+def equals(column):
+    return lambda value: [column == value]
+
+
+def filter_query(query, where, fields):
+    """Restricts ``query`` to the rows matching the ``where`` argument.
+
+    ``fields`` maps each field of the input type to a function turning its
+    value into a list of SQL predicates; the predicates of every field are
+    combined with ``AND``.
+    """
+    for name, value in (where or {}).items():
+        if value is not None:
+            query = query.filter(*fields[name](value))
+
+    return query
+
+
+def order_query(query, model, order_by, columns):
+    """Orders ``query`` by the ``order_by`` argument, a key of ``columns``
+    (``'-title'`` for descending), then by the primary key of ``model`` in
+    the same direction, which the index of the column already holds (SQLite
+    stores the rowid in every index).
+    """
+    name = order_by.lstrip('-')
+    descending = name != order_by
+    key = inspect(model).primary_key[0]
+    clauses = [columns[name]] if name == key.key else [columns[name], key]
+
+    return query.order_by(*(clause.desc() if descending else clause for clause in clauses))
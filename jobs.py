@@ -0,0 +1,150 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from threading import Lock
+
+from sqlalchemy import and_, or_
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobQueue(object):
+    """Runs jobs, rows of ``model`` naming one of ``handlers``, on a pool of
+    ``workers`` threads, each inside ``scope()`` (e.g. an application
+    context); with no workers they run at once, in the thread enqueuing them.
+
+    A handler is a generator called with the job and its arguments: it does
+    a chunk of the work in the current transaction, then yields how many
+    items it handled. The queue commits the chunk together with the progress
+    of the job, so writers waiting for the database get their turn between
+    chunks and a job resumed after a crash starts after its last chunk. What
+    it returns is the message of the finished job.
+
+    A job is claimed by moving it to ``running``; one left running without
+    progress for ``stale_after`` seconds, by a worker that died, may be
+    claimed again.
+    """
+
+    def __init__(self, session, model, handlers, workers=2, stale_after=300, scope=None, metrics=None):
+        self.session = session
+        self.model = model
+        self.handlers = handlers
+        self.stale_after = stale_after
+        self.scope = scope or nullcontext
+        self.metrics = metrics
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='jobs') if workers else None
+        self.futures = set()
+        self._lock = Lock()
+
+    def enqueue(self, kind, total=None, **arguments):
+        """Saves a new job, in a transaction of its own, and hands it to the
+        workers. Returns the job as saved.
+        """
+        job = self.model(kind=kind, status=PENDING, arguments=arguments, total=total, progress=0, failed=0)
+
+        try:
+            self.session.add(job)
+            self.session.flush()
+            # hands the job over loaded, before the commit expires it
+            self.session.expunge(job)
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+
+        self.submit(job.uuid)
+
+        return job
+
+    def resume(self):
+        """Hands the workers the jobs left pending or stale, e.g. by a
+        previous process.
+        """
+        ids = [uuid for uuid, in self.session.query(self.model.uuid).filter(self.claimable())]
+        self.session.commit()
+
+        for job_id in ids:
+            self.submit(job_id)
+
+        return ids
+
+    def submit(self, job_id):
+        if self.pool is None:
+            return self.run(job_id)
+
+        future = self.pool.submit(self.run_in_scope, job_id)
+
+        with self._lock:
+            self.futures.add(future)
+
+        future.add_done_callback(self.forget)
+
+    def forget(self, future):
+        with self._lock:
+            self.futures.discard(future)
+
+    def wait(self, timeout=None):
+        """Waits for the jobs submitted so far to finish."""
+        with self._lock:
+            futures = list(self.futures)
+
+        wait(futures, timeout)
+
+    def claimable(self):
+        stale = datetime.utcnow() - timedelta(seconds=self.stale_after)
+
+        return or_(
+            self.model.status == PENDING,
+            and_(self.model.status == RUNNING, self.model.updated_at < stale),
+        )
+
+    def claim(self, job_id):
+        claimed = self.session.query(self.model).filter(self.model.uuid == job_id, self.claimable()).update(
+            {'status': RUNNING, 'updated_at': datetime.utcnow()}, synchronize_session=False
+        )
+        self.session.commit()
+
+        return claimed == 1
+
+    def run_in_scope(self, job_id):
+        with self.scope():
+            try:
+                self.run(job_id)
+            finally:
+                self.session.remove()
+
+    def run(self, job_id):
+        if not self.claim(job_id):
+            return
+
+        job = self.session.query(self.model).filter_by(uuid=job_id).one()
+        kind = job.kind
+
+        try:
+            steps = self.handlers[kind](job, **(job.arguments or {}))
+
+            while True:
+                try:
+                    done = next(steps)
+                except StopIteration as stop:
+                    job.status = status = DONE
+                    job.message = stop.value
+                    self.session.commit()
+                    break
+
+                job.progress += done
+                # ends the transaction of the chunk, letting other writers in
+                self.session.commit()
+        except Exception as error:
+            status = FAILED
+            self.session.rollback()
+            self.session.query(self.model).filter_by(uuid=job_id).update(
+                {'status': FAILED, 'message': str(error), 'updated_at': datetime.utcnow()}, synchronize_session=False
+            )
+            self.session.commit()
+
+        if self.metrics is not None:
+            self.metrics.finish_job(kind, status)
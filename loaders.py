@@ -0,0 +1,149 @@
+from collections import defaultdict
+from contextlib import contextmanager
+
+from flask import g, has_app_context
+from promise import Promise
+from promise.dataloader import DataLoader
+from sqlalchemy import inspect
+
+from projection import selected_columns
+from response_cache import record, row_tag
+from tracing import attributed_to, current_field
+
+
+class ModelLoader(DataLoader):
+    """Loads rows of ``model`` by ``column`` (the primary key by default),
+    batching every key requested in one execution into a single ``IN`` query.
+    """
+
+    def __init__(self, session, model, column=None, **kwargs):
+        super(ModelLoader, self).__init__(**kwargs)
+        self.session = session
+        self.model = model
+        self.column = column if column is not None else model.__mapper__.primary_key[0]
+        self.field = None
+
+    def load(self, key=None):
+        # the batch runs after the resolvers return; its SQL is counted for the field that asked
+        self.field = current_field.get()
+
+        return super(ModelLoader, self).load(key)
+
+    def batch_load_fn(self, keys):
+        with attributed_to(self.field):
+            return Promise.resolve(self.fetch(keys))
+
+    def fetch(self, keys):
+        rows = self.session.query(self.model).filter(self.column.in_(keys)).all()
+        by_key = {getattr(row, self.column.key): row for row in rows}
+
+        return [by_key.get(key) for key in keys]
+
+
+class RelatedLoader(ModelLoader):
+    """Loads the list of ``model`` rows whose ``column`` matches each key,
+    e.g. every post of a set of authors, in a single ``IN`` query.
+    """
+
+    def fetch(self, keys):
+        rows = self.session.query(self.model).filter(self.column.in_(keys)).order_by(
+            *self.model.__mapper__.primary_key
+        )
+
+        grouped = defaultdict(list)
+        for row in rows:
+            grouped[getattr(row, self.column.key)].append(row)
+
+        return [grouped.get(key, []) for key in keys]
+
+
+class AggregateLoader(ModelLoader):
+    """Loads aggregates of the ``model`` rows whose ``column`` matches each
+    key, e.g. how many posts a set of authors wrote, in a single grouped
+    query. ``aggregates`` maps names to SQL expressions (``func.count``,
+    ``func.max``...); each key gets a dict of their values, or
+    ``defaults`` when no row matches it.
+    """
+
+    def __init__(self, session, model, column, aggregates, defaults=None, **kwargs):
+        super(AggregateLoader, self).__init__(session, model, column, **kwargs)
+        self.aggregates = aggregates
+        self.defaults = defaults or {}
+
+    def fetch(self, keys):
+        names = list(self.aggregates)
+        rows = self.session.query(self.column, *self.aggregates.values()).filter(
+            self.column.in_(keys)
+        ).group_by(self.column)
+
+        by_key = {row[0]: dict(zip(names, row[1:])) for row in rows}
+        missing = {name: self.defaults.get(name) for name in names}
+
+        return [by_key.get(key, missing) for key in keys]
+
+
+def get_loader(name, factory):
+    """Returns the loader registered as ``name`` for the current request,
+    creating it with ``factory`` on first use.
+
+    Loaders live in ``flask.g``, so their cache is shared by every resolver
+    of the request and dropped when the request ends.
+    """
+    loaders = g.setdefault('loaders', {})
+
+    if name not in loaders:
+        loaders[name] = factory()
+
+    return loaders[name]
+
+
+@contextmanager
+def shared_entities():
+    """Keeps every row loaded inside it referenced until it exits.
+
+    The session only holds weak references to its rows, so without this a
+    row loaded by one operation is gone before the next one looks for it.
+    """
+    g.entities = []
+
+    try:
+        yield
+    finally:
+        g.pop('entities', None)
+
+
+def keep_loaded(instance, context):
+    entities = g.get('entities') if has_app_context() else None
+
+    if entities is not None:
+        entities.append(instance)
+
+
+def clear_loaders(*args):
+    """Drops the loaders of the current request, e.g. once a mutation
+    committed, so the operations that follow do not read stale rows.
+    """
+    if has_app_context():
+        g.pop('loaders', None)
+
+
+def find_loaded(session, model, key, info, *path):
+    """Returns the ``model`` row with primary key ``key`` when ``session``
+    already holds it with every column the selection of ``info`` reads,
+    e.g. loaded by an earlier operation of the same batch (see
+    ``shared_entities``); otherwise None.
+    """
+    instance = session.identity_map.get(session.identity_key(model, key))
+
+    if instance is None:
+        return None
+
+    state = inspect(instance)
+
+    if selected_columns(model, info, *path) & state.unloaded:
+        return None
+
+    # tagged as if it had been loaded, for the response cache
+    record(state.mapper.local_table.name, row_tag(instance))
+
+    return instance
@@ -1,26 +1,50 @@
 import os
+from contextlib import contextmanager
+from datetime import datetime
 from typing import Optional
 
 import graphene
-from flask import Flask
-from flask_graphql import GraphQLView
-from flask_sqlalchemy import SQLAlchemy
+from flask import Flask, Response, current_app, request
+from flask_migrate import Migrate
 from graphene_sqlalchemy import SQLAlchemyObjectType
-
-app = Flask(__name__)
-app.debug = True
-
-basedir = os.path.abspath(os.path.dirname(__file__))
-
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'data.sqlite')
-app.config['SQLALCHEMY_COMMIT_ON_TEARDOWN'] = True
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = True
-
-db = SQLAlchemy(app)
+from promise import Promise
+from sqlalchemy import create_engine, event, func, inspect, select
+from sqlalchemy.exc import IntegrityError
+
+from admission import AdmissionBackend, ConcurrencyLimiter, RateLimiter
+from bulk import chunked, select_in
+from config import configs
+from cost import CostAnalysisBackend, CostAnalyzer
+from database import set_sqlite_pragmas
+from deadlines import DeadlineBackend, interrupt_on_deadline
+from documents import CachedDocumentBackend, PersistedQueries
+from executors import executor_factory
+from filters import IntFilter, StringFilter, equals, filter_query, int_predicates, order_query, string_predicates
+from jobs import PENDING, JobQueue
+from loaders import AggregateLoader, ModelLoader, RelatedLoader, clear_loaders, find_loaded, get_loader, keep_loaded
+from metrics import CONTENT_TYPE, GraphQLMetrics
+from pagination import keyset_page, offset_page, page_size
+from plans import check_plans_command
+from projection import is_loaded, is_selected, plan_query
+from response_cache import MemoryCacheBackend, ResponseCache, ResponseCacheBackend, record, track_sessions
+from routing import ReplicaRoutingBackend, ReplicaSet, RoutingSQLAlchemy, replica_scope
+from search import match_expression, search_cli, search_query, track_search_index
+from subscriptions import MemoryBroker, SubscriptionManager, subscription_view
+from tracing import TracingBackend, TracingStats, track_statements
+from versions import read_versions, track_versions
+from view import GraphQLAppView
+from writes import delete_row, insert_where, update_row
+
+db = RoutingSQLAlchemy()
+migrate = Migrate()
 
 
 class Post(db.Model):
     __tablename__ = 'posts'
+    __table_args__ = (
+        # the posts of an author, in the order they are paginated
+        db.Index('ix_posts_author_id_uuid', 'author_id', 'uuid'),
+    )
 
     uuid = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(256), index=True)
@@ -43,36 +67,271 @@ class User(db.Model):
         return '<User %r>' % self.username
 
 
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # the jobs to resume, by status and how long ago they progressed
+        db.Index('ix_jobs_status_updated_at', 'status', 'updated_at'),
+    )
+
+    uuid = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default=PENDING)
+    arguments = db.Column(db.JSON)
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return '<Job %r>' % self.uuid
+
+
+# computed in the query that loads the users, when selected (see plan_query)
+User.post_count = db.column_property(
+    select(func.count(Post.uuid)).where(Post.author_id == User.uuid).correlate_except(Post).scalar_subquery(),
+    deferred=True,
+)
+User.latest_post_id = db.column_property(
+    select(func.max(Post.uuid)).where(Post.author_id == User.uuid).correlate_except(Post).scalar_subquery(),
+    deferred=True,
+)
+
+# how many writes each table has had, for the ETags of GET queries
+table_versions = db.Table(
+    'table_versions',
+    db.Column('name', db.String(64), primary_key=True),
+    db.Column('version', db.Integer, nullable=False),
+)
+
+track_search_index(Post.__table__)
+track_versions(Post.__table__)
+track_versions(User.__table__)
+track_versions(Job.__table__)
+# the response cache of the app each session belongs to sees its reads and writes
+track_sessions(db.session, db.Model, lambda session: session.app.extensions.get('graphql', {}).get('response_cache'))
+
+
+def user_loader():
+    return get_loader('user', lambda: ModelLoader(db.session, User))
+
+
+def post_loader():
+    return get_loader('post', lambda: ModelLoader(db.session, Post))
+
+
+def posts_by_author_loader():
+    return get_loader('posts_by_author', lambda: RelatedLoader(db.session, Post, Post.author_id))
+
+
+def post_stats_loader():
+    return get_loader('post_stats', lambda: AggregateLoader(
+        db.session, Post, Post.author_id, {'post_count': func.count(Post.uuid), 'latest_post_id': func.max(Post.uuid)},
+        defaults={'post_count': 0},
+    ))
+
+
+def post_stat(user, name):
+    """The ``name`` aggregate of the posts of ``user``: from the query that
+    loaded the user when it selected it, otherwise batched with the other
+    users of the result into one grouped query.
+    """
+    if is_loaded(user, name):
+        # read by a subquery the response cache does not see
+        record('posts')
+
+        return Promise.resolve(getattr(user, name))
+
+    return post_stats_loader().load(user.uuid).then(lambda stats: stats[name])
+
+
 class PostType(SQLAlchemyObjectType):
     class Meta:
         model = Post
 
+    @staticmethod
+    def resolve_author(self, info):
+        if self.author_id is None:
+            return None
+
+        if is_loaded(self, 'author'):
+            return self.author
+
+        return user_loader().load(self.author_id)
+
 
 class UserType(SQLAlchemyObjectType):
     class Meta:
         model = User
+        exclude_fields = ('latest_post_id',)
+
+    post_count = graphene.Int()
+    latest_post = graphene.Field(lambda: PostType)
+
+    @staticmethod
+    def resolve_posts(self, info):
+        if is_loaded(self, 'posts'):
+            return self.posts
+
+        return posts_by_author_loader().load(self.uuid)
+
+    @staticmethod
+    def resolve_post_count(self, info):
+        return post_stat(self, 'post_count')
+
+    @staticmethod
+    def resolve_latest_post(self, info):
+        return post_stat(self, 'latest_post_id').then(
+            lambda post_id: None if post_id is None else post_loader().load(post_id)
+        )
+
+
+class JobType(SQLAlchemyObjectType):
+    class Meta:
+        model = Job
+        exclude_fields = ('arguments',)
+
+
+class PostConnection(graphene.relay.Connection):
+    class Meta:
+        node = PostType
+
+
+class UserConnection(graphene.relay.Connection):
+    class Meta:
+        node = UserType
+
+
+class PostSearchConnection(graphene.relay.Connection):
+    class Meta:
+        node = PostType
+
+    class Edge:
+        rank = graphene.Float()
+        snippet = graphene.String()
+
+
+class PostWhere(graphene.InputObjectType):
+    uuid = graphene.Field(IntFilter)
+    title = graphene.Field(StringFilter)
+    author_id = graphene.Int()
+    author_username = graphene.String()
+
+
+class UserWhere(graphene.InputObjectType):
+    uuid = graphene.Field(IntFilter)
+    username = graphene.Field(StringFilter)
+
+
+class PostOrderBy(graphene.Enum):
+    UUID_ASC = 'uuid'
+    UUID_DESC = '-uuid'
+    TITLE_ASC = 'title'
+    TITLE_DESC = '-title'
+
+
+class UserOrderBy(graphene.Enum):
+    UUID_ASC = 'uuid'
+    UUID_DESC = '-uuid'
+    USERNAME_ASC = 'username'
+    USERNAME_DESC = '-username'
+
+
+def author_username_predicates(username):
+    # the author is found on the (unique) username index, then its posts on
+    # ix_posts_author_id_uuid, already in uuid order
+    record('users')
+
+    return [Post.author_id == select(User.uuid).where(User.username == username).scalar_subquery()]
+
+
+POST_FILTERS = {
+    'uuid': lambda value: int_predicates(Post.uuid, value),
+    'title': lambda value: string_predicates(Post.title, value),
+    'author_id': equals(Post.author_id),
+    'author_username': author_username_predicates,
+}
+
+USER_FILTERS = {
+    'uuid': lambda value: int_predicates(User.uuid, value),
+    'username': lambda value: string_predicates(User.username, value),
+}
+
+FILTERS = {Post: POST_FILTERS, User: USER_FILTERS}
+
+POST_ORDERS = {'uuid': Post.uuid, 'title': Post.title}
+
+USER_ORDERS = {'uuid': User.uuid, 'username': User.username}
+
+
+def connection_page(connection_type, model, info, first, after, where=None):
+    first = page_size(first, current_app.config['GRAPHQL_PAGE_SIZE'], current_app.config['GRAPHQL_MAX_PAGE_SIZE'])
+    query = plan_query(db.session.query(model), model, info, 'edges', 'node')
+    query = filter_query(query, where, FILTERS[model])
+
+    return keyset_page(connection_type, query, model.uuid, first, after)
 
 
 class Query(graphene.ObjectType):
     # posts
-    get_all_posts = graphene.List(PostType)
+    get_all_posts = graphene.List(PostType, where=PostWhere(), order_by=PostOrderBy(default_value='uuid'))
     get_post = graphene.Field(PostType, post_id=graphene.Int())
+    posts = graphene.Field(PostConnection, first=graphene.Int(), after=graphene.String(), where=PostWhere())
+    search_posts = graphene.Field(
+        PostSearchConnection, query=graphene.String(required=True), first=graphene.Int(), after=graphene.String()
+    )
 
     # users
-    get_all_users = graphene.List(UserType)
+    get_all_users = graphene.List(UserType, where=UserWhere(), order_by=UserOrderBy(default_value='uuid'))
     get_user = graphene.Field(UserType, user_id=graphene.Int())
+    users = graphene.Field(UserConnection, first=graphene.Int(), after=graphene.String(), where=UserWhere())
+
+    # background jobs
+    job_status = graphene.Field(JobType, id=graphene.Int(required=True))
+
+    @staticmethod
+    def resolve_get_all_posts(self, info, where: Optional[dict] = None, order_by='uuid'):
+        query = filter_query(plan_query(db.session.query(Post), Post, info), where, POST_FILTERS)
+
+        return order_query(query, Post, order_by, POST_ORDERS).limit(current_app.config['GRAPHQL_LIST_LIMIT']).all()
+
+    @staticmethod
+    def resolve_get_all_users(self, info, where: Optional[dict] = None, order_by='uuid'):
+        query = filter_query(plan_query(db.session.query(User), User, info), where, USER_FILTERS)
+
+        return order_query(query, User, order_by, USER_ORDERS).limit(current_app.config['GRAPHQL_LIST_LIMIT']).all()
 
     @staticmethod
-    def resolve_get_all_posts(self, info):
-        return db.session.query(Post).all()
+    def resolve_posts(self, info, first: Optional[int] = None, after: Optional[str] = None,
+                      where: Optional[dict] = None):
+        return connection_page(PostConnection, Post, info, first, after, where)
 
     @staticmethod
-    def resolve_get_all_users(self, info):
-        return db.session.query(User).all()
+    def resolve_users(self, info, first: Optional[int] = None, after: Optional[str] = None,
+                      where: Optional[dict] = None):
+        return connection_page(UserConnection, User, info, first, after, where)
+
+    @staticmethod
+    def resolve_search_posts(self, info, query, first: Optional[int] = None, after: Optional[str] = None):
+        if not match_expression(query):
+            raise Exception('Informe os termos da busca')
+
+        first = page_size(first, current_app.config['GRAPHQL_PAGE_SIZE'], current_app.config['GRAPHQL_MAX_PAGE_SIZE'])
+        posts = search_query(plan_query(db.session.query(Post), Post, info, 'edges', 'node'), Post, query)
+
+        return offset_page(
+            PostSearchConnection, posts, first, after,
+            edge=lambda row: {'node': row.Post, 'rank': row.rank, 'snippet': row.snippet}
+        )
 
     @staticmethod
     def resolve_get_post(self, info, post_id):
-        post = db.session.query(Post).filter_by(uuid=post_id).one_or_none()
+        post = (
+            find_loaded(db.session, Post, post_id, info)
+            or plan_query(db.session.query(Post), Post, info).filter_by(uuid=post_id).one_or_none()
+        )
 
         if not post:
             raise Exception('Post não encontrado')
@@ -81,13 +340,57 @@ class Query(graphene.ObjectType):
 
     @staticmethod
     def resolve_get_user(self, info, user_id):
-        user = db.session.query(User).filter_by(uuid=user_id).one_or_none()
+        user = (
+            find_loaded(db.session, User, user_id, info)
+            or plan_query(db.session.query(User), User, info).filter_by(uuid=user_id).one_or_none()
+        )
 
         if not user:
             raise Exception('Usuário não encontrado')
 
         return user
 
+    @staticmethod
+    def resolve_job_status(self, info, id):
+        job = db.session.query(Job).filter_by(uuid=id).one_or_none()
+
+        if not job:
+            raise Exception('Tarefa não encontrada')
+
+        return job
+
+
+class Subscription(graphene.ObjectType):
+    post_created = graphene.Field(PostType)
+    post_updated = graphene.Field(PostType, post_id=graphene.Int(required=True))
+    post_deleted = graphene.Int()
+
+    # the root value is the event published by the mutation
+
+    @staticmethod
+    def resolve_post_created(self, info):
+        return plan_query(db.session.query(Post), Post, info).filter_by(uuid=self['post_id']).one_or_none()
+
+    @staticmethod
+    def resolve_post_updated(self, info, post_id):
+        return plan_query(db.session.query(Post), Post, info).filter_by(uuid=self['post_id']).one_or_none()
+
+    @staticmethod
+    def resolve_post_deleted(self, info):
+        return self['post_id']
+
+
+def publish(field_name, message, **arguments):
+    """Sends ``message`` to the subscribers of ``field_name(**arguments)``."""
+    current_app.extensions['graphql']['subscriptions'].publish(field_name, message, **arguments)
+
+
+def enqueue(kind, total=None, **arguments):
+    """Runs the ``kind`` job (see ``JOB_HANDLERS``) in the background and
+    returns it, as saved.
+    """
+    return current_app.extensions['graphql']['jobs'].enqueue(kind, total, **arguments)
+
 
 class UpdatePost(graphene.Mutation):
     class Arguments:
@@ -101,7 +404,8 @@ class UpdatePost(graphene.Mutation):
 
     @staticmethod
     def mutate(self, info, post_id, title: Optional[str] = None, body: Optional[str] = None):
-        post = db.session.query(Post).filter_by(uuid=post_id).one_or_none()
+        values = {'title': title, 'body': body}
+        post = update_row(db.session, Post, post_id, **{key: value for key, value in values.items() if value})
 
         if not post:
             ok = False
@@ -109,15 +413,12 @@ class UpdatePost(graphene.Mutation):
 
             return UpdatePost(ok=ok, message=message)
 
-        if title:
-            post.title = title
-
-        if body:
-            post.body = body
-
-        db.session.add(post)
+        # hands the written row over loaded, before the commit expires it
+        db.session.expunge(post)
         db.session.commit()
 
+        publish('postUpdated', {'post_id': post_id}, post_id=post_id)
+
         ok = True
         message = "Post atualizado"
 
@@ -136,20 +437,22 @@ class CreatePost(graphene.Mutation):
 
     @staticmethod
     def mutate(self, info, title, body, username):
-        user = User.query.filter_by(username=username).first()
-        post = Post(title=title, body=body)
+        # the author is looked up by the insert itself
+        post = insert_where(db.session, Post, User.username == username, title=title, body=body, author_id=User.uuid)
 
-        if not user:
+        if not post:
             ok = False
             message = "Usuário inválido"
 
             return CreatePost(ok=ok, message=message)
 
-        post.author = user
-
-        db.session.add(post)
+        # hands the written row over loaded, before the commit expires it
+        db.session.expunge(post)
         db.session.commit()
 
+        # the identity needs no refresh of the expired post
+        publish('postCreated', {'post_id': inspect(post).identity[0]})
+
         ok = True
         message = "Post criado"
 
@@ -165,17 +468,16 @@ class DeletePost(graphene.Mutation):
 
     @staticmethod
     def mutate(self, info, post_id):
-        post = db.session.query(Post).filter_by(uuid=post_id).one_or_none()
-
-        if not post:
+        if not delete_row(db.session, Post, post_id):
             ok = False
             message = "Post inválido."
 
             return DeletePost(ok=ok, message=message)
 
-        db.session.delete(post)
         db.session.commit()
 
+        publish('postDeleted', {'post_id': post_id})
+
         ok = True
         message = "Post removido com sucesso."
 
@@ -193,19 +495,23 @@ class CreateUser(graphene.Mutation):
 
     @staticmethod
     def mutate(self, info, username, password):
-        user = db.session.query(User).filter_by(username=username).one_or_none()
+        new_user = User(username=username, password=password)
+
+        try:
+            db.session.add(new_user)
+            db.session.flush()
+            # hands the new user over loaded, before the commit expires it
+            db.session.expunge(new_user)
+            db.session.commit()
+        except IntegrityError:
+            # the unique index on username, rather than a racy lookup first
+            db.session.rollback()
 
-        if user:
             ok = False
             message = "username já existe"
 
             return CreateUser(ok=ok, message=message)
 
-        new_user = User(username=username, password=password)
-
-        db.session.add(new_user)
-        db.session.commit()
-
         ok = True
         message = "Criado com sucesso"
 
@@ -218,24 +524,23 @@ class DeleteUser(graphene.Mutation):
 
     ok = graphene.Boolean()
     message = graphene.String()
+    job = graphene.Field(JobType)
 
     @staticmethod
     def mutate(self, info, user_id):
-        user = db.session.query(User).filter_by(uuid=user_id).first()
-
-        if not user:
+        if db.session.query(User.uuid).filter_by(uuid=user_id).scalar() is None:
             ok = False
             message = "Falha ao remover usuário"
 
             return DeleteUser(ok=ok, message=message)
 
-        db.session.delete(user)
-        db.session.commit()
+        # detaching the posts of the user takes a transaction per chunk of them
+        job = enqueue('delete_user', user_id=user_id)
 
         ok = True
-        message = "Usuário removido com sucesso."
+        message = "Remoção do usuário agendada"
 
-        return DeleteUser(ok=ok, message=message)
+        return DeleteUser(ok=ok, message=message, job=job)
 
 
 class UpdateUser(graphene.Mutation):
@@ -250,21 +555,26 @@ class UpdateUser(graphene.Mutation):
 
     @staticmethod
     def mutate(self, info, user_id, username: Optional[str] = None, password: Optional[str] = None):
-        user = db.session.query(User).filter_by(uuid=user_id).one_or_none()
+        values = {'username': username, 'password': password}
+
+        try:
+            user = update_row(db.session, User, user_id, **{key: value for key, value in values.items() if value})
+        except IntegrityError:
+            db.session.rollback()
 
-        if not user:
             ok = False
-            message = "Usuário não encontrado"
+            message = "username já existe"
 
             return UpdateUser(ok=ok, message=message)
 
-        if username:
-            user.username = username
+        if not user:
+            ok = False
+            message = "Usuário não encontrado"
 
-        if password:
-            user.password = password
+            return UpdateUser(ok=ok, message=message)
 
-        db.session.add(user)
+        # hands the written row over loaded, before the commit expires it
+        db.session.expunge(user)
         db.session.commit()
 
         ok = True
@@ -273,28 +583,536 @@ class UpdateUser(graphene.Mutation):
         return UpdateUser(ok=ok, message=message, user=user)
 
 
+class PostInput(graphene.InputObjectType):
+    title = graphene.String(required=True)
+    body = graphene.String(required=True)
+    username = graphene.String(required=True)
+
+
+class UserInput(graphene.InputObjectType):
+    username = graphene.String(required=True)
+    password = graphene.String(required=True)
+
+
+class PostResult(graphene.ObjectType):
+    ok = graphene.Boolean()
+    message = graphene.String()
+    post = graphene.Field(PostType)
+
+
+class UserResult(graphene.ObjectType):
+    ok = graphene.Boolean()
+    message = graphene.String()
+    user = graphene.Field(UserType)
+
+
+class DeletePostResult(graphene.ObjectType):
+    post_id = graphene.Int()
+    ok = graphene.Boolean()
+    message = graphene.String()
+
+
+def check_bulk_size(items, setting='GRAPHQL_MAX_BULK_SIZE'):
+    if len(items) > current_app.config[setting]:
+        raise Exception('Máximo de %d itens por operação' % current_app.config[setting])
+
+
+def bulk_insert(info, model, rows, field, return_defaults=False):
+    """Inserts ``rows`` with a single executemany in the current transaction.
+
+    Generated primary keys are only fetched (one INSERT per row) when the
+    client selects the created objects in ``results { <field> }``, or when
+    ``return_defaults`` asks for them.
+    """
+    return_defaults = return_defaults or is_selected(info, 'results', field)
+
+    try:
+        db.session.bulk_insert_mappings(model, rows, return_defaults=return_defaults)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return [model(**row) if return_defaults else None for row in rows]
+
+
+class CreatePosts(graphene.Mutation):
+    class Arguments:
+        posts = graphene.List(graphene.NonNull(PostInput), required=True)
+
+    ok = graphene.Boolean()
+    message = graphene.String()
+    results = graphene.List(PostResult)
+
+    @staticmethod
+    def mutate(self, info, posts):
+        check_bulk_size(posts)
+
+        usernames = [item.username for item in posts]
+        authors = dict(select_in(db.session.query(User.username, User.uuid), User.username, usernames))
+
+        rows = [
+            {'title': item.title, 'body': item.body, 'author_id': authors[item.username]}
+            for item in posts if item.username in authors
+        ]
+        # the ids of the new posts are only fetched when someone listens for them
+        listening = current_app.extensions['graphql']['subscriptions'].listening('postCreated')
+        created = bulk_insert(info, Post, rows, 'post', return_defaults=listening)
+
+        if listening:
+            for post in created:
+                publish('postCreated', {'post_id': post.uuid})
+
+        created = iter(created)
+
+        results = [
+            PostResult(ok=True, message="Post criado", post=next(created)) if item.username in authors
+            else PostResult(ok=False, message="Usuário inválido")
+            for item in posts
+        ]
+
+        ok = len(rows) == len(posts)
+        message = "%d posts criados" % len(rows)
+
+        return CreatePosts(ok=ok, message=message, results=results)
+
+
+class CreateUsers(graphene.Mutation):
+    class Arguments:
+        users = graphene.List(graphene.NonNull(UserInput), required=True)
+
+    ok = graphene.Boolean()
+    message = graphene.String()
+    results = graphene.List(UserResult)
+
+    @staticmethod
+    def mutate(self, info, users):
+        check_bulk_size(users)
+
+        usernames = [item.username for item in users]
+        taken = {username for username, in select_in(db.session.query(User.username), User.username, usernames)}
+
+        rows = []
+        accepted = []
+
+        for item in users:
+            accepted.append(item.username not in taken)
+
+            if accepted[-1]:
+                taken.add(item.username)
+                rows.append({'username': item.username, 'password': item.password})
+
+        created = iter(bulk_insert(info, User, rows, 'user'))
+
+        results = [
+            UserResult(ok=True, message="Criado com sucesso", user=next(created)) if ok
+            else UserResult(ok=False, message="username já existe")
+            for ok in accepted
+        ]
+
+        ok = len(rows) == len(users)
+        message = "%d usuários criados" % len(rows)
+
+        return CreateUsers(ok=ok, message=message, results=results)
+
+
+class DeletePosts(graphene.Mutation):
+    class Arguments:
+        post_ids = graphene.List(graphene.NonNull(graphene.Int), required=True)
+
+    ok = graphene.Boolean()
+    message = graphene.String()
+    results = graphene.List(DeletePostResult)
+
+    @staticmethod
+    def mutate(self, info, post_ids):
+        check_bulk_size(post_ids)
+
+        existing = {uuid for uuid, in select_in(db.session.query(Post.uuid), Post.uuid, post_ids)}
+
+        try:
+            for chunk in chunked(existing):
+                db.session.query(Post).filter(Post.uuid.in_(chunk)).delete(synchronize_session=False)
+
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        for post_id in existing:
+            publish('postDeleted', {'post_id': post_id})
+
+        results = [
+            DeletePostResult(post_id=post_id, ok=True, message="Post removido com sucesso.") if post_id in existing
+            else DeletePostResult(post_id=post_id, ok=False, message="Post inválido.")
+            for post_id in post_ids
+        ]
+
+        ok = len(existing) == len(set(post_ids))
+        message = "%d posts removidos" % len(existing)
+
+        return DeletePosts(ok=ok, message=message, results=results)
+
+
+class ImportPosts(graphene.Mutation):
+    class Arguments:
+        posts = graphene.List(graphene.NonNull(PostInput), required=True)
+
+    ok = graphene.Boolean()
+    message = graphene.String()
+    job = graphene.Field(JobType)
+
+    @staticmethod
+    def mutate(self, info, posts):
+        check_bulk_size(posts, 'GRAPHQL_MAX_IMPORT_SIZE')
+
+        job = enqueue('import_posts', total=len(posts), posts=[dict(item) for item in posts])
+
+        ok = True
+        message = "Importação agendada"
+
+        return ImportPosts(ok=ok, message=message, job=job)
+
+
+class ImportUsers(graphene.Mutation):
+    class Arguments:
+        users = graphene.List(graphene.NonNull(UserInput), required=True)
+
+    ok = graphene.Boolean()
+    message = graphene.String()
+    job = graphene.Field(JobType)
+
+    @staticmethod
+    def mutate(self, info, users):
+        check_bulk_size(users, 'GRAPHQL_MAX_IMPORT_SIZE')
+
+        job = enqueue('import_users', total=len(users), users=[dict(item) for item in users])
+
+        ok = True
+        message = "Importação agendada"
+
+        return ImportUsers(ok=ok, message=message, job=job)
+
+
+def delete_user_job(job, user_id):
+    """Detaches the posts of the user a chunk at a time, then deletes it
+    along with the last chunk, so posts written meanwhile are detached too.
+    """
+    size = current_app.config['GRAPHQL_JOB_CHUNK_SIZE']
+
+    if job.total is None:
+        job.total = db.session.query(func.count(Post.uuid)).filter_by(author_id=user_id).scalar()
+
+    while True:
+        chunk = [uuid for uuid, in db.session.query(Post.uuid).filter_by(author_id=user_id).limit(size)]
+
+        if len(chunk) < size:
+            break
+
+        db.session.query(Post).filter(Post.uuid.in_(chunk)).update({'author_id': None}, synchronize_session=False)
+
+        yield len(chunk)
+
+    # the posts of the user are kept, without an author
+    detached = db.session.query(Post).filter_by(author_id=user_id).update(
+        {'author_id': None}, synchronize_session=False
+    )
+
+    if not delete_row(db.session, User, user_id):
+        raise Exception('Usuário não encontrado')
+
+    yield detached
+
+    return "Usuário removido com sucesso."
+
+
+def import_posts_job(job, posts):
+    """Inserts the posts not imported yet, a chunk at a time, skipping
+    those by unknown usernames.
+    """
+    size = current_app.config['GRAPHQL_JOB_CHUNK_SIZE']
+    # the ids of the new posts are only fetched when someone listens for them
+    listening = current_app.extensions['graphql']['subscriptions'].listening('postCreated')
+
+    for chunk in chunked(posts[job.progress:], size):
+        usernames = [item['username'] for item in chunk]
+        authors = dict(select_in(db.session.query(User.username, User.uuid), User.username, usernames))
+
+        rows = [
+            {'title': item['title'], 'body': item['body'], 'author_id': authors[item['username']]}
+            for item in chunk if item['username'] in authors
+        ]
+        db.session.bulk_insert_mappings(Post, rows, return_defaults=listening)
+        job.failed += len(chunk) - len(rows)
+
+        yield len(chunk)
+
+        # once the chunk is committed
+        if listening:
+            for row in rows:
+                publish('postCreated', {'post_id': row['uuid']})
+
+    return "%d posts criados" % (job.progress - job.failed)
+
+
+def import_users_job(job, users):
+    """Inserts the users not imported yet, a chunk at a time, skipping
+    those whose username is taken.
+    """
+    size = current_app.config['GRAPHQL_JOB_CHUNK_SIZE']
+
+    for chunk in chunked(users[job.progress:], size):
+        usernames = [item['username'] for item in chunk]
+        taken = {username for username, in select_in(db.session.query(User.username), User.username, usernames)}
+        rows = []
+
+        for item in chunk:
+            if item['username'] not in taken:
+                taken.add(item['username'])
+                rows.append({'username': item['username'], 'password': item['password']})
+
+        db.session.bulk_insert_mappings(User, rows)
+        job.failed += len(chunk) - len(rows)
+
+        yield len(chunk)
+
+    return "%d usuários criados" % (job.progress - job.failed)
+
+
+JOB_HANDLERS = {
+    'delete_user': delete_user_job,
+    'import_posts': import_posts_job,
+    'import_users': import_users_job,
+}
+
+
 class Mutation(graphene.ObjectType):
     # posts
     CreatePost = CreatePost.Field()
     DeletePost = DeletePost.Field()
     UpdatePost = UpdatePost.Field()
+    CreatePosts = CreatePosts.Field()
+    DeletePosts = DeletePosts.Field()
+    ImportPosts = ImportPosts.Field()
 
     # users
     CreateUser = CreateUser.Field()
     DeleteUser = DeleteUser.Field()
     UpdateUser = UpdateUser.Field()
+    CreateUsers = CreateUsers.Field()
+    ImportUsers = ImportUsers.Field()
+
+
+schema = graphene.Schema(query=Query, mutation=Mutation, subscription=Subscription)
+
+# subscriptions run once per event as a query on the Subscription type
+event_schema = graphene.Schema(query=Subscription)
+
+
+def create_app(config_name=None, **overrides):
+    app = Flask(__name__)
+    app.config.from_object(configs[config_name or os.environ.get('APP_CONFIG', 'development')])
+    app.config.update(overrides)
+
+    db.init_app(app)
+    migrate.init_app(app, db, directory=app.config['MIGRATIONS_DIR'], render_as_batch=True)
+
+    with app.app_context():
+        set_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+        interrupt_on_deadline(db.engine)
+
+        response_cache = ResponseCache(MemoryCacheBackend(
+            maxsize=app.config['GRAPHQL_RESPONSE_CACHE_SIZE'],
+            ttl=app.config['GRAPHQL_RESPONSE_CACHE_TTL'],
+        ))
+        response_cache.track(db.engine)
+        event.listen(db.session, 'after_commit', clear_loaders)
+        event.listen(db.Model, 'load', keep_loaded, propagate=True)
+        track_statements(db.engine)
+
+        engine_options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        replica_engines = [create_engine(url, **engine_options) for url in app.config['SQLALCHEMY_REPLICAS']]
+
+        for engine in replica_engines:
+            set_sqlite_pragmas(engine, app.config['SQLITE_PRAGMAS'])
+            interrupt_on_deadline(engine)
+            track_statements(engine)
+
+        replicas = ReplicaSet(
+            db.engine,
+            replica_engines,
+            strategy=app.config['SQLALCHEMY_REPLICA_STRATEGY'],
+            max_lag=app.config['SQLALCHEMY_REPLICA_MAX_LAG'],
+            lag=app.config['SQLALCHEMY_REPLICA_LAG'],
+        ) if replica_engines else None
+
+    @contextmanager
+    def executor_scope():
+        with app.app_context():
+            try:
+                yield
+            finally:
+                # hands the loaded rows over detached, before the teardown commit expires them
+                db.session.expunge_all()
+
+    document_backend = CachedDocumentBackend(maxsize=app.config['GRAPHQL_DOCUMENT_CACHE_SIZE'])
+    cost_analyzer = CostAnalyzer(
+        max_depth=app.config['GRAPHQL_MAX_DEPTH'],
+        max_cost=app.config['GRAPHQL_MAX_COST'],
+        field_costs=app.config['GRAPHQL_FIELD_COSTS'],
+        list_sizes=app.config['GRAPHQL_LIST_SIZES'],
+        default_list_size=app.config['GRAPHQL_DEFAULT_LIST_SIZE'],
+        default_page_size=app.config['GRAPHQL_PAGE_SIZE'],
+        max_page_size=app.config['GRAPHQL_MAX_PAGE_SIZE'],
+    )
 
+    rate_limiter = RateLimiter(
+        app.config['GRAPHQL_RATE_LIMIT'], app.config['GRAPHQL_RATE_LIMIT_BURST']
+    ) if app.config['GRAPHQL_RATE_LIMIT'] is not None else None
+    concurrency = ConcurrencyLimiter(
+        app.config['GRAPHQL_MAX_CONCURRENT'],
+        max_waiting=app.config['GRAPHQL_MAX_WAITING'],
+        timeout=app.config['GRAPHQL_QUEUE_TIMEOUT'],
+    ) if app.config['GRAPHQL_MAX_CONCURRENT'] is not None else None
+    client_header = app.config['GRAPHQL_CLIENT_HEADER']
+
+    metrics = GraphQLMetrics(
+        directory=app.config['GRAPHQL_METRICS_DIR'],
+        flush_interval=app.config['GRAPHQL_METRICS_FLUSH_INTERVAL'],
+        max_operations=app.config['GRAPHQL_METRICS_MAX_OPERATIONS'],
+    )
 
-schema = graphene.Schema(query=Query, mutation=Mutation)
+    # the deadline starts once the operation is admitted
+    backend = DeadlineBackend(
+        document_backend,
+        timeout=app.config['GRAPHQL_TIMEOUT'],
+        timeouts=app.config['GRAPHQL_OPERATION_TIMEOUTS'],
+        metrics=metrics if app.config['GRAPHQL_METRICS'] else None,
+        # SQLite rolls back a transaction whose write it interrupted
+        on_timeout=db.session.rollback,
+    )
 
-app.add_url_rule(
-    '/graphql',
-    view_func=GraphQLView.as_view(
-        'graphql',
-        schema=schema,
-        graphiql=True
+    # after the cost analysis, which weighs the operations for the rate limiter
+    backend = AdmissionBackend(
+        backend,
+        limiter=rate_limiter,
+        concurrency=concurrency,
+        client=lambda: (client_header and request.headers.get(client_header)) or request.remote_addr,
+        metrics=metrics if app.config['GRAPHQL_METRICS'] else None,
     )
-)
+    backend = CostAnalysisBackend(backend, cost_analyzer)
+
+    if replicas is not None:
+        backend = ReplicaRoutingBackend(backend)
+
+    if app.config['GRAPHQL_RESPONSE_CACHE']:
+        backend = ResponseCacheBackend(backend, response_cache)
+
+    persisted_queries = PersistedQueries(maxsize=app.config['GRAPHQL_PERSISTED_QUERIES_SIZE'])
+
+    subscriptions = SubscriptionManager(
+        schema,
+        event_schema,
+        broker=app.config['GRAPHQL_SUBSCRIPTION_BROKER'] or MemoryBroker(),
+        scope=app.app_context,
+        queue_size=app.config['GRAPHQL_SUBSCRIPTION_QUEUE_SIZE'],
+    )
+
+    metrics.track_pool(lambda: db.get_engine(app).pool)
+    metrics.track_cache('documents', lambda: document_backend.cache_info()[:2])
+    metrics.track_cache('persisted_queries', lambda: persisted_queries.cache_info()[:2])
+    metrics.track_cache('responses', lambda: (response_cache.backend.hits, response_cache.backend.misses))
+
+    tracing_header = app.config['GRAPHQL_TRACING_HEADER']
+    tracing_stats = TracingStats(max_operations=app.config['GRAPHQL_METRICS_MAX_OPERATIONS'])
+    backend = TracingBackend(
+        backend,
+        tracing_stats,
+        detailed=lambda: tracing_header is not None and request.headers.get(tracing_header),
+        metrics=metrics if app.config['GRAPHQL_METRICS'] else None
+    )
+
+    def current_versions():
+        if not app.config['GRAPHQL_HTTP_CACHE']:
+            return None
+
+        # from the replica the query will read, if any
+        with replica_scope():
+            return read_versions(db.session, table_versions)
+
+    jobs = JobQueue(
+        db.session,
+        Job,
+        JOB_HANDLERS,
+        workers=app.config['GRAPHQL_JOB_WORKERS'],
+        stale_after=app.config['GRAPHQL_JOB_STALE_AFTER'],
+        scope=app.app_context,
+        metrics=metrics if app.config['GRAPHQL_METRICS'] else None,
+    )
+
+    if app.config['GRAPHQL_JOB_WORKERS']:
+        @app.before_first_request
+        def resume_jobs():
+            # the jobs a previous process left unfinished, once the table is migrated
+            if inspect(db.engine).has_table(Job.__tablename__):
+                jobs.resume()
+
+    app.extensions['graphql'] = {
+        'document_backend': document_backend,
+        'persisted_queries': persisted_queries,
+        'response_cache': response_cache,
+        'tracing': tracing_stats,
+        'metrics': metrics,
+        'subscriptions': subscriptions,
+        'replicas': replicas,
+        'rate_limiter': rate_limiter,
+        'concurrency': concurrency,
+        'jobs': jobs,
+    }
+
+    app.add_url_rule(
+        '/graphql',
+        view_func=GraphQLAppView.as_view(
+            'graphql',
+            schema=schema,
+            graphiql=app.config['GRAPHIQL'],
+            backend=backend,
+            executor_factory=executor_factory(
+                app.config['GRAPHQL_EXECUTOR'],
+                workers=app.config['GRAPHQL_EXECUTOR_WORKERS'],
+                scope=executor_scope
+            ),
+            persisted_queries=persisted_queries,
+            batch=app.config['GRAPHQL_BATCH'],
+            max_batch_size=app.config['GRAPHQL_MAX_BATCH_SIZE'],
+            max_batch_cost=app.config['GRAPHQL_MAX_BATCH_COST'],
+            stream_min_items=app.config['GRAPHQL_STREAM_MIN_ITEMS'],
+            stream_chunk_items=app.config['GRAPHQL_STREAM_CHUNK_ITEMS'],
+            table_versions=current_versions,
+            cache_control=app.config['GRAPHQL_CACHE_CONTROL']
+        )
+    )
+
+    app.add_url_rule(
+        '/graphql/subscriptions',
+        'subscriptions',
+        subscription_view(subscriptions, keepalive=app.config['GRAPHQL_SUBSCRIPTION_KEEPALIVE']),
+        methods=['GET', 'POST']
+    )
+
+    app.cli.add_command(search_cli)
+    app.cli.add_command(check_plans_command)
+
+    if app.config['GRAPHQL_METRICS']:
+        app.add_url_rule('/metrics', 'metrics', lambda: Response(metrics.expose(), content_type=CONTENT_TYPE))
+
+    return app
+
+
+app = create_app()
+
+# lets scripts and the shell use db.session and db.create_all() without pushing a context
+db.app = app
 
 if __name__ == '__main__':
     app.run()
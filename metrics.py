@@ -0,0 +1,453 @@
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from threading import Lock
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# longer resolver error messages are cut, so a label cannot grow unbounded
+MAX_ERROR_LABEL = 100
+
+# operation names come from the clients: past this many distinct ones, the
+# rest share the OTHER_OPERATIONS label, so the series cannot grow unbounded
+MAX_OPERATION_NAMES = 100
+OTHER_OPERATIONS = 'other'
+
+
+class BoundedLabels(object):
+    """Passes the first ``limit`` distinct values of a label through and
+    turns any later one into ``other``.
+    """
+
+    def __init__(self, limit=MAX_OPERATION_NAMES, other=OTHER_OPERATIONS):
+        self.limit = limit
+        self.other = other
+        self.seen = set()
+        self._lock = Lock()
+
+    def __call__(self, value):
+        if value in self.seen:
+            return value
+
+        with self._lock:
+            if len(self.seen) < self.limit:
+                self.seen.add(value)
+
+                return value
+
+        return self.other
+
+
+class ShardedValues(object):
+    """Arrays of ``size`` floats keyed by label values, with one shard per
+    thread.
+
+    A thread only ever writes to its own shard, so updates take no lock;
+    reading sums every shard. Shards of finished threads are folded into a
+    single one whenever a new thread registers, so a server spawning a
+    thread per request does not keep one shard for each of them.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._shards = []
+        self._retired = {}
+        self._local = threading.local()
+        self._lock = Lock()
+
+    def get(self, labels):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._register()
+
+        values = shard.get(labels)
+
+        if values is None:
+            values = shard[labels] = [0.0] * self.size
+
+        return values
+
+    def _register(self):
+        shard = self._local.shard = {}
+
+        with self._lock:
+            alive = []
+
+            for thread, values in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, values))
+                else:
+                    self._add(self._retired, values)
+
+            alive.append((threading.current_thread(), shard))
+            self._shards = alive
+
+        return shard
+
+    def _add(self, totals, shard):
+        # copy() runs without releasing the GIL, unlike iterating the shard
+        for labels, values in shard.copy().items():
+            total = totals.setdefault(labels, [0.0] * self.size)
+
+            for i, value in enumerate(list(values)):
+                total[i] += value
+
+    def totals(self):
+        with self._lock:
+            totals = {labels: list(values) for labels, values in self._retired.items()}
+
+            for thread, shard in self._shards:
+                self._add(totals, shard)
+
+        return totals
+
+
+class Metric(object):
+    type = None
+    size = 1
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def values(self):
+        """Maps each tuple of label values to the array of its samples."""
+        raise NotImplementedError
+
+    def samples(self, labels, values):
+        yield self.name, dict(zip(self.labelnames, labels)), values[0]
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super(Counter, self).__init__(name, documentation, labelnames)
+        self._values = ShardedValues(self.size)
+
+    def inc(self, labels=(), amount=1):
+        self._values.get(labels)[0] += amount
+
+    def values(self):
+        return self._values.totals()
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super(Histogram, self).__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # one count per bucket and +Inf, then the sum and the count
+        self.size = len(self.buckets) + 3
+        self._values = ShardedValues(self.size)
+
+    def observe(self, value, labels=()):
+        values = self._values.get(labels)
+        values[bisect_left(self.buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    def values(self):
+        return self._values.totals()
+
+    def samples(self, labels, values):
+        labels = dict(zip(self.labelnames, labels))
+        cumulative = 0
+
+        for bound, count in zip(self.buckets + (float('inf'),), values):
+            cumulative += count
+            yield self.name + '_bucket', dict(labels, le=format_value(bound)), cumulative
+
+        yield self.name + '_sum', labels, values[-2]
+        yield self.name + '_count', labels, values[-1]
+
+
+class Collected(Metric):
+    """A metric read at collection time from ``collect()``, which maps
+    each tuple of label values to the current value, e.g. the connections
+    checked out of a pool.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), collect=None, type='gauge'):
+        super(Collected, self).__init__(name, documentation, labelnames)
+        self.collect = collect or dict
+        self.type = type
+
+    def values(self):
+        return {labels: [float(value)] for labels, value in self.collect().items()}
+
+
+class Registry(object):
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+        return metric
+
+    def snapshot(self):
+        return {metric.name: metric.values() for metric in self.metrics}
+
+    def expose(self, snapshot):
+        """Renders ``snapshot`` in the Prometheus text exposition format."""
+        lines = []
+
+        for metric in self.metrics:
+            lines.append('# HELP %s %s' % (metric.name, metric.documentation))
+            lines.append('# TYPE %s %s' % (metric.name, metric.type))
+
+            for labels, values in sorted(snapshot.get(metric.name, {}).items()):
+                for name, sample_labels, value in metric.samples(labels, values):
+                    lines.append('%s%s %s' % (name, format_labels(sample_labels), format_value(value)))
+
+        return '\n'.join(lines) + '\n'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+
+    return repr(float(value))
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+
+    return '{%s}' % ','.join(
+        '%s="%s"' % (name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels.items()
+    )
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+class MultiProcessStore(object):
+    """Shares the metrics of every process of a server through ``directory``.
+
+    Each process writes a snapshot of its metrics to ``<pid>.json`` at most
+    every ``interval`` seconds (and when it exits); ``collect`` sums the
+    snapshots of all of them, so any process can answer a scrape. Gauges
+    of processes that are gone are left out; their counters are kept.
+    """
+
+    def __init__(self, directory, registry, interval=1.0):
+        self.directory = directory
+        self.registry = registry
+        self.interval = interval
+        self._flushed = 0.0
+        self._lock = Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(self.flush)
+
+    @property
+    def path(self):
+        # read on every flush: workers forked from a preloading master get their own file
+        return os.path.join(self.directory, '%d.json' % os.getpid())
+
+    def maybe_flush(self):
+        if time.monotonic() - self._flushed >= self.interval and self._lock.acquire(blocking=False):
+            try:
+                self.flush()
+            finally:
+                self._lock.release()
+
+    def flush(self):
+        self._flushed = time.monotonic()
+        payload = {
+            name: [[list(labels), values] for labels, values in metric_values.items()]
+            for name, metric_values in self.registry.snapshot().items()
+        }
+
+        path = self.path
+        temporary = '%s.%d.tmp' % (path, threading.get_ident())
+
+        # a failed flush only delays what the other processes see
+        try:
+            with open(temporary, 'w') as f:
+                json.dump(payload, f)
+
+            os.replace(temporary, path)
+        except OSError:
+            pass
+
+    def collect(self):
+        gauges = {metric.name for metric in self.registry.metrics if metric.type == 'gauge'}
+        own = self.registry.snapshot()
+        merged = {name: {labels: list(values) for labels, values in metric_values.items()}
+                  for name, metric_values in own.items()}
+
+        for filename in os.listdir(self.directory):
+            name, extension = os.path.splitext(filename)
+
+            if extension != '.json' or not name.isdigit() or int(name) == os.getpid():
+                continue
+
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    payload = json.load(f)
+            except (OSError, ValueError):
+                continue
+
+            alive = pid_alive(int(name))
+
+            for metric_name, samples in payload.items():
+                if metric_name in gauges and not alive:
+                    continue
+
+                totals = merged.setdefault(metric_name, {})
+
+                for labels, values in samples:
+                    total = totals.setdefault(tuple(labels), [0.0] * len(values))
+
+                    for i, value in enumerate(values):
+                        total[i] += value
+
+        return merged
+
+
+class GraphQLMetrics(object):
+    """Operation-level metrics of the GraphQL endpoint: latency and SQL
+    statements by operation name and type, resolver errors, connection pool
+    usage and cache hit ratios. Past ``max_operations`` distinct operation
+    names, the others are labelled ``other``.
+
+    With a ``directory`` the metrics of every process sharing it are
+    aggregated, for servers running several worker processes.
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0, max_operations=MAX_OPERATION_NAMES):
+        self.registry = Registry()
+        self.caches = {}
+        self.operation_names = BoundedLabels(max_operations)
+
+        self.request_duration = self.registry.register(Histogram(
+            'graphql_request_duration_seconds', 'Time to execute a GraphQL operation.',
+            ('operation_name', 'operation_type'), LATENCY_BUCKETS
+        ))
+        self.sql_statements = self.registry.register(Histogram(
+            'graphql_sql_statements', 'SQL statements run by a GraphQL operation.',
+            ('operation_name', 'operation_type'), STATEMENT_BUCKETS
+        ))
+        self.resolver_errors = self.registry.register(Counter(
+            'graphql_resolver_errors_total', 'Errors raised by the resolvers of a GraphQL operation.',
+            ('operation_name', 'error')
+        ))
+        self.rejections = self.registry.register(Counter(
+            'graphql_rejected_operations_total', 'Operations turned away by admission control.', ('reason',)
+        ))
+        self.timeouts = self.registry.register(Counter(
+            'graphql_timeouts_total', 'GraphQL operations cut short by their deadline.', ('operation_name',)
+        ))
+        self.jobs = self.registry.register(Counter(
+            'graphql_jobs_total', 'Background jobs finished, by kind and status.', ('kind', 'status')
+        ))
+        self.pools = self.registry.register(Collected(
+            'graphql_db_pool_connections', 'Connections of the database pool, by state.', ('state',)
+        ))
+        self.cache_hits = self.registry.register(Collected(
+            'graphql_cache_hits_total', 'Cache lookups that found an entry.', ('cache',),
+            lambda: self.cache_values(0), type='counter'
+        ))
+        self.cache_misses = self.registry.register(Collected(
+            'graphql_cache_misses_total', 'Cache lookups that found nothing.', ('cache',),
+            lambda: self.cache_values(1), type='counter'
+        ))
+        self.cache_ratio = self.registry.register(Collected(
+            'graphql_cache_hit_ratio', 'Share of the cache lookups that found an entry.', ('cache',)
+        ))
+
+        self.store = MultiProcessStore(directory, self.registry, flush_interval) if directory else None
+
+    def track_pool(self, get_pool):
+        """Exports the state of the pool returned by ``get_pool()``; pools
+        without a size (e.g. NullPool) only report what they can.
+        """
+        def collect():
+            pool = get_pool()
+            states = {}
+
+            for state in ('size', 'checkedin', 'checkedout', 'overflow'):
+                method = getattr(pool, state, None)
+                if callable(method):
+                    states[(state,)] = method()
+
+            return states
+
+        self.pools.collect = collect
+
+    def track_cache(self, name, stats):
+        """Exports the hits and misses of a cache; ``stats()`` returns both."""
+        self.caches[name] = stats
+
+    def cache_values(self, index):
+        return {(name,): stats()[index] for name, stats in self.caches.items()}
+
+    def observe(self, operation, trace, result):
+        name = self.operation_names(operation.name.value if operation and operation.name else 'anonymous')
+        labels = (name, operation.operation if operation else 'unknown')
+
+        self.request_duration.observe(trace.duration, labels)
+        self.sql_statements.observe(trace.sql_count, labels)
+
+        # invalid results were rejected before any resolver ran
+        if not result.invalid:
+            for error in result.errors or []:
+                self.resolver_errors.inc((name, str(getattr(error, 'message', error))[:MAX_ERROR_LABEL]))
+
+        if self.store is not None:
+            self.store.maybe_flush()
+
+    def reject(self, reason):
+        self.rejections.inc((reason,))
+
+        if self.store is not None:
+            self.store.maybe_flush()
+
+    def time_out(self, operation_name):
+        self.timeouts.inc((self.operation_names(operation_name),))
+
+        if self.store is not None:
+            self.store.maybe_flush()
+
+    def finish_job(self, kind, status):
+        self.jobs.inc((kind, status))
+
+        if self.store is not None:
+            self.store.maybe_flush()
+
+    def snapshot(self):
+        snapshot = self.store.collect() if self.store is not None else self.registry.snapshot()
+        hits = snapshot.get(self.cache_hits.name, {})
+        misses = snapshot.get(self.cache_misses.name, {})
+
+        snapshot[self.cache_ratio.name] = {
+            labels: [values[0] / (values[0] + misses.get(labels, [0.0])[0])]
+            for labels, values in hits.items() if values[0] + misses.get(labels, [0.0])[0]
+        }
+
+        return snapshot
+
+    def expose(self):
+        return self.registry.expose(self.snapshot())
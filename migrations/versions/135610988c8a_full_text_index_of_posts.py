@@ -0,0 +1,46 @@
+"""full-text index of posts
+
+Revision ID: 135610988c8a
+Revises: b8b571477f31
+Create Date: 2026-10-17 16:21:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '135610988c8a'
+down_revision = 'b8b571477f31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+        title, body, content='posts', content_rowid='uuid', tokenize='unicode61 remove_diacritics 2'
+    )''')
+    op.execute('''CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN
+        INSERT INTO posts_fts (rowid, title, body) VALUES (new.uuid, new.title, new.body);
+    END''')
+    op.execute('''CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN
+        INSERT INTO posts_fts (posts_fts, rowid, title, body) VALUES ('delete', old.uuid, old.title, old.body);
+    END''')
+    op.execute('''CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE OF title, body ON posts BEGIN
+        INSERT INTO posts_fts (posts_fts, rowid, title, body) VALUES ('delete', old.uuid, old.title, old.body);
+        INSERT INTO posts_fts (rowid, title, body) VALUES (new.uuid, new.title, new.body);
+    END''')
+    op.execute("INSERT INTO posts_fts (posts_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute('DROP TRIGGER IF EXISTS posts_fts_update')
+    op.execute('DROP TRIGGER IF EXISTS posts_fts_delete')
+    op.execute('DROP TRIGGER IF EXISTS posts_fts_insert')
+    op.execute('DROP TABLE IF EXISTS posts_fts')
@@ -0,0 +1,27 @@
+"""index posts by author
+
+Revision ID: 1ef4faf07901
+Revises: 135610988c8a
+Create Date: 2026-10-17 16:22:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1ef4faf07901'
+down_revision = '135610988c8a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # serves author_id lookups (User.posts, DeleteUser) as well, as its prefix
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.create_index('ix_posts_author_id_uuid', ['author_id', 'uuid'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.drop_index('ix_posts_author_id_uuid')
@@ -0,0 +1,59 @@
+"""jobs
+
+Revision ID: 4a8f3b6d2e71
+Revises: 7c2d9e0a4f13
+Create Date: 2026-10-17 18:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a8f3b6d2e71'
+down_revision = '7c2d9e0a4f13'
+branch_labels = None
+depends_on = None
+
+OPERATIONS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def upgrade():
+    op.create_table(
+        'jobs',
+        sa.Column('uuid', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=64), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('arguments', sa.JSON(), nullable=True),
+        sa.Column('progress', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=True),
+        sa.Column('failed', sa.Integer(), nullable=False),
+        sa.Column('message', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('uuid')
+    )
+
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_jobs_status_updated_at', ['status', 'updated_at'], unique=False)
+
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    # jobStatus answers GET queries with the ETag of the jobs table too
+    for operation in OPERATIONS:
+        op.execute('''CREATE TRIGGER IF NOT EXISTS jobs_version_{event} AFTER {operation} ON jobs BEGIN
+            INSERT INTO table_versions (name, version) VALUES ('jobs', 1)
+            ON CONFLICT (name) DO UPDATE SET version = version + 1;
+        END'''.format(event=operation.lower(), operation=operation))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for operation in OPERATIONS:
+            op.execute('DROP TRIGGER IF EXISTS jobs_version_{event}'.format(event=operation.lower()))
+
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_jobs_status_updated_at')
+
+    op.drop_table('jobs')
@@ -0,0 +1,48 @@
+"""table versions
+
+Revision ID: 7c2d9e0a4f13
+Revises: 1ef4faf07901
+Create Date: 2026-10-17 16:23:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2d9e0a4f13'
+down_revision = '1ef4faf07901'
+branch_labels = None
+depends_on = None
+
+TABLES = ('posts', 'users')
+OPERATIONS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def upgrade():
+    op.create_table(
+        'table_versions',
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    # the counters of ETags, bumped in the transaction of every write
+    for table in TABLES:
+        for operation in OPERATIONS:
+            op.execute('''CREATE TRIGGER IF NOT EXISTS {table}_version_{event} AFTER {operation} ON {table} BEGIN
+                INSERT INTO table_versions (name, version) VALUES ('{table}', 1)
+                ON CONFLICT (name) DO UPDATE SET version = version + 1;
+            END'''.format(table=table, event=operation.lower(), operation=operation))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for table in TABLES:
+            for operation in OPERATIONS:
+                op.execute('DROP TRIGGER IF EXISTS {table}_version_{event}'.format(table=table, event=operation.lower()))
+
+    op.drop_table('table_versions')
@@ -0,0 +1,52 @@
+"""users and posts
+
+Revision ID: b8b571477f31
+Revises: 
+Create Date: 2026-10-17 16:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8b571477f31'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'users',
+        sa.Column('uuid', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=256), nullable=True),
+        sa.Column('password', sa.String(length=256), nullable=True),
+        sa.PrimaryKeyConstraint('uuid')
+    )
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_username'), ['username'], unique=True)
+
+    op.create_table(
+        'posts',
+        sa.Column('uuid', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=256), nullable=True),
+        sa.Column('body', sa.Text(), nullable=True),
+        sa.Column('author_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['author_id'], ['users.uuid'], ),
+        sa.PrimaryKeyConstraint('uuid')
+    )
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_posts_title'), ['title'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_posts_title'))
+
+    op.drop_table('posts')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_username'))
+
+    op.drop_table('users')
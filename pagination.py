@@ -0,0 +1,93 @@
+from base64 import b64decode, b64encode
+
+from graphene.relay import PageInfo
+
+CURSOR_PREFIX = 'cursor:'
+
+
+def encode_cursor(value):
+    return b64encode((CURSOR_PREFIX + str(value)).encode('utf8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        value = b64decode(cursor.encode('ascii')).decode('utf8')
+    except (ValueError, UnicodeError):
+        raise Exception('Cursor inválido')
+
+    if not value.startswith(CURSOR_PREFIX):
+        raise Exception('Cursor inválido')
+
+    try:
+        return int(value[len(CURSOR_PREFIX):])
+    except ValueError:
+        raise Exception('Cursor inválido')
+
+
+def page_size(first, default, maximum):
+    if first is None:
+        return default
+
+    if first < 0:
+        raise Exception('O argumento first deve ser positivo')
+
+    return min(first, maximum)
+
+
+def keyset_page(connection_type, query, column, first, after=None):
+    """Returns ``connection_type`` holding up to ``first`` rows of ``query``
+    that come after the ``after`` cursor, ordered by ``column``.
+
+    The page is fetched with ``WHERE column > :cursor LIMIT first + 1`` (the
+    extra row only tells whether a next page exists), so its cost does not
+    depend on how deep the client has paginated.
+    """
+    if after is not None:
+        query = query.filter(column > decode_cursor(after))
+
+    rows = query.order_by(column).limit(first + 1).all()
+    has_next_page = len(rows) > first
+    rows = rows[:first]
+
+    edges = [
+        connection_type.Edge(node=row, cursor=encode_cursor(getattr(row, column.key)))
+        for row in rows
+    ]
+
+    page_info = PageInfo(
+        start_cursor=edges[0].cursor if edges else None,
+        end_cursor=edges[-1].cursor if edges else None,
+        has_previous_page=after is not None,
+        has_next_page=has_next_page,
+    )
+
+    return connection_type(edges=edges, page_info=page_info)
+
+
+def offset_page(connection_type, query, first, after=None, edge=None):
+    """Returns ``connection_type`` holding up to ``first`` rows of ``query``
+    after the ``after`` cursor, which counts rows from the start.
+
+    For orders no column can seek to, like a relevance rank; ``edge(row)``
+    gives the fields of the edge of each row (just its node by default).
+    """
+    offset = decode_cursor(after) + 1 if after is not None else 0
+    edge = edge or (lambda row: {'node': row})
+
+    rows = query.offset(offset).limit(first + 1).all()
+    has_next_page = len(rows) > first
+    rows = rows[:first]
+
+    edges = [
+        connection_type.Edge(cursor=encode_cursor(offset + i), **edge(row))
+        for i, row in enumerate(rows)
+    ]
+
+    page_info = PageInfo(
+        start_cursor=edges[0].cursor if edges else None,
+        end_cursor=edges[-1].cursor if edges else None,
+        has_previous_page=offset > 0,
+        has_next_page=has_next_page,
+    )
+
+    return connection_type(edges=edges, page_info=page_info)
@@ -0,0 +1,107 @@
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+
+import click
+from flask_migrate import upgrade
+from sqlalchemy import event
+
+EXPLAINED = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+# "SCAN posts" reads every row; index scans, virtual tables and constant
+# rows are reported as "SCAN posts USING INDEX ...", "SCAN posts_fts
+# VIRTUAL TABLE ..." and "SCAN CONSTANT ROW"
+FULL_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)(\w+)(?: AS \w+)?$')
+LIMIT = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+
+
+@contextmanager
+def captured_statements(engine):
+    """Collects the distinct statements run on ``engine``, with the
+    parameters of their first execution.
+    """
+    statements = {}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(EXPLAINED):
+            statements.setdefault(statement, parameters[0] if executemany else parameters)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def explain(connection, statement, parameters):
+    return [row[3] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+
+
+def full_scans(statement, plan):
+    """The tables ``plan`` reads in full.
+
+    A scan in primary key order that stops at a ``LIMIT`` (e.g. the first
+    page of getAllPosts) is bounded, unless the rows must be sorted first.
+    """
+    bounded = LIMIT.search(statement) and not any(step.startswith('USE TEMP B-TREE') for step in plan)
+
+    return [
+        match.group(1) for match in map(FULL_SCAN.match, plan)
+        if match and not bounded
+    ]
+
+
+def check_plans(posts=10000, iterations=2):
+    """Migrates a temporary database, seeds it, runs every benchmark scenario
+    and returns ``(statement, tables)`` for each statement that reads a
+    whole table.
+    """
+    import benchmark
+    from main import create_app, db
+
+    problems = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app('testing', SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(directory, 'plans.sqlite'))
+
+        with app.app_context():
+            upgrade(directory=app.config['MIGRATIONS_DIR'])
+            dataset = benchmark.seed(posts)
+
+            with db.engine.connect() as connection:
+                connection.exec_driver_sql('ANALYZE')
+
+            counter = benchmark.StatementCounter(db.engine)
+            client = app.test_client()
+
+            with captured_statements(db.engine) as statements:
+                for scenario in benchmark.SCENARIOS:
+                    benchmark.run_scenario(client, counter, dataset, scenario, iterations, 0)
+
+            with db.engine.connect() as connection:
+                for statement, parameters in statements.items():
+                    tables = full_scans(statement, explain(connection, statement, parameters))
+
+                    if tables:
+                        problems.append((statement, tables))
+
+            db.session.remove()
+            db.engine.dispose()
+
+    return problems
+
+
+@click.command('check-plans', help='Fail if the SQL of any resolver scans a whole table.')
+@click.option('--posts', default=10000, help='Posts to seed the temporary database with.')
+def check_plans_command(posts):
+    problems = check_plans(posts)
+
+    for statement, tables in problems:
+        click.echo('Full scan of %s:\n%s\n' % (', '.join(tables), statement.strip()), err=True)
+
+    if problems:
+        raise SystemExit(1)
+
+    click.echo('Nenhuma varredura completa de tabela')
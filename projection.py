@@ -0,0 +1,102 @@
+from collections import OrderedDict
+
+from graphene.utils.str_converters import to_snake_case
+from graphql.language import ast
+from sqlalchemy import inspect
+from sqlalchemy.orm import ColumnProperty, RelationshipProperty, joinedload, load_only, selectinload
+from sqlalchemy.orm.interfaces import MANYTOONE
+
+
+def collect_fields(selection_sets, fragments):
+    """Maps the name of every field selected in ``selection_sets`` to the
+    selection sets nested under it, expanding inline and named fragments.
+    """
+    fields = OrderedDict()
+
+    def collect(selection_set):
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.Field):
+                nested = fields.setdefault(selection.name.value, [])
+                if selection.selection_set:
+                    nested.append(selection.selection_set)
+            elif isinstance(selection, ast.InlineFragment):
+                collect(selection.selection_set)
+            elif selection.name.value in fragments:
+                collect(fragments[selection.name.value].selection_set)
+
+    for selection_set in selection_sets:
+        collect(selection_set)
+
+    return fields
+
+
+def selection_sets_at(info, path):
+    """Returns the selection sets of the resolved field, following ``path``
+    down (e.g. ``('edges', 'node')`` for a connection).
+    """
+    selection_sets = [field_ast.selection_set for field_ast in info.field_asts if field_ast.selection_set]
+
+    for name in path:
+        selection_sets = collect_fields(selection_sets, info.fragments).get(name, [])
+
+    return selection_sets
+
+
+def is_selected(info, *path):
+    """Tells whether the selection of the resolved field reaches ``path``."""
+    return path[-1] in collect_fields(selection_sets_at(info, path[:-1]), info.fragments)
+
+
+def load_options(model, fields, fragments, loader=None, required=()):
+    """Builds the loader options that load only the columns of ``model`` the
+    query asks for, plus eager loads of the relationships it selects: a
+    ``joinedload`` for many-to-one and a ``selectinload`` for collections.
+    """
+    mapper = inspect(model)
+    columns = set(mapper.primary_key) | set(required)
+    options = []
+
+    for name, selection_sets in fields.items():
+        prop = mapper.attrs.get(to_snake_case(name))
+
+        if isinstance(prop, ColumnProperty):
+            columns.update(prop.columns)
+
+        elif isinstance(prop, RelationshipProperty):
+            columns.update(prop.local_columns)
+
+            strategy = joinedload if prop.direction is MANYTOONE else selectinload
+            attribute = getattr(model, prop.key)
+            child_loader = strategy(attribute) if loader is None else getattr(loader, strategy.__name__)(attribute)
+
+            options += load_options(
+                prop.mapper.class_, collect_fields(selection_sets, fragments), fragments, child_loader,
+                required=prop.remote_side,
+            )
+
+    attributes = [getattr(model, mapper.get_property_by_column(column).key) for column in mapper.columns if column in columns]
+    options.append(load_only(*attributes) if loader is None else loader.load_only(*attributes))
+
+    return options
+
+
+def plan_query(query, model, info, *path):
+    """Restricts ``query`` to what the GraphQL selection of ``info`` reads."""
+    fields = collect_fields(selection_sets_at(info, path), info.fragments)
+
+    return query.options(*load_options(model, fields, info.fragments))
+
+
+def selected_columns(model, info, *path):
+    """The keys of the column attributes of ``model`` the selection reads."""
+    mapper = inspect(model)
+    fields = collect_fields(selection_sets_at(info, path), info.fragments)
+
+    return {
+        prop.key for prop in (mapper.attrs.get(to_snake_case(name)) for name in fields)
+        if isinstance(prop, ColumnProperty)
+    }
+
+
+def is_loaded(instance, attribute):
+    return attribute not in inspect(instance).unloaded
@@ -0,0 +1,368 @@
+import json
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import partial
+from hashlib import sha256
+from itertools import count
+from threading import Lock
+
+from graphql.backend.base import GraphQLBackend, GraphQLDocument
+from graphql.execution import ExecutionResult
+from graphql.language.printer import print_ast
+from sqlalchemy import Column, event, inspect
+from sqlalchemy.sql import Delete, Insert, Update, operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter
+
+from documents import LRUCache, query_hash
+
+# tags of the data read by the operation being executed, if it is cacheable
+read_tags = ContextVar('read_tags', default=None)
+
+
+def record(*tags):
+    tags_read = read_tags.get()
+
+    if tags_read is not None:
+        tags_read.update(tags)
+
+
+# tag of the data read from a replica: it may predate writes whose
+# invalidations have already fired, so results holding it are not cached
+REPLICA = 'replica'
+
+
+def row_tag(instance):
+    state = inspect(instance)
+
+    return '%s:%s' % (state.mapper.local_table.name, ','.join(str(key) for key in state.identity or ()))
+
+
+class CacheBackend(object):
+    """Storage of the response cache.
+
+    ``set`` stores ``value`` under ``key`` together with the ``tags`` of the
+    data it was computed from; ``invalidate`` drops every entry holding any
+    of the given tags. A backend shared by several workers (e.g. on Redis)
+    makes both visible to all of them.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, tags, since):
+        """Stores ``value`` unless one of ``tags`` was invalidated after
+        ``since`` (a value of ``clock()`` taken before computing it).
+        """
+        raise NotImplementedError
+
+    def invalidate(self, tags):
+        raise NotImplementedError
+
+    def clock(self):
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU with a time to live, indexed by tag.
+
+    Invalidations are remembered for ``invalidation_window`` seconds, so
+    the tags of every row ever written do not pile up; a result whose
+    execution started before the window is not cached.
+    """
+
+    def __init__(self, maxsize=10000, ttl=60, invalidation_window=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.invalidation_window = invalidation_window
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._keys_by_tag = {}
+        # tag -> (clock, monotonic time) of its last invalidation, oldest first
+        self._invalidated = OrderedDict()
+        self._forgotten = -1
+        self._clock = count()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return entry[1]
+
+    def set(self, key, value, tags, since):
+        with self._lock:
+            self._forget_invalidations()
+
+            if since < self._forgotten or any(self._invalidated.get(tag, (-1,))[0] > since for tag in tags):
+                return
+
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+
+            if len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tags):
+        with self._lock:
+            now = next(self._clock)
+            moment = time.monotonic()
+
+            for tag in tags:
+                self._invalidated[tag] = (now, moment)
+                self._invalidated.move_to_end(tag)
+
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._remove(key)
+
+            self._forget_invalidations()
+
+    def clock(self):
+        with self._lock:
+            return next(self._clock)
+
+    def _forget_invalidations(self):
+        horizon = time.monotonic() - self.invalidation_window
+
+        while self._invalidated:
+            tag, (clock, moment) = next(iter(self._invalidated.items()))
+
+            if moment >= horizon:
+                break
+
+            del self._invalidated[tag]
+            self._forgotten = max(self._forgotten, clock)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+
+        if entry is None:
+            return
+
+        for tag in entry[2]:
+            keys = self._keys_by_tag.get(tag)
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_tag[tag]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ResponseCache(object):
+    """Caches the results of query operations, keyed on the normalized
+    document, the operation name and the variables.
+
+    Each entry is tagged with what its execution read: the tables
+    (``posts``), the columns it filtered on (``posts.author_id``) and the
+    rows it loaded (``posts:7``). Inserts and deletes invalidate the table;
+    updates flushed by the ORM only invalidate the updated rows and the
+    changed columns, so updating post 7 keeps every entry that never saw it.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.normalized = LRUCache(maxsize=1000)
+
+    def key(self, document, operation_name, variables):
+        document_key = self.normalized.get(document.document_string)
+
+        if document_key is None:
+            document_key = query_hash(print_ast(document.document_ast))
+            self.normalized.set(document.document_string, document_key)
+
+        payload = json.dumps([document_key, operation_name, variables], sort_keys=True, default=str)
+
+        return sha256(payload.encode('utf8')).hexdigest()
+
+    def track(self, engine):
+        """Listens to ``engine`` to invalidate entries on inserts, deletes
+        and commits; the sessions and models are tracked by ``track_sessions``.
+        """
+        event.listen(engine, 'after_cursor_execute', self.on_cursor_execute)
+        event.listen(engine, 'commit', self.on_commit)
+
+    def on_load(self, instance, context):
+        record(row_tag(instance))
+
+    def on_refresh(self, instance, context, attributes):
+        record(row_tag(instance))
+
+    def on_orm_execute(self, orm_execute_state):
+        statement = getattr(orm_execute_state.statement, 'element', None)
+
+        # select(Model).from_statement(<dml>.returning(Model)): inserts and
+        # deletes are seen by on_cursor_execute
+        if isinstance(statement, Update):
+            self.on_update_returning(orm_execute_state, statement)
+
+        if isinstance(statement, (Insert, Update, Delete)):
+            return
+
+        tables = {mapper.local_table.name for mapper in orm_execute_state.all_mappers}
+
+        if orm_execute_state.is_select:
+            # the columns deciding which rows are read: a write to them may
+            # bring rows into the result, or push them past its LIMIT
+            whereclause = getattr(orm_execute_state.statement, 'whereclause', None)
+            clauses = list(getattr(orm_execute_state.statement, '_order_by_clauses', ()))
+
+            if whereclause is not None:
+                clauses.append(whereclause)
+
+            columns = [
+                '%s.%s' % (element.table.name, element.name)
+                for clause in clauses for element in visitors.iterate(clause) if isinstance(element, Column)
+            ]
+
+            record(*tables)
+            record(*columns)
+
+        elif orm_execute_state.is_update or orm_execute_state.is_delete:
+            self.invalidate(orm_execute_state.session, tables)
+
+    def on_update_returning(self, orm_execute_state, statement):
+        """Invalidates the row changed by an ``UPDATE ... WHERE <primary
+        key> = <value>`` and the columns it set, as a flush of the same
+        changes would; any other ``UPDATE`` invalidates the table.
+        """
+        table = statement.table
+        where = statement.whereclause
+        primary_key = list(table.primary_key)
+
+        if (isinstance(where, BinaryExpression) and where.operator is operators.eq and len(primary_key) == 1
+                and primary_key[0].shares_lineage(where.left) and isinstance(where.right, BindParameter)):
+            tags = {'%s:%s' % (table.name, where.right.effective_value)}
+            tags.update('%s.%s' % (table.name, getattr(column, 'key', column)) for column in statement._values)
+        else:
+            tags = {table.name}
+
+        self.invalidate(orm_execute_state.session, tags)
+
+    def on_before_flush(self, session, flush_context, instances):
+        tags = set()
+
+        for instance in session.dirty:
+            state = inspect(instance)
+            changed = [attr.key for attr in state.attrs if attr.history.has_changes()]
+
+            if changed:
+                table = state.mapper.local_table.name
+                tags.add(row_tag(instance))
+                tags.update('%s.%s' % (table, key) for key in changed)
+
+        for instance in session.deleted:
+            tags.add(row_tag(instance))
+
+        self.invalidate(session, tags)
+
+    def on_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context.isinsert or context.isdelete:
+            statement = context.compiled.statement
+
+            if not isinstance(statement, (Insert, Delete)):
+                # select(Model).from_statement(<dml>.returning(Model))
+                statement = statement.element
+
+            self.invalidate(conn, {statement.table.name})
+
+    def invalidate(self, owner, tags):
+        """Invalidates ``tags`` now, and again when the transaction of
+        ``owner`` (a session or a connection) commits, so that a read racing
+        the transaction cannot cache what it saw before the commit.
+        """
+        if tags:
+            self.backend.invalidate(tags)
+            owner.info.setdefault('cache_tags', set()).update(tags)
+
+    def on_commit(self, owner):
+        tags = owner.info.pop('cache_tags', None)
+
+        if tags:
+            self.backend.invalidate(tags)
+
+
+def track_sessions(session, model, cache_of):
+    """Listens to ``session`` to tag reads and invalidate entries on writes
+    of any subclass of ``model``, on behalf of the ``ResponseCache`` returned
+    by ``cache_of(session)``, if any.
+
+    The session class and the models are shared by every app, so this is
+    called once, rather than per cache like ``ResponseCache.track``.
+    """
+
+    def forward(handler, session_of):
+        def listener(*args):
+            cache = cache_of(session_of(*args))
+
+            if cache is not None:
+                handler(cache, *args)
+
+        return listener
+
+    event.listen(model, 'load', forward(
+        ResponseCache.on_load, lambda instance, context: context.session
+    ), propagate=True)
+    event.listen(model, 'refresh', forward(
+        ResponseCache.on_refresh, lambda instance, context, attributes: context.session
+    ), propagate=True)
+    event.listen(session, 'do_orm_execute', forward(ResponseCache.on_orm_execute, lambda state: state.session))
+    event.listen(session, 'before_flush', forward(ResponseCache.on_before_flush, lambda session, *args: session))
+    event.listen(session, 'after_commit', forward(ResponseCache.on_commit, lambda session: session))
+
+
+class ResponseCacheBackend(GraphQLBackend):
+    """Wraps ``backend`` so query operations are answered from ``cache``."""
+
+    def __init__(self, backend, cache):
+        self.backend = backend
+        self.cache = cache
+
+    def document_from_string(self, schema, request_string):
+        document = self.backend.document_from_string(schema, request_string)
+
+        return GraphQLDocument(
+            schema=document.schema,
+            document_string=document.document_string,
+            document_ast=document.document_ast,
+            execute=partial(self.execute, document),
+        )
+
+    def execute(self, document, *args, **kwargs):
+        operation_name = kwargs.get('operation_name')
+
+        if document.get_operation_type(operation_name) != 'query':
+            return document.execute(*args, **kwargs)
+
+        key = self.cache.key(document, operation_name, kwargs.get('variable_values'))
+        cached = self.cache.backend.get(key)
+
+        if cached is not None:
+            return ExecutionResult(data=cached['data'], extensions=dict(cached['extensions']))
+
+        since = self.cache.backend.clock()
+        token = read_tags.set(set())
+
+        try:
+            result = document.execute(*args, **kwargs)
+            tags = read_tags.get()
+        finally:
+            read_tags.reset(token)
+
+        if not result.errors and not result.invalid and REPLICA not in tags:
+            self.cache.backend.set(key, {'data': result.data, 'extensions': dict(result.extensions)}, tags, since)
+
+        return result
@@ -0,0 +1,167 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from itertools import count
+from threading import Lock
+
+from flask import g
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from graphql.backend.base import GraphQLBackend, GraphQLDocument
+from sqlalchemy import event, orm
+
+from response_cache import REPLICA, record
+
+# whether the statements of the operation being executed may read from a replica
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def replica_scope(allowed=True):
+    """Lets the statements run inside it read from a replica, if ``allowed``."""
+    token = replica_reads.set(allowed)
+
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def sqlite_file_lag(primary, replica):
+    """How far behind the SQLite file of ``replica`` is, in seconds: how
+    much later than it the file (or write-ahead log) of ``primary`` was
+    last written. Suits replicas kept up to date by copying the file or
+    its WAL (e.g. Litestream or LiteFS).
+    """
+
+    def modified(engine):
+        path = engine.url.database
+
+        return max(
+            (os.path.getmtime(name) for name in (path, path + '-wal') if os.path.exists(name)), default=0
+        )
+
+    return max(modified(primary) - modified(replica), 0)
+
+
+def no_lag(primary, replica):
+    return 0
+
+
+class ReplicaSet(object):
+    """Picks the replica engine that serves the reads of a session.
+
+    ``strategy`` is ``round_robin`` or ``least_connections`` (the replica
+    with the fewest connections checked out). Replicas more than
+    ``max_lag`` seconds behind ``primary``, as measured by ``lag(primary,
+    replica)`` at most every ``lag_interval`` seconds, are left out; when
+    every replica is behind, the primary serves the reads.
+    """
+
+    def __init__(self, primary, replicas, strategy='round_robin', max_lag=None, lag=None, lag_interval=1.0):
+        if strategy not in ('round_robin', 'least_connections'):
+            raise ValueError('Unknown replica strategy %r' % strategy)
+
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.lag = lag or (sqlite_file_lag if primary.dialect.name == 'sqlite' else no_lag)
+        self.lag_interval = lag_interval
+        self.connections = {replica: 0 for replica in self.replicas}
+        self._lags = {}
+        self._turn = count()
+        self._lock = Lock()
+
+        for replica in self.replicas:
+            event.listen(replica, 'checkout', partial(self.on_checkout, replica))
+            event.listen(replica, 'checkin', partial(self.on_checkin, replica))
+
+    def on_checkout(self, replica, *args):
+        with self._lock:
+            self.connections[replica] += 1
+
+    def on_checkin(self, replica, *args):
+        with self._lock:
+            self.connections[replica] -= 1
+
+    def is_behind(self, replica):
+        if self.max_lag is None:
+            return False
+
+        now = time.monotonic()
+        measured = self._lags.get(replica)
+
+        if measured is None or now - measured[1] >= self.lag_interval:
+            measured = self._lags[replica] = (self.lag(self.primary, replica), now)
+
+        return measured[0] > self.max_lag
+
+    def choose(self):
+        replicas = [replica for replica in self.replicas if not self.is_behind(replica)]
+
+        if not replicas:
+            return self.primary
+
+        with self._lock:
+            if self.strategy == 'least_connections':
+                return min(replicas, key=self.connections.get)
+
+            return replicas[next(self._turn) % len(replicas)]
+
+
+class RoutingSession(SignallingSession):
+    """Sends the SELECTs of operations allowed to read from a replica (see
+    ``replica_reads``) to the replica picked for the session, and every
+    other statement to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        replicas = self.app.extensions.get('graphql', {}).get('replicas')
+
+        if replicas is not None and replica_reads.get() and getattr(clause, 'is_select', False):
+            if 'replica' not in self.info:
+                self.info['replica'] = replicas.choose()
+
+            if self.info['replica'] is not replicas.primary:
+                record(REPLICA)
+
+            return self.info['replica']
+
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+class ReplicaRoutingBackend(GraphQLBackend):
+    """Wraps ``backend`` so query operations read from the replicas, unless
+    an earlier operation of the same request wrote: then, like mutations,
+    they run on the primary and see those writes.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def document_from_string(self, schema, request_string):
+        document = self.backend.document_from_string(schema, request_string)
+
+        return GraphQLDocument(
+            schema=document.schema,
+            document_string=document.document_string,
+            document_ast=document.document_ast,
+            execute=partial(self.execute, document),
+        )
+
+    def execute(self, document, *args, **kwargs):
+        if document.get_operation_type(kwargs.get('operation_name')) != 'query':
+            g.wrote = True
+
+            return document.execute(*args, **kwargs)
+
+        with replica_scope(not g.get('wrote', False)):
+            return document.execute(*args, **kwargs)
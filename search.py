@@ -0,0 +1,107 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import DDL, event, func, literal_column
+from sqlalchemy.sql import column, table
+
+from response_cache import record
+
+SEARCH_TABLE = 'posts_fts'
+
+# an external content table: the index stores no copy of the posts, and the
+# triggers keep it in sync with every insert, update and delete of posts
+SEARCH_DDL = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+        title, body, content='posts', content_rowid='uuid', tokenize='unicode61 remove_diacritics 2'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN
+        INSERT INTO posts_fts (rowid, title, body) VALUES (new.uuid, new.title, new.body);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN
+        INSERT INTO posts_fts (posts_fts, rowid, title, body) VALUES ('delete', old.uuid, old.title, old.body);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE OF title, body ON posts BEGIN
+        INSERT INTO posts_fts (posts_fts, rowid, title, body) VALUES ('delete', old.uuid, old.title, old.body);
+        INSERT INTO posts_fts (rowid, title, body) VALUES (new.uuid, new.title, new.body);
+    END''',
+]
+
+# a match in the title weighs as much as ten in the body
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+SNIPPET_TOKENS = 16
+
+posts_fts = table(SEARCH_TABLE, column('rowid'))
+
+
+def create_search_index(connection):
+    for statement in SEARCH_DDL:
+        connection.execute(DDL(statement))
+
+
+def rebuild_search_index(connection):
+    """Creates the index if needed and fills it with every existing post."""
+    create_search_index(connection)
+    connection.execute(DDL("INSERT INTO posts_fts (posts_fts) VALUES ('rebuild')"))
+
+
+def track_search_index(posts):
+    """Creates the index and its triggers with the ``posts`` table."""
+    for statement in SEARCH_DDL:
+        event.listen(posts, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+
+
+def match_expression(terms):
+    """Turns what a user typed into an FTS5 query matching every word.
+
+    Each word is quoted, so quotes, parentheses and operators (``AND``,
+    ``NEAR``, ``-``) are searched for instead of breaking the query; a
+    trailing ``*`` is kept as a prefix search.
+    """
+    words = []
+
+    for word in terms.split():
+        prefix = word.endswith('*') and len(word) > 1
+        word = word.rstrip('*')
+
+        if word:
+            words.append('"%s"%s' % (word.replace('"', '""'), '*' if prefix else ''))
+
+    return ' '.join(words)
+
+
+def search_query(query, model, terms):
+    """Restricts ``query`` of ``model`` to the rows matching ``terms``, best
+    matches first, adding their bm25 rank and a highlighted snippet of the
+    body as the two last columns.
+    """
+    # the MATCH reads the indexed columns through posts_fts, where the
+    # response cache does not see them
+    record('posts.title', 'posts.body')
+
+    rank = func.bm25(literal_column(SEARCH_TABLE), TITLE_WEIGHT, BODY_WEIGHT).label('rank')
+    snippet = func.snippet(literal_column(SEARCH_TABLE), 1, '<b>', '</b>', '…', SNIPPET_TOKENS).label('snippet')
+
+    return (
+        query.add_columns(rank, snippet)
+        .join(posts_fts, posts_fts.c.rowid == model.uuid)
+        .filter(literal_column(SEARCH_TABLE).op('MATCH')(match_expression(terms)))
+        .order_by(rank, model.uuid)
+    )
+
+
+@click.group('search', help='Manage the full-text index of the posts.')
+def search_cli():
+    pass
+
+
+@search_cli.command('rebuild', help='Create the index of the posts and fill it with the existing ones.')
+@with_appcontext
+def rebuild_command():
+    engine = current_app.extensions['sqlalchemy'].db.engine
+
+    with engine.begin() as connection:
+        rebuild_search_index(connection)
+
+    click.echo('Índice de busca reconstruído')
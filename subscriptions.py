@@ -0,0 +1,286 @@
+import json
+import logging
+import threading
+from collections import defaultdict
+from contextlib import nullcontext
+from queue import Empty, Full, Queue
+from threading import Lock
+
+from flask import Response, request
+from graphql import GraphQLError, parse
+from graphql.error import format_error
+from graphql.execution import execute
+from graphql.execution.values import get_argument_values, get_variable_values
+from graphql.language import ast
+from graphql.validation import validate
+
+from cost import get_operation
+
+logger = logging.getLogger(__name__)
+
+
+def channel_name(field_name, arguments=None):
+    """The channel of the events of a subscription field, e.g.
+    ``postUpdated(post_id=7)`` for ``postUpdated(postId: 7)``.
+    """
+    if not arguments:
+        return field_name
+
+    return '%s(%s)' % (field_name, ','.join('%s=%s' % item for item in sorted(arguments.items())))
+
+
+class Broker(object):
+    """Carries the events published by the mutations to the subscription
+    manager of every node.
+
+    ``publish`` sends ``message``, a JSON-serializable dict, on
+    ``channel``; ``subscribe`` registers ``listener(channel, message)`` to
+    be called for every message published by any node. A broker on top of
+    a shared pub/sub (e.g. Redis) lets subscribers connected to one node
+    see the writes made on another.
+
+    ``local`` tells whether the messages only reach this process, so that
+    nobody else may be listening to a channel without subscribers here.
+    """
+    local = False
+
+    def publish(self, channel, message):
+        raise NotImplementedError
+
+    def subscribe(self, listener):
+        raise NotImplementedError
+
+
+class MemoryBroker(Broker):
+    """Delivers messages to the listeners of this process only."""
+    local = True
+
+    def __init__(self):
+        self.listeners = []
+
+    def publish(self, channel, message):
+        for listener in self.listeners:
+            listener(channel, message)
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+
+class Subscriber(object):
+    """The frames waiting to be sent to one client."""
+
+    def __init__(self, group, maxsize):
+        self.group = group
+        self.frames = Queue(maxsize)
+        self.overflowed = False
+
+    def send(self, frame):
+        try:
+            self.frames.put_nowait(frame)
+        except Full:
+            # a client that cannot keep up is dropped; EventSource reconnects
+            self.overflowed = True
+
+
+class Group(object):
+    """Subscribers of the same document, operation and variables: each
+    event is executed and serialized once for all of them.
+    """
+
+    def __init__(self, key, channel, document_ast, operation_name, variables):
+        self.key = key
+        self.channel = channel
+        self.document_ast = document_ast
+        self.operation_name = operation_name
+        self.variables = variables
+        self.subscribers = set()
+
+
+def as_query(document_ast):
+    """The subscription operations of ``document_ast`` as query operations,
+    to run them once per event against the schema of events.
+    """
+    return ast.Document(definitions=[
+        ast.OperationDefinition(
+            operation='query', name=definition.name, variable_definitions=definition.variable_definitions,
+            directives=definition.directives, selection_set=definition.selection_set,
+        ) if isinstance(definition, ast.OperationDefinition) else definition
+        for definition in document_ast.definitions
+    ])
+
+
+class SubscriptionManager(object):
+    """Runs the subscriptions of ``schema``.
+
+    Events from ``broker`` are queued and handled by a dispatcher thread,
+    so publishing never slows the mutation down. For every group of
+    subscribers listening to the event's channel, the subscription is
+    executed against ``event_schema`` (whose query type is the
+    subscription type), with the event as root value, inside ``scope()``;
+    the result is serialized once into a Server-Sent Events frame and the
+    same frame is queued for each subscriber of the group.
+    """
+
+    def __init__(self, schema, event_schema, broker=None, scope=None, queue_size=100):
+        self.schema = schema
+        self.event_schema = event_schema
+        self.broker = broker or MemoryBroker()
+        self.scope = scope or nullcontext
+        self.queue_size = queue_size
+        self.channels = defaultdict(dict)
+        self.events = Queue()
+        self._dispatcher = None
+        self._lock = Lock()
+
+        self.broker.subscribe(self.on_message)
+
+    def publish(self, field_name, message, **arguments):
+        self.broker.publish(channel_name(field_name, arguments), message)
+
+    def listening(self, field_name, **arguments):
+        """Tells whether an event of ``field_name(**arguments)`` may reach a
+        subscriber, here or, through a shared broker, on another node.
+        """
+        return not self.broker.local or channel_name(field_name, arguments) in self.channels
+
+    def on_message(self, channel, message):
+        if channel in self.channels:
+            self.events.put((channel, message))
+
+    def subscribe(self, query, variables=None, operation_name=None):
+        """Registers a subscriber to the subscription operation in ``query``;
+        raises GraphQLError when it is invalid.
+        """
+        document_ast = parse(query)
+        errors = validate(self.schema, document_ast)
+
+        if errors:
+            raise errors[0]
+
+        operation = get_operation(document_ast, operation_name)
+
+        if operation is None or operation.operation != 'subscription':
+            raise GraphQLError('Informe uma operação subscription')
+
+        selections = operation.selection_set.selections
+
+        # the field names the channel, so it may not hide in a fragment
+        if len(selections) != 1 or not isinstance(selections[0], ast.Field):
+            raise GraphQLError('Uma subscription deve selecionar exatamente um campo')
+
+        field_ast = selections[0]
+        field = self.schema.get_subscription_type().fields[field_ast.name.value]
+        coerced = get_variable_values(self.schema, operation.variable_definitions or [], variables)
+        channel = channel_name(field_ast.name.value, get_argument_values(field.args, field_ast.arguments, coerced))
+
+        key = (query, operation_name, json.dumps(variables, sort_keys=True, default=str))
+
+        with self._lock:
+            groups = self.channels[channel]
+            group = groups.get(key)
+
+            if group is None:
+                group = groups[key] = Group(key, channel, as_query(document_ast), operation_name, variables)
+
+            subscriber = Subscriber(group, self.queue_size)
+            group.subscribers.add(subscriber)
+
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self.dispatch, name='subscriptions', daemon=True)
+                self._dispatcher.start()
+
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        group = subscriber.group
+
+        with self._lock:
+            group.subscribers.discard(subscriber)
+
+            if not group.subscribers:
+                groups = self.channels.get(group.channel, {})
+                groups.pop(group.key, None)
+
+                if not groups:
+                    self.channels.pop(group.channel, None)
+
+    def dispatch(self):
+        while True:
+            channel, message = self.events.get()
+
+            with self._lock:
+                groups = [
+                    (group, list(group.subscribers)) for group in self.channels.get(channel, {}).values()
+                ]
+
+            for group, subscribers in groups:
+                try:
+                    frame = self.frame(group, message)
+                except Exception:
+                    logger.exception('Failed to execute the subscription of %s', group.channel)
+                    continue
+
+                for subscriber in subscribers:
+                    subscriber.send(frame)
+
+    def frame(self, group, message):
+        with self.scope():
+            result = execute(
+                self.event_schema, group.document_ast, root_value=message,
+                variable_values=group.variables, operation_name=group.operation_name
+            )
+
+            # serialized inside the scope, while lazy attributes can still load
+            payload = json.dumps(result.to_dict(), separators=(',', ':'))
+
+        return ('event: next\ndata: %s\n\n' % payload).encode('utf8')
+
+
+def stream(subscriber, manager, keepalive=15.0):
+    """Yields the frames of ``subscriber`` as they arrive, with a comment
+    every ``keepalive`` seconds so proxies keep the connection open.
+    """
+    try:
+        yield b': subscribed\n\n'
+
+        while not subscriber.overflowed:
+            try:
+                yield subscriber.frames.get(timeout=keepalive)
+            except Empty:
+                yield b': keepalive\n\n'
+    finally:
+        manager.unsubscribe(subscriber)
+
+
+def subscription_view(manager, keepalive=15.0):
+    """The Server-Sent Events endpoint: ``query``, ``variables`` (as JSON)
+    and ``operationName`` come in the query string, as EventSource only
+    sends GET requests, or in a JSON body.
+    """
+
+    def view():
+        data = request.get_json(silent=True) or request.args
+        variables = data.get('variables')
+
+        try:
+            if isinstance(variables, str):
+                variables = json.loads(variables)
+
+            subscriber = manager.subscribe(data.get('query') or '', variables, data.get('operationName'))
+        except ValueError:
+            return Response(
+                json.dumps({'errors': [{'message': 'Variables are invalid JSON.'}]}),
+                status=400, content_type='application/json'
+            )
+        except GraphQLError as e:
+            return Response(
+                json.dumps({'errors': [format_error(e)]}), status=400, content_type='application/json'
+            )
+
+        return Response(
+            stream(subscriber, manager, keepalive),
+            content_type='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+
+    return view
@@ -0,0 +1,41 @@
+import pytest
+from sqlalchemy import event
+
+import benchmark
+from main import create_app, db
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Builds apps of the testing profile, with ``config`` on top, on a
+    SQLite file of the test: seeded with ``benchmark.seed(posts)``, or only
+    its tables created. The statements an app runs afterwards are kept in
+    ``app.statements``.
+    """
+    apps = []
+
+    def make_app(posts=None, **config):
+        app = create_app('testing', SQLALCHEMY_DATABASE_URI='sqlite:///%s' % (tmp_path / 'data.sqlite'), **config)
+
+        with app.app_context():
+            if posts is None:
+                db.create_all()
+            else:
+                benchmark.seed(posts)
+
+            db.session.remove()
+
+        statements = []
+        event.listen(db.get_engine(app), 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        app.statements = statements
+
+        apps.append(app)
+
+        return app
+
+    yield make_app
+
+    for app in apps:
+        # jobs still running in the background would outlive the database
+        app.extensions['graphql']['jobs'].wait()
+        db.get_engine(app).dispose()
@@ -0,0 +1,141 @@
+import threading
+
+import pytest
+
+from admission import ConcurrencyLimiter, RateLimiter
+
+GET_USERS = '{ getAllUsers { username } }'
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimiter:
+
+    def test_costs_are_taken_from_the_bucket_of_the_client(self):
+        clock = Clock()
+        limiter = RateLimiter(rate=10, capacity=100, clock=clock)
+
+        assert limiter.take('a', 60) == 0
+        assert limiter.take('a', 60) == pytest.approx(2.0)
+        assert limiter.take('b', 60) == 0
+
+        clock.now = 2.0
+
+        assert limiter.take('a', 60) == 0
+
+    def test_operations_costlier_than_the_burst_take_a_full_bucket(self):
+        limiter = RateLimiter(rate=10, capacity=100, clock=Clock())
+
+        assert limiter.take('a', 1000) == 0
+        assert limiter.take('a', 1) == pytest.approx(0.1)
+
+    def test_only_the_latest_clients_are_remembered(self):
+        limiter = RateLimiter(rate=10, capacity=100, max_clients=2, clock=Clock())
+
+        for client in 'abc':
+            limiter.take(client, 100)
+
+        # "a" was forgotten, and starts again with a full bucket
+        assert limiter.take('a', 100) == 0
+        assert limiter.take('c', 100) > 0
+
+
+class TestConcurrencyLimiter:
+
+    def test_overflow_is_turned_away(self):
+        limiter = ConcurrencyLimiter(1, max_waiting=0)
+
+        assert limiter.acquire()
+        assert not limiter.acquire()
+
+        limiter.release()
+
+        assert limiter.acquire()
+
+    def test_waiting_for_a_slot(self):
+        limiter = ConcurrencyLimiter(1, max_waiting=1, timeout=5)
+        limiter.acquire()
+
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(limiter.acquire()))
+        waiter.start()
+
+        while not limiter.waiting:
+            pass
+
+        # the queue is full
+        assert not limiter.acquire()
+
+        limiter.release()
+        waiter.join()
+
+        assert results == [True] and limiter.running == 1
+
+    def test_waiting_times_out(self):
+        limiter = ConcurrencyLimiter(1, max_waiting=1, timeout=0.01)
+        limiter.acquire()
+
+        assert not limiter.acquire()
+        assert limiter.waiting == 0
+
+
+class TestAdmission:
+
+    def test_clients_over_their_rate_are_turned_away(self, make_app):
+        app = make_app(GRAPHQL_RATE_LIMIT=1, GRAPHQL_RATE_LIMIT_BURST=3)
+        client = app.test_client()
+
+        for _ in range(3):
+            assert client.post('/graphql', json={"query": GET_USERS}).status_code == 200
+
+        del app.statements[:]
+        response = client.post('/graphql', json={"query": GET_USERS})
+
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '1'
+        assert response.get_json()['errors'][0]['message'] == 'Limite de requisições excedido'
+        assert app.statements == []
+
+        # another client has its own bucket
+        response = client.post('/graphql', json={"query": GET_USERS}, environ_base={'REMOTE_ADDR': '10.0.0.2'})
+
+        assert response.status_code == 200
+
+    def test_costly_operations_take_more_tokens(self, make_app):
+        app = make_app(GRAPHQL_RATE_LIMIT=1, GRAPHQL_RATE_LIMIT_BURST=1500)
+        client = app.test_client()
+
+        # 1 + 1000 users * (1 for their posts)
+        assert client.post('/graphql', json={"query": '{ getAllUsers { posts { uuid } } }'}).status_code == 200
+
+        response = client.post('/graphql', json={"query": '{ getAllUsers { posts { uuid } } }'})
+
+        assert response.status_code == 429 and int(response.headers['Retry-After']) > 500
+
+    def test_overload_is_shed(self, make_app):
+        app = make_app(GRAPHQL_MAX_CONCURRENT=0, GRAPHQL_MAX_WAITING=0)
+        response = app.test_client().post('/graphql', json={"query": GET_USERS})
+
+        assert response.status_code == 429
+        assert response.get_json()['errors'][0]['message'] == 'Servidor sobrecarregado'
+        assert app.statements == []
+
+        metrics = app.extensions['graphql']['metrics'].snapshot()
+
+        assert metrics['graphql_rejected_operations_total'] == {('overloaded',): [1.0]}
+
+    def test_slots_are_given_back(self, make_app):
+        app = make_app(GRAPHQL_MAX_CONCURRENT=1, GRAPHQL_MAX_WAITING=0)
+        client = app.test_client()
+
+        for _ in range(3):
+            assert client.post('/graphql', json={"query": GET_USERS}).status_code == 200
+
+        assert app.extensions['graphql']['concurrency'].running == 0
@@ -0,0 +1,72 @@
+import pytest
+
+from main import db, User
+
+GET_USER = '''
+    query ($userId: Int) {
+        getUser (userId: $userId) {
+            username
+            posts {
+                title
+            }
+        }
+    }
+'''
+
+
+class TestBatch:
+
+    @pytest.fixture
+    def app(self, make_app):
+        app = make_app(GRAPHQL_MAX_BATCH_COST=5)
+
+        with app.app_context():
+            db.session.add(User(username='author', password='x'))
+            db.session.commit()
+            app.user_id = db.session.query(User.uuid).scalar()
+            db.session.remove()
+
+        del app.statements[:]
+
+        return app
+
+    def post(self, app, operations):
+        return app.test_client().post('/graphql', json=operations)
+
+    def test_operations_share_the_loaded_rows(self, app):
+        operations = [{"query": GET_USER, "variables": {"userId": app.user_id}}] * 2
+        response = self.post(app, operations)
+
+        assert response.status_code == 200
+        assert [result['data']['getUser']['username'] for result in response.get_json()] == ['author', 'author']
+
+        # the user and its posts, fetched by the first operation only
+        assert len(app.statements) == 2
+
+    def test_reads_after_a_mutation_see_its_writes(self, app):
+        create_post = 'mutation { CreatePost (title: "new", body: "body", username: "author") { ok } }'
+        operations = [
+            {"query": GET_USER, "variables": {"userId": app.user_id}},
+            {"query": create_post},
+            {"query": GET_USER, "variables": {"userId": app.user_id}},
+        ]
+
+        results = self.post(app, operations).get_json()
+
+        assert results[0]['data']['getUser']['posts'] == []
+        assert results[2]['data']['getUser']['posts'] == [{'title': 'new'}]
+
+    def test_batch_size_is_limited(self, app):
+        operations = [{"query": GET_USER, "variables": {"userId": app.user_id}}] * 21
+        response = self.post(app, operations)
+
+        assert response.status_code == 400
+        assert response.get_json()['errors'][0]['message'] == 'O lote excede o máximo de 20 operações'
+
+    def test_batch_cost_is_limited(self, app):
+        # each operation costs 2: three of them go over the budget of 5
+        operations = [{"query": GET_USER, "variables": {"userId": app.user_id}}] * 3
+        results = self.post(app, operations).get_json()
+
+        assert 'errors' not in results[0] and 'errors' not in results[1]
+        assert results[2]['errors'][0]['message'] == 'O lote excede o custo máximo restante de 1 (custo 2)'
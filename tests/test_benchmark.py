@@ -0,0 +1,29 @@
+import benchmark
+from main import schema
+
+
+class TestBenchmark:
+
+    def test_scenarios_cover_every_root_field(self):
+        fields = list(schema.get_query_type().fields) + list(schema.get_mutation_type().fields)
+        queries = ' '.join(scenario.query for scenario in benchmark.SCENARIOS)
+
+        missing = [name for name in fields if name not in queries]
+
+        assert not missing
+
+    def test_run_reports_every_scenario(self):
+        report = benchmark.run(200, iterations=2, warmup=1)
+
+        assert report['meta']['posts'] == 200 and report['meta']['users'] == 20
+        assert set(report['results']) == {scenario.name for scenario in benchmark.SCENARIOS}
+
+        for metrics in report['results'].values():
+            assert metrics['errors'] == 0
+            assert metrics['sql_statements'] >= 1
+            assert metrics['p99_ms'] >= metrics['p50_ms'] > 0
+
+    def test_parse_scale(self):
+        assert benchmark.parse_scale('100k') == 100000
+        assert benchmark.parse_scale('1M') == 1000000
+        assert benchmark.parse_scale('5000') == 5000
@@ -0,0 +1,116 @@
+import json
+
+import pytest
+from fakerabbit import FakeRabbit
+
+from bulk import chunked
+from main import db, Post, User
+
+
+class TestBulk:
+
+    @pytest.fixture
+    def app(self, make_app):
+        app = make_app(20)
+
+        with app.app_context():
+            yield app
+
+            db.session.remove()
+
+    def execute(self, app, query_graphql, variables):
+        query = {"query": query_graphql, "variables": variables}
+
+        return json.loads(app.test_client().post('/graphql', json=query).data)
+
+    def create_posts(self, app, posts):
+        query_graphql = '''
+            mutation ($posts: [PostInput!]!) {
+                CreatePosts (posts: $posts) {
+                    ok
+                    message
+                    results {
+                        ok
+                        message
+                        post {
+                            uuid
+                            title
+                        }
+                    }
+                }
+            }
+        '''
+
+        return self.execute(app, query_graphql, {"posts": posts})['data']['CreatePosts']
+
+    def test_chunked(self):
+        assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+    def test_create_posts_inserts_in_database(self, app):
+        username = db.session.query(User.username).first()[0]
+        posts = [{"title": FakeRabbit.random_str(), "body": FakeRabbit.random_str(20), "username": username}
+                 for _ in range(3)]
+
+        response = self.create_posts(app, posts)
+
+        assert response['ok'] is True
+        for post, result in zip(posts, response['results']):
+            new_post = db.session.query(Post).filter_by(uuid=result['post']['uuid']).one_or_none()
+            assert new_post and new_post.title == post['title']
+
+    def test_create_posts_reports_invalid_user_per_item(self, app):
+        username = db.session.query(User.username).first()[0]
+        posts = [
+            {"title": FakeRabbit.random_str(), "body": FakeRabbit.random_str(20), "username": username},
+            {"title": FakeRabbit.random_str(), "body": FakeRabbit.random_str(20), "username": FakeRabbit.random_str(11)},
+        ]
+
+        response = self.create_posts(app, posts)
+
+        assert response['ok'] is False
+        assert [result['ok'] for result in response['results']] == [True, False]
+        assert response['results'][1]['message'] == "Usuário inválido"
+
+    def test_create_users_rejects_repeated_usernames(self, app):
+        username = FakeRabbit.random_str(11)
+        users = [{"username": username, "password": "123"}, {"username": username, "password": "456"}]
+
+        query_graphql = '''
+            mutation ($users: [UserInput!]!) {
+                CreateUsers (users: $users) {
+                    ok
+                    results {
+                        ok
+                        message
+                    }
+                }
+            }
+        '''
+
+        response = self.execute(app, query_graphql, {"users": users})['data']['CreateUsers']
+
+        assert [result['ok'] for result in response['results']] == [True, False]
+        assert db.session.query(User).filter_by(username=username).count() == 1
+
+    def test_delete_posts_removes_from_database(self, app):
+        username = db.session.query(User.username).first()[0]
+        posts = [{"title": FakeRabbit.random_str(), "body": FakeRabbit.random_str(20), "username": username}
+                 for _ in range(2)]
+        post_ids = [int(result['post']['uuid']) for result in self.create_posts(app, posts)['results']]
+
+        query_graphql = '''
+            mutation ($post_ids: [Int!]!) {
+                DeletePosts (postIds: $post_ids) {
+                    ok
+                    results {
+                        postId
+                        ok
+                    }
+                }
+            }
+        '''
+
+        response = self.execute(app, query_graphql, {"post_ids": post_ids + [99999999]})['data']['DeletePosts']
+
+        assert [result['ok'] for result in response['results']] == [True, True, False]
+        assert db.session.query(Post).filter(Post.uuid.in_(post_ids)).count() == 0
@@ -0,0 +1,26 @@
+from main import create_app, db
+
+
+class TestConfig:
+
+    def test_production_profile(self, tmp_path):
+        app = create_app('production', SQLALCHEMY_DATABASE_URI='sqlite:///%s' % (tmp_path / 'data.sqlite'))
+
+        assert app.debug is False
+        assert app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] is False
+
+        with app.app_context():
+            connection = db.engine.raw_connection()
+            cursor = connection.cursor()
+
+            assert cursor.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+            assert cursor.execute('PRAGMA synchronous').fetchone()[0] == 1
+            assert cursor.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+
+            connection.close()
+
+    def test_development_profile(self):
+        app = create_app('development', SQLALCHEMY_DATABASE_URI='sqlite://')
+
+        assert app.debug is True
+        assert app.config['SQLITE_PRAGMAS'] == {}
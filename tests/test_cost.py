@@ -0,0 +1,107 @@
+import json
+
+from graphql import parse
+
+from cost import CostAnalyzer
+from main import app, schema
+
+
+class TestCost:
+
+    analyzer = CostAnalyzer(
+        list_sizes={'Query.getAllUsers': 100}, default_list_size=10, default_page_size=20, max_page_size=100
+    )
+
+    def analyze(self, query_graphql, variables=None):
+        return self.analyzer.analyze(schema, parse(query_graphql), variable_values=variables)
+
+    def test_scalar_fields_are_free(self):
+        cost = self.analyze('{ getPost(postId: 1) { uuid title } }')
+
+        assert cost.cost == 1 and cost.depth == 2
+
+    def test_list_fields_multiply_their_selections(self):
+        cost = self.analyze('{ getAllUsers { username posts { title } } }')
+
+        assert cost.cost == 1 + 100 * (1 + 10 * 0)
+        assert cost.depth == 3
+
+    def test_first_argument_is_the_list_size(self):
+        query_graphql = '''
+            query ($first: Int) {
+                posts (first: $first) {
+                    edges {
+                        node {
+                            author {
+                                username
+                            }
+                        }
+                    }
+                }
+            }
+        '''
+
+        assert self.analyze(query_graphql, {"first": 5}).cost == 1 + 5 * (1 + 1 + 1)
+        assert self.analyze(query_graphql).cost == 1 + 20 * (1 + 1 + 1)
+
+        # clamped as the page the resolver returns
+        assert self.analyze(query_graphql, {"first": 1000}).cost == 1 + 100 * (1 + 1 + 1)
+        assert self.analyze(query_graphql, {"first": -100000}).cost == 1
+
+    def test_fragments_are_expanded(self):
+        query_graphql = '''
+            {
+                getUser (userId: 1) {
+                    ...userPosts
+                }
+            }
+
+            fragment userPosts on UserType {
+                posts {
+                    title
+                }
+            }
+        '''
+
+        cost = self.analyze(query_graphql)
+
+        assert cost.cost == 2 and cost.depth == 3
+
+    def test_deep_query_is_rejected_before_execution(self):
+        query_graphql = '''
+            {
+                getAllUsers {
+                    posts {
+                        author {
+                            posts {
+                                author {
+                                    posts {
+                                        author {
+                                            posts {
+                                                author {
+                                                    posts {
+                                                        title
+                                                    }
+                                                }
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        '''
+
+        response = app.test_client().post('/graphql', json={"query": query_graphql})
+
+        assert response.status_code == 400
+        assert 'data' not in json.loads(response.data)
+
+    def test_cost_is_returned_in_extensions(self):
+        query_graphql = '{ getAllPosts { title } }'
+
+        response = json.loads(app.test_client().post('/graphql', json={"query": query_graphql}).data)
+
+        assert response['extensions']['cost']['requestedQueryCost'] == 1
@@ -0,0 +1,119 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+
+import deadlines
+from deadlines import current_deadline, interrupt_on_deadline
+from main import db
+
+# a statement running for as long as it is let
+ENDLESS = 'WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n'
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestInterruption:
+
+    def test_statements_are_interrupted_past_the_deadline(self):
+        engine = create_engine('sqlite://')
+        interrupt_on_deadline(engine)
+
+        token = current_deadline.set(0)
+
+        try:
+            with engine.connect() as connection, pytest.raises(OperationalError, match='interrupted'):
+                connection.exec_driver_sql(ENDLESS)
+        finally:
+            current_deadline.reset(token)
+
+    def test_statements_without_deadline_run(self):
+        engine = create_engine('sqlite://')
+        interrupt_on_deadline(engine)
+
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql('SELECT 1').scalar() == 1
+
+
+class TestDeadlines:
+
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        clock = Clock()
+        monkeypatch.setattr(deadlines, 'clock', clock)
+
+        return clock
+
+    def execute(self, app, query):
+        return app.test_client().post('/graphql', json={"query": query}).get_json()
+
+    def metrics(self, app):
+        return app.extensions['graphql']['metrics'].snapshot().get('graphql_timeouts_total', {})
+
+    def test_fields_past_the_deadline_are_null(self, make_app, clock, monkeypatch):
+        app = make_app(200, GRAPHQL_TIMEOUT=5)
+
+        class Slow:
+            # resolving the uuid of the post outlives the deadline
+            def resolve(self, next, root, info, **args):
+                result = next(root, info, **args)
+
+                if info.field_name == 'uuid':
+                    clock.now = 10
+
+                return result
+
+        monkeypatch.setattr(app.view_functions['graphql'].view_class, 'middleware', [Slow()])
+
+        response = self.execute(app, 'query Both { getPost (postId: 1) { uuid } getAllUsers { username } }')
+
+        assert response['data']['getPost'] == {'uuid': '1'}
+        assert response['data']['getAllUsers'] == [{'username': None}] * 20
+
+        [error] = response['errors']
+
+        assert error['message'] == 'Tempo limite da operação excedido'
+        assert error['path'] == ['getAllUsers', 0, 'username']
+        assert error['extensions'] == {'code': 'DEADLINE_EXCEEDED', 'timeout': 5, 'fields': 20}
+        assert self.metrics(app) == {('Both',): [1.0]}
+
+    def test_interrupted_statements_time_out(self, make_app, clock):
+        app = make_app(200, GRAPHQL_TIMEOUT=None, GRAPHQL_OPERATION_TIMEOUTS={'Posts': 1})
+
+        def before_cursor_execute(*args):
+            # the deadline passes while SQLite runs the statement
+            clock.now = 10
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+        response = self.execute(app, 'query Posts { getAllPosts { uuid body } }')
+
+        assert response['data'] == {'getAllPosts': None}
+        assert response['errors'][0]['extensions'] == {'code': 'DEADLINE_EXCEEDED', 'timeout': 1, 'fields': 1}
+
+        # other operations have no deadline
+        response = self.execute(app, 'query Other { getAllPosts { uuid } }')
+
+        assert 'errors' not in response and len(response['data']['getAllPosts']) == 200
+        assert self.metrics(app) == {('Posts',): [1.0]}
+
+    def test_timeouts_past_the_operation_name_limit_are_labelled_other(self, make_app, clock):
+        app = make_app(20, GRAPHQL_TIMEOUT=None, GRAPHQL_OPERATION_TIMEOUTS={'Posts': 1},
+                       GRAPHQL_METRICS_MAX_OPERATIONS=1)
+
+        with app.app_context():
+            # every statement outlives the deadline
+            event.listen(db.engine, 'before_cursor_execute', lambda *args: setattr(clock, 'now', clock.now + 10))
+
+        # takes the only operation name the metrics keep
+        self.execute(app, 'query Other { getAllPosts { uuid } }')
+        self.execute(app, 'query Posts { getAllPosts { uuid body } }')
+
+        assert self.metrics(app) == {('other',): [1.0]}
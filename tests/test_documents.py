@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from documents import LRUCache, query_hash
+from main import app, schema
+
+document_backend = app.extensions['graphql']['document_backend']
+
+
+class TestDocuments:
+
+    def test_lru_cache_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('b') is None and cache.get('a') == 1 and cache.get('c') == 3
+
+    def test_document_is_parsed_once(self):
+        query_graphql = '{ getAllUsers { uuid } }'
+
+        first = document_backend.document_from_string(schema, query_graphql)
+        hits = document_backend.cache_info().hits
+        second = document_backend.document_from_string(schema, query_graphql)
+
+        assert first is second
+        assert document_backend.cache_info().hits == hits + 1
+
+    def test_invalid_document_is_cached_with_its_errors(self):
+        query = {"query": "{ getAllUsers { nope } }"}
+
+        first = app.test_client().post('/graphql', json=query)
+        second = app.test_client().post('/graphql', json=query)
+
+        assert first.status_code == second.status_code == 400
+        assert json.loads(first.data) == json.loads(second.data)
+
+
+class TestPersistedQueries:
+
+    query_graphql = '{ getAllPosts { uuid } }'
+
+    @pytest.fixture
+    def app(self, make_app):
+        return make_app()
+
+    def extensions(self, query_graphql):
+        return {"persistedQuery": {"version": 1, "sha256Hash": query_hash(query_graphql)}}
+
+    def test_unknown_hash_is_not_found(self, app):
+        query = {"extensions": self.extensions('{ getAllUsers { username password } }')}
+
+        response = app.test_client().post('/graphql', json=query)
+
+        assert response.status_code == 400
+        assert json.loads(response.data)['errors'][0]['message'] == 'PersistedQueryNotFound'
+
+    def test_registered_hash_is_executed(self, app):
+        extensions = self.extensions(self.query_graphql)
+
+        app.test_client().post('/graphql', json={"query": self.query_graphql, "extensions": extensions})
+        response = app.test_client().post('/graphql', json={"extensions": extensions})
+
+        assert response.status_code == 200
+        assert app.extensions['graphql']['persisted_queries'].lookup(extensions['persistedQuery']['sha256Hash']) == self.query_graphql
+
+    def test_hash_mismatch(self, app):
+        query = {"query": self.query_graphql, "extensions": self.extensions('{ getAllUsers { uuid } }')}
+
+        response = app.test_client().post('/graphql', json=query)
+
+        assert response.status_code == 400
+
+    def test_extensions_must_be_objects(self, app):
+        for extensions in ({"persistedQuery": "abc"}, ["persistedQuery"]):
+            response = app.test_client().post('/graphql', json={"query": self.query_graphql, "extensions": extensions})
+
+            assert response.status_code == 400
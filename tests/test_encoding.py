@@ -0,0 +1,67 @@
+import json
+
+import benchmark
+import view
+from encoding import dumps, encode, has_large_list, iter_encode
+from main import create_app, db
+
+
+class TestEncoding:
+
+    def test_iter_encode_streams_large_lists(self):
+        value = {'data': {'getAllPosts': [{'uuid': str(i), 'title': 'é %d' % i} for i in range(10)], 'ok': True}}
+
+        pieces = list(iter_encode(value, min_items=5, chunk_items=3, buffer_size=1))
+
+        assert len(pieces) > 4
+        assert json.loads(b''.join(pieces)) == value
+
+    def test_iter_encode_batch(self):
+        value = [{'data': {'posts': list(range(10))}}, {'errors': [{'message': 'x'}]}]
+
+        assert json.loads(b''.join(iter_encode(value, min_items=5, batch=True))) == value
+
+    def test_has_large_list(self):
+        assert has_large_list({'data': {'posts': [1, 2, 3]}}, min_items=3)
+        assert not has_large_list({'data': {'posts': [1, 2]}}, min_items=3)
+
+    def test_encode(self):
+        assert json.loads(dumps({'a': [1, None]})) == {'a': [1, None]}
+        assert encode({'a': 1}, pretty=True) == '{\n  "a": 1\n}'
+
+
+class TestStreamedResponse:
+
+    def test_large_results_are_streamed(self, tmp_path, monkeypatch):
+        streamed_values = []
+
+        def spy(value, *args, **kwargs):
+            streamed_values.append(value)
+            return iter_encode(value, *args, **kwargs)
+
+        monkeypatch.setattr(view, 'iter_encode', spy)
+
+        app = create_app(
+            'testing', SQLALCHEMY_DATABASE_URI='sqlite:///%s' % (tmp_path / 'data.sqlite'),
+            GRAPHQL_STREAM_MIN_ITEMS=50, GRAPHQL_STREAM_CHUNK_ITEMS=7
+        )
+
+        with app.app_context():
+            benchmark.seed(100)
+
+            client = app.test_client()
+            query = {"query": "{ getAllPosts { uuid title author { username } } }"}
+
+            streamed = client.post('/graphql', json=query)
+            whole = client.post('/graphql', json=query, query_string={'pretty': 1})
+
+            # pretty printed responses are never streamed
+            assert len(streamed_values) == 1
+            assert streamed.get_json() == whole.get_json()
+            assert len(streamed.get_json()['data']['getAllPosts']) == 100
+
+            small = client.post('/graphql', json={"query": "{ posts (first: 10) { edges { node { uuid } } } }"})
+
+            assert small.status_code == 200 and len(streamed_values) == 1
+
+            db.session.remove()
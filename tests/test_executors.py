@@ -0,0 +1,95 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import graphene
+import pytest
+
+import executors
+from executors import ThreadPoolRootExecutor
+
+calls = []
+
+
+class SlowQuery(graphene.ObjectType):
+    first = graphene.String()
+    second = graphene.String()
+
+    @staticmethod
+    def resolve_first(self, info):
+        time.sleep(0.2)
+        return 'first'
+
+    @staticmethod
+    def resolve_second(self, info):
+        time.sleep(0.2)
+        return 'second'
+
+
+class Append(graphene.Mutation):
+    class Arguments:
+        value = graphene.Int()
+
+    ok = graphene.Boolean()
+
+    @staticmethod
+    def mutate(self, info, value):
+        time.sleep(0.05 * (3 - value))
+        calls.append(value)
+        return Append(ok=True)
+
+
+class SlowMutation(graphene.ObjectType):
+    append = Append.Field()
+
+
+class TestExecutors:
+
+    schema = graphene.Schema(query=SlowQuery, mutation=SlowMutation)
+    pool = ThreadPoolExecutor(max_workers=2)
+
+    def test_root_query_fields_run_concurrently(self):
+        start = time.time()
+        result = self.schema.execute('{ first second }', executor=ThreadPoolRootExecutor(self.pool))
+        elapsed = time.time() - start
+
+        assert result.data == {'first': 'first', 'second': 'second'}
+        assert elapsed < 0.35
+
+    def test_mutations_keep_their_order(self):
+        del calls[:]
+
+        query_graphql = 'mutation { a: append(value: 1) { ok } b: append(value: 2) { ok } c: append(value: 3) { ok } }'
+        result = self.schema.execute(query_graphql, executor=ThreadPoolRootExecutor(self.pool))
+
+        assert not result.errors
+        assert calls == [1, 2, 3]
+
+
+class TestAppExecutors:
+
+    query = '''
+        {
+            getAllPosts { title author { username posts { title } } }
+            getAllUsers { username postCount latestPost { title author { username } } posts { title } }
+            getPost (postId: 3) { title author { username } }
+        }
+    '''
+
+    def execute(self, app):
+        return app.test_client().post('/graphql', json={"query": self.query}).get_json()
+
+    def test_thread_executor_resolves_the_schema_like_the_sync_one(self, make_app):
+        expected = self.execute(make_app(50, GRAPHQL_EXECUTOR='sync'))
+        # the same database, already seeded
+        app = make_app(GRAPHQL_EXECUTOR='threads', GRAPHQL_EXECUTOR_WORKERS=3)
+
+        assert 'errors' not in expected
+
+        for _ in range(5):
+            assert self.execute(app) == expected
+
+    def test_gevent_executor_needs_gevent(self, make_app, monkeypatch):
+        monkeypatch.setattr(executors, 'gevent', None)
+
+        with pytest.raises(ValueError, match='gevent'):
+            make_app(GRAPHQL_EXECUTOR='gevent')
@@ -0,0 +1,110 @@
+import pytest
+from sqlalchemy import event
+
+from filters import prefix_range
+from main import db, Post, User
+
+
+class TestPrefixRange:
+
+    def test_prefix_range(self):
+        lower, upper = prefix_range(Post.title, 'ab')
+
+        assert (lower.right.value, upper.right.value) == ('ab', 'ac')
+
+    def test_empty_prefix_matches_everything(self):
+        assert prefix_range(Post.title, '') == []
+
+
+class TestFilters:
+
+    @pytest.fixture
+    def app(self, make_app):
+        app = make_app(200, GRAPHQL_RESPONSE_CACHE=False)
+
+        with app.app_context():
+            # with their parameters, to explain them
+            app.statements = []
+            event.listen(db.engine, 'before_cursor_execute', lambda *args: app.statements.append(args[2:4]))
+
+            yield app
+
+            db.session.remove()
+
+    def execute(self, app, query):
+        del app.statements[:]
+
+        response = app.test_client().post('/graphql', json={"query": query}).get_json()
+
+        assert 'errors' not in response
+
+        return response['data']
+
+    def plans(self, app):
+        with db.engine.connect() as connection:
+            return [
+                [row[3] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+                for statement, parameters in list(app.statements)
+            ]
+
+    def test_posts_of_an_author_by_title_prefix_newest_first(self, app):
+        data = self.execute(app, '''
+            {
+                getAllPosts (where: {authorUsername: "user1", title: {startsWith: "b"}}, orderBy: UUID_DESC) {
+                    uuid title authorId
+                }
+            }
+        ''')
+
+        expected = db.session.query(Post.uuid).filter(
+            Post.author_id == 1, Post.title.startswith('b')
+        ).order_by(Post.uuid.desc())
+
+        assert [int(post['uuid']) for post in data['getAllPosts']] == [uuid for uuid, in expected]
+        assert {post['authorId'] for post in data['getAllPosts']} <= {1}
+
+        plan = self.plans(app)[0]
+
+        assert any('ix_posts_author_id_uuid' in step for step in plan)
+        assert any('ix_users_username' in step for step in plan)
+        assert not any('TEMP B-TREE' in step for step in plan)
+
+    def test_title_prefix_is_a_range_on_the_title_index(self, app):
+        data = self.execute(app, '{ getAllPosts (where: {title: {startsWith: "c"}}, orderBy: TITLE_ASC) { title } }')
+
+        titles = [post['title'] for post in data['getAllPosts']]
+
+        assert titles and all(title.startswith('c') for title in titles)
+        assert titles == sorted(titles)
+        assert self.plans(app)[0] == ['SEARCH posts USING COVERING INDEX ix_posts_title (title>? AND title<?)']
+
+    def test_uuid_range_and_equality(self, app):
+        data = self.execute(app, '{ getAllPosts (where: {uuid: {gt: 10, lte: 13}}) { uuid } }')
+
+        assert [post['uuid'] for post in data['getAllPosts']] == ['11', '12', '13']
+
+        data = self.execute(app, '{ getAllPosts (where: {uuid: {eq: 7}, authorId: 0}) { uuid } }')
+
+        assert data['getAllPosts'] == []
+
+    def test_users(self, app):
+        data = self.execute(app, '{ getAllUsers (where: {username: {startsWith: "user1"}}, orderBy: USERNAME_DESC) { username } }')
+
+        usernames = [username for username, in db.session.query(User.username).filter(User.username.startswith('user1'))]
+
+        assert [user['username'] for user in data['getAllUsers']] == sorted(usernames, reverse=True)
+        assert any('ix_users_username' in step for step in self.plans(app)[0])
+
+    def test_connection_filters(self, app):
+        data = self.execute(app, '{ posts (first: 3, where: {authorId: 2}) { edges { node { uuid authorId } } } }')
+
+        expected = db.session.query(Post.uuid).filter_by(author_id=2).order_by(Post.uuid).limit(3)
+
+        assert [int(edge['node']['uuid']) for edge in data['posts']['edges']] == [uuid for uuid, in expected]
+
+    def test_unindexed_filters_are_rejected(self, app):
+        response = app.test_client().post(
+            '/graphql', json={"query": '{ getAllPosts (where: {body: {startsWith: "a"}}) { uuid } }'}
+        ).get_json()
+
+        assert 'body' in response['errors'][0]['message']
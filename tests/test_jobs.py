@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from main import Job, Post, User, db
+
+JOB_STATUS = 'query ($id: Int!) { jobStatus (id: $id) { kind status progress total failed message } }'
+
+
+class TestJobs:
+
+    @pytest.fixture
+    def make_app(self, make_app):
+        def make_jobs_app(**config):
+            app = make_app(**config)
+
+            with app.app_context():
+                db.session.add_all([User(username='author', password='x'), User(username='other', password='x')])
+                db.session.commit()
+                db.session.add_all([Post(title='post %d' % i, body='body', author_id=1) for i in range(7)])
+                db.session.commit()
+                db.session.remove()
+
+            return app
+
+        return make_jobs_app
+
+    def execute(self, app, query, **variables):
+        return app.test_client().post('/graphql', json={"query": query, "variables": variables}).get_json()
+
+    def job_status(self, app, job_id):
+        return self.execute(app, JOB_STATUS, id=job_id)['data']['jobStatus']
+
+    def test_delete_user_detaches_the_posts_a_chunk_per_transaction(self, make_app):
+        app = make_app(GRAPHQL_JOB_CHUNK_SIZE=3)
+        events = []
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', lambda *args: events.append(args[2].split()[:2]))
+            event.listen(db.engine, 'commit', lambda *args: events.append(['COMMIT']))
+
+        data = self.execute(app, 'mutation { DeleteUser (userId: 1) { ok job { uuid status } } }')['data']
+
+        assert data['DeleteUser'] == {'ok': True, 'job': {'uuid': '1', 'status': 'pending'}}
+
+        # 3 + 3, then the last post along with the user
+        writes = [statement for statement in events if statement[0] in ('UPDATE', 'DELETE', 'COMMIT')]
+        chunks = writes[writes.index(['UPDATE', 'posts']):]
+
+        assert chunks == [
+            ['UPDATE', 'posts'], ['UPDATE', 'jobs'], ['COMMIT'],
+            ['UPDATE', 'posts'], ['UPDATE', 'jobs'], ['COMMIT'],
+            ['UPDATE', 'posts'], ['DELETE', 'FROM'], ['UPDATE', 'jobs'], ['COMMIT'],
+            ['UPDATE', 'jobs'], ['COMMIT'],
+        ]
+
+        assert self.job_status(app, 1) == {
+            'kind': 'delete_user', 'status': 'done', 'progress': 7, 'total': 7, 'failed': 0,
+            'message': 'Usuário removido com sucesso.',
+        }
+
+        with app.app_context():
+            assert db.session.query(Post).filter(Post.author_id.isnot(None)).count() == 0
+            assert db.session.query(User.username).all() == [('other',)]
+
+    def test_jobs_run_in_the_background(self, make_app):
+        app = make_app(GRAPHQL_JOB_WORKERS=2)
+        data = self.execute(app, 'mutation { DeleteUser (userId: 1) { ok job { uuid status } } }')['data']
+
+        assert data['DeleteUser'] == {'ok': True, 'job': {'uuid': '1', 'status': 'pending'}}
+
+        app.extensions['graphql']['jobs'].wait()
+
+        assert self.job_status(app, 1)['status'] == 'done'
+
+        metrics = app.extensions['graphql']['metrics'].snapshot()
+
+        assert metrics['graphql_jobs_total'] == {('delete_user', 'done'): [1.0]}
+
+    def test_import_posts(self, make_app):
+        app = make_app(GRAPHQL_JOB_CHUNK_SIZE=2)
+        posts = [{'title': 'new %d' % i, 'body': 'b', 'username': 'other'} for i in range(4)]
+        posts.insert(2, {'title': 'lost', 'body': 'b', 'username': 'nobody'})
+
+        data = self.execute(app, '''
+            mutation ($posts: [PostInput!]!) { ImportPosts (posts: $posts) { ok message job { uuid total } } }
+        ''', posts=posts)['data']
+
+        assert data['ImportPosts'] == {'ok': True, 'message': 'Importação agendada', 'job': {'uuid': '1', 'total': 5}}
+        assert self.job_status(app, 1) == {
+            'kind': 'import_posts', 'status': 'done', 'progress': 5, 'total': 5, 'failed': 1,
+            'message': '4 posts criados',
+        }
+
+        with app.app_context():
+            assert db.session.query(Post).filter_by(author_id=2).count() == 4
+
+    def test_import_users_skips_taken_usernames(self, make_app):
+        app = make_app()
+        users = [{'username': username, 'password': 'x'} for username in ('author', 'new', 'new')]
+
+        self.execute(app, 'mutation ($users: [UserInput!]!) { ImportUsers (users: $users) { ok } }', users=users)
+
+        assert self.job_status(app, 1)['message'] == '1 usuários criados'
+        assert self.job_status(app, 1)['failed'] == 2
+
+    def test_imports_are_limited(self, make_app):
+        app = make_app(GRAPHQL_MAX_IMPORT_SIZE=1)
+        users = [{'username': 'a', 'password': 'x'}, {'username': 'b', 'password': 'x'}]
+        query = 'mutation ($users: [UserInput!]!) { ImportUsers (users: $users) { ok } }'
+
+        response = self.execute(app, query, users=users)
+
+        assert response['errors'][0]['message'] == 'Máximo de 1 itens por operação'
+
+    def test_failed_jobs_keep_the_error(self, make_app):
+        app = make_app()
+
+        with app.app_context():
+            job = app.extensions['graphql']['jobs'].enqueue('delete_user', user_id=7)
+
+        assert self.job_status(app, job.uuid)['status'] == 'failed'
+        assert self.job_status(app, job.uuid)['message'] == 'Usuário não encontrado'
+
+    def test_unfinished_jobs_are_resumed(self, make_app):
+        app = make_app(GRAPHQL_JOB_WORKERS=1, GRAPHQL_JOB_STALE_AFTER=60)
+        users = [{'username': 'user%d' % i, 'password': 'x'} for i in range(4)]
+        long_ago = datetime.utcnow() - timedelta(hours=1)
+
+        with app.app_context():
+            db.session.add_all([
+                # the first 2 users were imported before the process stopped
+                Job(kind='import_users', status='running', arguments={'users': users}, progress=2, total=4,
+                    updated_at=long_ago),
+                Job(kind='import_users', status='pending', arguments={'users': users[:1]}, total=1),
+                # still making progress in another worker
+                Job(kind='import_users', status='running', arguments={'users': users}, total=4),
+            ])
+            db.session.commit()
+
+            assert sorted(app.extensions['graphql']['jobs'].resume()) == [1, 2]
+
+        app.extensions['graphql']['jobs'].wait()
+
+        assert self.job_status(app, 1)['message'] == '4 usuários criados'
+        assert self.job_status(app, 2)['status'] == 'done'
+        assert self.job_status(app, 3)['status'] == 'running'
+
+        with app.app_context():
+            assert sorted(username for username, in db.session.query(User.username)) == [
+                'author', 'other', 'user0', 'user2', 'user3'
+            ]
+
+    def test_unknown_job(self, make_app):
+        response = self.execute(make_app(), JOB_STATUS, id=7)
+
+        assert response['data']['jobStatus'] is None
+        assert response['errors'][0]['message'] == 'Tarefa não encontrada'
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+from sqlalchemy import func
+
+from main import db, Post, User
+
+
+class TestLoaders:
+
+    @pytest.fixture
+    def seeded_app(self, make_app):
+        seeded_app = make_app(50, GRAPHQL_RESPONSE_CACHE=False)
+
+        with seeded_app.app_context():
+            yield seeded_app
+
+            db.session.remove()
+
+    def test_get_all_posts_with_author_batches_queries(self, seeded_app):
+        query_graphql = '''
+            {
+                getAllPosts {
+                    title
+                    author {
+                        username
+                        posts {
+                            title
+                        }
+                    }
+                }
+            }
+        '''
+
+        response = seeded_app.test_client().post('/graphql', json={"query": query_graphql})
+        response = json.loads(response.data)
+
+        assert 'errors' not in response
+        assert len({post['author']['username'] for post in response['data']['getAllPosts']}) > 1
+
+        # the posts joined to their authors, then one query for the posts of all the authors
+        assert len(seeded_app.statements) == 2
+        assert 'IN' in seeded_app.statements[1]
+
+    def test_get_all_users_returns_posts_of_each_user(self, seeded_app):
+        query_graphql = '''
+            {
+                getAllUsers {
+                    uuid
+                    posts {
+                        uuid
+                    }
+                }
+            }
+        '''
+
+        response = seeded_app.test_client().post('/graphql', json={"query": query_graphql})
+        response = json.loads(response.data)['data']['getAllUsers']
+
+        for user in response:
+            posts_database = db.session.query(Post.uuid).filter_by(author_id=int(user['uuid'])).order_by(Post.uuid)
+            posts_database = [str(uuid) for uuid, in posts_database]
+
+            assert [post['uuid'] for post in user['posts']] == posts_database
+
+        assert len(response) == db.session.query(User).count()
+
+    def test_post_count_is_computed_in_the_users_query(self, seeded_app):
+        response = seeded_app.test_client().post('/graphql', json={"query": '{ getAllUsers { uuid username postCount } }'})
+        users = response.get_json()['data']['getAllUsers']
+
+        assert len(seeded_app.statements) == 1
+        assert 'count' in seeded_app.statements[0]
+
+        with seeded_app.app_context():
+            for user in users:
+                assert user['postCount'] == db.session.query(Post).filter_by(author_id=int(user['uuid'])).count()
+
+    def test_post_stats_are_batched(self, seeded_app):
+        query_graphql = 'mutation { CreateUser (username: "new", password: "x") { user { postCount latestPost { uuid } } } }'
+
+        response = seeded_app.test_client().post('/graphql', json={"query": query_graphql})
+
+        assert response.get_json()['data']['CreateUser']['user'] == {'postCount': 0, 'latestPost': None}
+
+        query_graphql = '{ getAllUsers { uuid latestPost { uuid } } }'
+
+        del seeded_app.statements[:]
+        response = seeded_app.test_client().post('/graphql', json={"query": query_graphql})
+
+        # the users, one grouped query for the latest post of all of them, then those posts
+        assert len(seeded_app.statements) == 3
+        assert 'GROUP BY' in seeded_app.statements[1]
+
+        with seeded_app.app_context():
+            for user in response.get_json()['data']['getAllUsers']:
+                latest = db.session.query(func.max(Post.uuid)).filter_by(author_id=int(user['uuid'])).scalar()
+
+                assert user['latestPost'] == (None if latest is None else {'uuid': str(latest)})
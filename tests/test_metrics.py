@@ -0,0 +1,104 @@
+import json
+import threading
+
+from metrics import Counter, GraphQLMetrics, Histogram, MultiProcessStore, Registry
+
+
+class TestMetrics:
+
+    def test_counter_increments_from_many_threads(self):
+        counter = Counter('requests_total', 'Requests.', ('method',))
+
+        def work():
+            for _ in range(1000):
+                counter.inc(('get',))
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # a new thread folds the shards of the finished ones
+        thread = threading.Thread(target=counter.inc, args=(('post',),))
+        thread.start()
+        thread.join()
+
+        assert counter.values() == {('get',): [8000.0], ('post',): [1.0]}
+
+    def test_histogram_exposition(self):
+        registry = Registry()
+        histogram = registry.register(Histogram('latency_seconds', 'Latency.', ('op',), buckets=(0.1, 1)))
+
+        histogram.observe(0.05, ('q',))
+        histogram.observe(0.5, ('q',))
+        histogram.observe(5, ('q',))
+
+        text = registry.expose(registry.snapshot())
+
+        assert '# TYPE latency_seconds histogram' in text
+        assert 'latency_seconds_bucket{op="q",le="0.1"} 1.0' in text
+        assert 'latency_seconds_bucket{op="q",le="1.0"} 2.0' in text
+        assert 'latency_seconds_bucket{op="q",le="+Inf"} 3.0' in text
+        assert 'latency_seconds_count{op="q"} 3.0' in text
+
+    def test_multi_process_store_sums_every_process(self, tmp_path):
+        metrics = GraphQLMetrics(directory=str(tmp_path))
+        metrics.resolver_errors.inc(('GetPost', 'Post não encontrado'))
+
+        # a process that exited: its counters still count, its gauges do not
+        other = {
+            'graphql_resolver_errors_total': [[['GetPost', 'Post não encontrado'], [2.0]]],
+            'graphql_db_pool_connections': [[['checkedout'], [3.0]]],
+        }
+        (tmp_path / '999999999.json').write_text(json.dumps(other))
+
+        snapshot = metrics.snapshot()
+
+        assert snapshot['graphql_resolver_errors_total'][('GetPost', 'Post não encontrado')] == [3.0]
+        assert ('checkedout',) not in snapshot['graphql_db_pool_connections']
+
+    def test_flush_writes_the_process_snapshot(self, tmp_path):
+        registry = Registry()
+        counter = registry.register(Counter('jobs_total', 'Jobs.'))
+        store = MultiProcessStore(str(tmp_path), registry)
+
+        counter.inc()
+        store.flush()
+
+        assert json.loads(open(store.path).read()) == {'jobs_total': [[[], [1.0]]]}
+
+
+class TestMetricsEndpoint:
+
+    def test_operations_are_labelled_by_name_and_type(self, make_app):
+        client = make_app(20).test_client()
+
+        client.post('/graphql', json={"query": "query MetricsPosts { getAllPosts { title } }"})
+        client.post('/graphql', json={"query": "query MetricsMissing { getPost (postId: -1) { title } }"})
+
+        response = client.get('/metrics')
+        text = response.data.decode('utf8')
+
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain')
+        assert 'graphql_request_duration_seconds_count{operation_name="MetricsPosts",operation_type="query"}' in text
+        assert 'graphql_sql_statements_count{operation_name="MetricsPosts",operation_type="query"}' in text
+        assert ('graphql_resolver_errors_total{operation_name="MetricsMissing",error="Post não encontrado"} 1.0'
+                in text)
+        assert 'graphql_cache_hits_total{cache="documents"}' in text
+
+    def test_operation_names_past_the_limit_are_labelled_other(self, make_app):
+        app = make_app(20, GRAPHQL_METRICS_MAX_OPERATIONS=2)
+        client = app.test_client()
+
+        for name in ('First', 'Second', 'Third', 'Fourth', 'First'):
+            client.post('/graphql', json={"query": "query %s { getPost (postId: -1) { title } }" % name})
+
+        snapshot = app.extensions['graphql']['metrics'].snapshot()
+        counts = {labels: values[-1] for labels, values in snapshot['graphql_request_duration_seconds'].items()}
+        errors = snapshot['graphql_resolver_errors_total']
+
+        assert counts == {('First', 'query'): 2, ('Second', 'query'): 1, ('other', 'query'): 2}
+        assert sorted(name for name, error in errors) == ['First', 'Second', 'other']
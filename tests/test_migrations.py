@@ -0,0 +1,38 @@
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import upgrade
+
+from main import create_app, db
+from plans import check_plans, full_scans
+
+
+class TestMigrations:
+
+    def test_migrations_match_the_models(self, tmp_path):
+        app = create_app('testing', SQLALCHEMY_DATABASE_URI='sqlite:///%s' % (tmp_path / 'data.sqlite'))
+
+        with app.app_context():
+            upgrade(directory=app.config['MIGRATIONS_DIR'])
+
+            with db.engine.connect() as connection:
+                context = MigrationContext.configure(connection, opts={
+                    'include_object': lambda object, name, type_, *args: not name.startswith('posts_fts'),
+                })
+
+                assert compare_metadata(context, db.metadata) == []
+
+            indexes = db.engine.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall()
+
+            assert ('ix_posts_author_id_uuid',) in indexes
+
+            db.engine.dispose()
+
+    def test_full_scans(self):
+        assert full_scans('SELECT * FROM posts WHERE author_id = ?', ['SCAN posts']) == ['posts']
+        assert full_scans('SELECT * FROM posts WHERE author_id = ?', ['SEARCH posts USING INDEX ix (author_id=?)']) == []
+        assert full_scans('SELECT * FROM posts ORDER BY uuid LIMIT ?', ['SCAN posts']) == []
+        assert full_scans('SELECT * FROM posts ORDER BY body LIMIT ?', ['SCAN posts', 'USE TEMP B-TREE FOR ORDER BY']) == ['posts']
+        assert full_scans('SELECT * FROM posts_fts', ['SCAN posts_fts VIRTUAL TABLE INDEX 0:M1']) == []
+
+    def test_no_resolver_scans_a_whole_table(self):
+        assert check_plans() == []
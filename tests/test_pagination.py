@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from main import db, Post
+from pagination import decode_cursor, encode_cursor
+
+
+class TestPagination:
+
+    query_graphql = '''
+        query ($first: Int, $after: String) {
+            posts (first: $first, after: $after) {
+                pageInfo {
+                    hasNextPage
+                    hasPreviousPage
+                    endCursor
+                }
+                edges {
+                    cursor
+                    node {
+                        uuid
+                    }
+                }
+            }
+        }
+    '''
+
+    @pytest.fixture
+    def app(self, make_app):
+        app = make_app(25)
+
+        with app.app_context():
+            yield app
+
+            db.session.remove()
+
+    def get_page(self, app, first, after=None):
+        variables = {"first": first, "after": after}
+        query = {"query": self.query_graphql, "variables": variables}
+
+        response = app.test_client().post('/graphql', json=query)
+
+        return json.loads(response.data)['data']['posts']
+
+    def test_cursor_round_trip(self):
+        assert decode_cursor(encode_cursor(42)) == 42
+
+    def test_pages_cover_every_post_once(self, app):
+        posts_database = [str(uuid) for uuid, in db.session.query(Post.uuid).order_by(Post.uuid)]
+
+        seen = []
+        after = None
+
+        while True:
+            page = self.get_page(app, 2, after)
+            seen += [edge['node']['uuid'] for edge in page['edges']]
+
+            if not page['pageInfo']['hasNextPage']:
+                break
+
+            after = page['pageInfo']['endCursor']
+
+        assert seen == posts_database
+
+    def test_second_page_has_previous_page(self, app):
+        first_page = self.get_page(app, 1)
+        second_page = self.get_page(app, 1, first_page['pageInfo']['endCursor'])
+
+        assert first_page['pageInfo']['hasPreviousPage'] is False
+        assert second_page['pageInfo']['hasPreviousPage'] is True
+
+    def test_invalid_cursor(self, app):
+        query = {"query": self.query_graphql, "variables": {"after": "invalid"}}
+
+        response = json.loads(app.test_client().post('/graphql', json=query).data)
+
+        assert response['errors'][0]['message'] == 'Cursor inválido'
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+
+class TestProjection:
+
+    @pytest.fixture
+    def app(self, make_app):
+        return make_app(50)
+
+    def execute(self, app, query_graphql):
+        del app.statements[:]
+
+        response = app.test_client().post('/graphql', json={"query": query_graphql})
+
+        return json.loads(response.data)
+
+    def test_only_requested_columns_are_selected(self, app):
+        response = self.execute(app, '{ getAllPosts { uuid title } }')
+
+        assert 'errors' not in response
+        assert len(app.statements) == 1
+        assert 'posts.title' in app.statements[0] and 'posts.body' not in app.statements[0]
+
+    def test_author_is_joined_in_the_same_statement(self, app):
+        response = self.execute(app, '{ getAllPosts { title author { username } } }')
+
+        assert 'errors' not in response
+        assert len(app.statements) == 1
+        assert 'users.password' not in app.statements[0] and 'users_1.password' not in app.statements[0]
+
+    def test_posts_of_users_are_loaded_in_one_statement(self, app):
+        query_graphql = '''
+            {
+                getAllUsers {
+                    ...userFields
+                }
+            }
+
+            fragment userFields on UserType {
+                username
+                posts {
+                    title
+                }
+            }
+        '''
+
+        response = self.execute(app, query_graphql)
+
+        assert 'errors' not in response
+        assert len(app.statements) == 2
+        assert all('password' not in statement and 'body' not in statement for statement in app.statements)
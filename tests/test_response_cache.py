@@ -0,0 +1,151 @@
+import json
+import time
+
+import pytest
+from fakerabbit import FakeRabbit
+from sqlalchemy.orm.instrumentation import manager_of_class
+
+from main import db, Post, User
+from response_cache import MemoryCacheBackend
+
+
+class TestMemoryCacheBackend:
+
+    def test_invalidate_drops_only_tagged_entries(self):
+        backend = MemoryCacheBackend()
+
+        backend.set('a', 1, {'posts', 'posts:1'}, backend.clock())
+        backend.set('b', 2, {'posts', 'posts:2'}, backend.clock())
+        backend.invalidate({'posts:1'})
+
+        assert backend.get('a') is None and backend.get('b') == 2
+
+    def test_entries_expire(self):
+        backend = MemoryCacheBackend(ttl=0.01)
+
+        backend.set('a', 1, set(), backend.clock())
+        time.sleep(0.02)
+
+        assert backend.get('a') is None
+
+    def test_value_read_before_an_invalidation_is_not_stored(self):
+        backend = MemoryCacheBackend()
+
+        since = backend.clock()
+        backend.invalidate({'posts:1'})
+        backend.set('a', 1, {'posts:1'}, since)
+
+        assert backend.get('a') is None
+
+    def test_old_invalidations_are_forgotten(self):
+        backend = MemoryCacheBackend(invalidation_window=0.01)
+
+        backend.invalidate({'posts:%d' % i for i in range(100)})
+        time.sleep(0.02)
+        since = backend.clock()
+        backend.invalidate({'posts:100'})
+
+        assert list(backend._invalidated) == ['posts:100']
+
+        backend.set('a', 1, {'posts:1'}, since)
+
+        assert backend.get('a') == 1
+
+    def test_value_read_before_a_forgotten_invalidation_is_not_stored(self):
+        backend = MemoryCacheBackend(invalidation_window=0.01)
+
+        since = backend.clock()
+        backend.invalidate({'posts:1'})
+        time.sleep(0.02)
+        backend.set('a', 1, {'posts:1'}, since)
+
+        assert backend.get('a') is None
+
+
+class TestResponseCache:
+
+    @pytest.fixture
+    def app(self, make_app):
+        return make_app(20, GRAPHQL_RESPONSE_CACHE=True)
+
+    def execute(self, app, query_graphql, **variables):
+        query = {"query": query_graphql, "variables": variables}
+
+        return json.loads(app.test_client().post('/graphql', json=query).data)
+
+    def get_post(self, app, post_id):
+        query_graphql = '''
+            query ($post_id: Int) {
+                getPost (postId: $post_id) {
+                    title
+                }
+            }
+        '''
+
+        return self.execute(app, query_graphql, post_id=post_id)['data']['getPost']
+
+    def hits(self, app):
+        return app.extensions['graphql']['response_cache'].backend.hits
+
+    def test_repeated_query_is_served_from_cache(self, app):
+        self.get_post(app, 1)
+        hits = self.hits(app)
+        self.get_post(app, 1)
+
+        assert self.hits(app) == hits + 1
+
+    def test_update_post_invalidates_only_that_post(self, app):
+        self.get_post(app, 1)
+        self.get_post(app, 2)
+
+        title = FakeRabbit.random_str()
+        query_graphql = '''
+            mutation ($post_id: Int, $title: String) {
+                UpdatePost (postId: $post_id, title: $title) {
+                    ok
+                }
+            }
+        '''
+        self.execute(app, query_graphql, post_id=1, title=title)
+
+        hits = self.hits(app)
+
+        assert self.get_post(app, 1)['title'] == title
+        assert self.hits(app) == hits
+
+        self.get_post(app, 2)
+
+        assert self.hits(app) == hits + 1
+
+    def test_writes_to_the_order_by_column_invalidate_limited_lists(self, make_app):
+        app = make_app(GRAPHQL_RESPONSE_CACHE=True, GRAPHQL_LIST_LIMIT=2)
+
+        with app.app_context():
+            db.session.add(User(username='author', password='x'))
+            db.session.add_all([Post(title=title, body='body', author_id=1) for title in 'bcd'])
+            db.session.commit()
+            db.session.remove()
+
+        query_graphql = '{ getAllPosts (orderBy: TITLE_ASC) { title } }'
+
+        assert self.execute(app, query_graphql)['data']['getAllPosts'] == [{'title': 'b'}, {'title': 'c'}]
+
+        self.execute(app, 'mutation { UpdatePost (postId: 3, title: "a") { ok } }')
+
+        assert self.execute(app, query_graphql)['data']['getAllPosts'] == [{'title': 'a'}, {'title': 'b'}]
+
+    def listeners(self, app):
+        with app.app_context():
+            return len(manager_of_class(Post).dispatch.load), len(db.session().dispatch.do_orm_execute)
+
+    def test_new_apps_add_no_session_or_model_listeners(self, app, make_app):
+        listeners = self.listeners(app)
+        other = make_app(GRAPHQL_RESPONSE_CACHE=True)
+
+        assert self.listeners(app) == listeners
+
+        # writes through the new app leave the cache of the first one alone
+        self.get_post(app, 1)
+        self.execute(other, 'mutation { UpdatePost (postId: 1, title: "new") { ok } }')
+
+        assert len(app.extensions['graphql']['response_cache'].backend) == 1
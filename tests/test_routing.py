@@ -0,0 +1,122 @@
+import shutil
+
+import pytest
+from sqlalchemy import create_engine
+
+from main import db, Post, User
+from routing import ReplicaSet
+
+GET_POST = 'query { getPost (postId: 1) { title } }'
+
+
+class TestReplicaSet:
+
+    def test_round_robin(self):
+        primary, first, second = [create_engine('sqlite://') for _ in range(3)]
+        replicas = ReplicaSet(primary, [first, second], max_lag=None)
+
+        assert [replicas.choose() for _ in range(4)] == [first, second, first, second]
+
+    def test_least_connections(self):
+        primary, first, second = [create_engine('sqlite://') for _ in range(3)]
+        replicas = ReplicaSet(primary, [first, second], strategy='least_connections', max_lag=None)
+
+        with first.connect():
+            assert replicas.choose() is second
+
+        with second.connect():
+            assert replicas.choose() is first
+
+    def test_replicas_behind_are_left_out(self):
+        primary, first, second = [create_engine('sqlite://') for _ in range(3)]
+        lags = {first: 10, second: 0}
+        replicas = ReplicaSet(primary, [first, second], max_lag=5, lag=lambda primary, replica: lags[replica])
+
+        assert {replicas.choose() for _ in range(4)} == {second}
+
+        lags[second] = 10
+        replicas.lag_interval = 0
+
+        assert replicas.choose() is primary
+
+
+class TestReplicaRouting:
+
+    @pytest.fixture
+    def make_replicated_app(self, tmp_path, make_app):
+        def make_replicated_app(**config):
+            primary = tmp_path / 'data.sqlite'
+            replica = tmp_path / 'replica.sqlite'
+
+            app = make_app()
+
+            with app.app_context():
+                db.session.add(User(username='author', password='x'))
+                db.session.add(Post(title='primary', body='body', author_id=1))
+                db.session.commit()
+                db.session.remove()
+
+            # the replica is a copy of the primary, told apart by the title of the post
+            shutil.copy(primary, replica)
+
+            app = make_app(SQLALCHEMY_REPLICAS=['sqlite:///%s' % replica], **config)
+            replicas = app.extensions['graphql']['replicas']
+
+            with replicas.replicas[0].begin() as connection:
+                connection.execute(Post.__table__.update().values(title='replica'))
+
+            return app
+
+        return make_replicated_app
+
+    @pytest.fixture
+    def app(self, make_replicated_app):
+        return make_replicated_app()
+
+    def execute(self, app, operations):
+        return app.test_client().post('/graphql', json=operations).get_json()
+
+    def test_queries_read_from_the_replica(self, app):
+        assert self.execute(app, {"query": GET_POST})['data']['getPost'] == {'title': 'replica'}
+
+    def test_mutations_write_to_the_primary(self, app):
+        data = self.execute(app, {"query": 'mutation { UpdatePost (postId: 1, body: "new") { post { title } } }'})
+
+        assert data['data']['UpdatePost']['post'] == {'title': 'primary'}
+
+    def test_reads_after_a_write_go_to_the_primary(self, app):
+        results = self.execute(app, [
+            {"query": GET_POST},
+            {"query": 'mutation { CreateUser (username: "new", password: "x") { ok } }'},
+            {"query": GET_POST},
+        ])
+
+        titles = [result['data'].get('getPost') for result in results]
+
+        assert titles == [{'title': 'replica'}, None, {'title': 'primary'}]
+
+    def test_lagging_replica_is_not_read(self, app):
+        replicas = app.extensions['graphql']['replicas']
+        replicas.lag = lambda primary, replica: 60
+
+        assert self.execute(app, {"query": GET_POST})['data']['getPost'] == {'title': 'primary'}
+
+    def test_results_read_from_a_replica_are_not_cached(self, make_replicated_app):
+        app = make_replicated_app(GRAPHQL_RESPONSE_CACHE=True)
+
+        assert self.execute(app, {"query": GET_POST})['data']['getPost'] == {'title': 'replica'}
+
+        # the replica catches up with a write after its invalidation fired
+        with app.extensions['graphql']['replicas'].replicas[0].begin() as connection:
+            connection.execute(Post.__table__.update().values(title='updated'))
+
+        assert self.execute(app, {"query": GET_POST})['data']['getPost'] == {'title': 'updated'}
+
+    def test_results_read_from_the_primary_are_cached(self, make_replicated_app):
+        app = make_replicated_app(GRAPHQL_RESPONSE_CACHE=True)
+        app.extensions['graphql']['replicas'].lag = lambda primary, replica: 60
+
+        self.execute(app, {"query": GET_POST})
+        self.execute(app, {"query": GET_POST})
+
+        assert app.extensions['graphql']['response_cache'].backend.hits == 1
@@ -0,0 +1,114 @@
+import pytest
+
+from main import db, Post, User
+from search import match_expression, rebuild_search_index
+
+SEARCH_POSTS = '''
+    query ($query: String!, $first: Int, $after: String) {
+        searchPosts (query: $query, first: $first, after: $after) {
+            pageInfo {
+                hasNextPage
+                endCursor
+            }
+            edges {
+                rank
+                snippet
+                node {
+                    title
+                    author {
+                        username
+                    }
+                }
+            }
+        }
+    }
+'''
+
+
+class TestSearch:
+
+    @pytest.fixture
+    def app(self, make_app):
+        app = make_app()
+
+        with app.app_context():
+            author = User(username='author', password='x')
+            db.session.add(author)
+            db.session.add_all([
+                Post(title='GraphQL with Flask', body='Resolvers and schemas', author=author),
+                Post(title='SQLite tips', body='Full-text search with graphql queries', author=author),
+                Post(title='Cooking', body='Nothing about APIs here', author=author),
+            ])
+            db.session.commit()
+
+            yield app
+
+            db.session.remove()
+
+    def search(self, app, query, **variables):
+        response = app.test_client().post('/graphql', json={
+            "query": SEARCH_POSTS, "variables": dict(variables, query=query)
+        })
+
+        return response.get_json()
+
+    def test_results_are_ranked_and_highlighted(self, app):
+        edges = self.search(app, 'graphql')['data']['searchPosts']['edges']
+
+        # a match in the title ranks first
+        assert [edge['node']['title'] for edge in edges] == ['GraphQL with Flask', 'SQLite tips']
+        assert edges[1]['snippet'] == 'Full-text search with <b>graphql</b> queries'
+        assert edges[0]['node']['author']['username'] == 'author'
+
+    def test_pages_follow_the_cursor(self, app):
+        first_page = self.search(app, 'graphql', first=1)['data']['searchPosts']
+        second_page = self.search(app, 'graphql', first=1, after=first_page['pageInfo']['endCursor'])['data']
+
+        assert first_page['pageInfo']['hasNextPage'] is True
+        assert [edge['node']['title'] for edge in second_page['searchPosts']['edges']] == ['SQLite tips']
+        assert second_page['searchPosts']['pageInfo']['hasNextPage'] is False
+
+    def test_index_follows_updates_and_deletes(self, app):
+        with app.app_context():
+            post = Post.query.filter_by(title='Cooking').one()
+            post.body = 'Now about graphql'
+            db.session.delete(Post.query.filter_by(title='SQLite tips').one())
+            db.session.commit()
+
+        titles = [edge['node']['title'] for edge in self.search(app, 'graphql')['data']['searchPosts']['edges']]
+
+        assert titles == ['GraphQL with Flask', 'Cooking']
+
+    def test_rebuild_indexes_existing_posts(self, app):
+        with app.app_context():
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql("INSERT INTO posts_fts (posts_fts) VALUES ('delete-all')")
+
+            assert self.search(app, 'graphql')['data']['searchPosts']['edges'] == []
+
+            with db.engine.begin() as connection:
+                rebuild_search_index(connection)
+
+        assert len(self.search(app, 'graphql')['data']['searchPosts']['edges']) == 2
+
+    def test_prefix_and_operators(self, app):
+        assert match_expression('graph* AND "x') == '"graph"* "AND" """x"'
+
+        assert len(self.search(app, 'sql*')['data']['searchPosts']['edges']) == 1
+        assert self.search(app, 'NEAR( -')['data']['searchPosts']['edges'] == []
+        assert self.search(app, '  ')['errors'][0]['message'] == 'Informe os termos da busca'
+
+    def test_cached_results_follow_writes_to_other_posts(self, make_app):
+        app = make_app(GRAPHQL_RESPONSE_CACHE=True)
+
+        with app.app_context():
+            db.session.add(User(username='author', password='x'))
+            db.session.add_all([Post(title='one', body='hello', author_id=1), Post(title='two', body='bye', author_id=1)])
+            db.session.commit()
+            db.session.remove()
+
+        assert len(self.search(app, 'hello')['data']['searchPosts']['edges']) == 1
+
+        app.test_client().post('/graphql', json={"query": 'mutation { UpdatePost (postId: 2, body: "hello") { ok } }'})
+
+        assert len(self.search(app, 'hello')['data']['searchPosts']['edges']) == 2
@@ -0,0 +1,132 @@
+import json
+
+import pytest
+from sqlalchemy import event
+
+from main import db, User
+from subscriptions import channel_name
+
+POST_CREATED = 'subscription { postCreated { title author { username } } }'
+
+
+class TestSubscriptions:
+
+    @pytest.fixture
+    def app(self, make_app):
+        app = make_app()
+
+        with app.app_context():
+            db.session.add(User(username='author', password='x'))
+            db.session.commit()
+            db.session.remove()
+
+        return app
+
+    def execute(self, app, query):
+        return app.test_client().post('/graphql', json={"query": query}).get_json()
+
+    def events(self, response):
+        for chunk in response.response:
+            if not chunk.startswith(b':'):
+                yield json.loads(chunk.decode('utf8').split('data: ', 1)[1])
+
+    def test_post_created_reaches_every_subscriber(self, app):
+        client = app.test_client()
+        first = client.get('/graphql/subscriptions', query_string={'query': POST_CREATED}, buffered=False)
+        second = client.get('/graphql/subscriptions', query_string={'query': POST_CREATED}, buffered=False)
+
+        assert first.content_type == 'text/event-stream'
+
+        manager = app.extensions['graphql']['subscriptions']
+        statements = []
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+        self.execute(app, 'mutation { CreatePost (title: "new", body: "body", username: "author") { ok } }')
+
+        expected = {'data': {'postCreated': {'title': 'new', 'author': {'username': 'author'}}}}
+
+        assert next(self.events(first)) == expected
+        assert next(self.events(second)) == expected
+
+        # the insert, which looks the author up itself, then one execution for both subscribers
+        assert len(statements) == 2
+        assert len(manager.channels['postCreated']) == 1
+
+        first.close()
+        second.close()
+
+        assert 'postCreated' not in manager.channels
+
+    def test_bulk_created_posts_are_published(self, app):
+        manager = app.extensions['graphql']['subscriptions']
+
+        assert not manager.listening('postCreated')
+
+        response = app.test_client().get('/graphql/subscriptions', query_string={
+            'query': 'subscription { postCreated { title } }'
+        }, buffered=False)
+
+        assert manager.listening('postCreated')
+
+        self.execute(app, '''
+            mutation {
+                CreatePosts (posts: [
+                    {title: "one", body: "body", username: "author"},
+                    {title: "two", body: "body", username: "author"}
+                ]) { ok }
+            }
+        ''')
+
+        events = self.events(response)
+
+        assert [next(events), next(events)] == [
+            {'data': {'postCreated': {'title': 'one'}}}, {'data': {'postCreated': {'title': 'two'}}}
+        ]
+
+        response.close()
+
+    def test_post_updated_filters_by_post(self, app):
+        created = self.execute(app, '''
+            mutation {
+                one: CreatePost (title: "one", body: "body", username: "author") { post { uuid } }
+                two: CreatePost (title: "two", body: "body", username: "author") { post { uuid } }
+            }
+        ''')['data']
+        two = int(created['two']['post']['uuid'])
+
+        query = 'subscription ($postId: Int!) { postUpdated (postId: $postId) { title } }'
+        response = app.test_client().get('/graphql/subscriptions', query_string={
+            'query': query, 'variables': json.dumps({'postId': two})
+        }, buffered=False)
+
+        self.execute(app, 'mutation { UpdatePost (postId: %s, title: "skipped") { ok } }' % created['one']['post']['uuid'])
+        self.execute(app, 'mutation { UpdatePost (postId: %d, title: "updated") { ok } }' % two)
+
+        assert next(self.events(response)) == {'data': {'postUpdated': {'title': 'updated'}}}
+
+        response.close()
+
+    def test_invalid_subscriptions_are_rejected(self, app):
+        client = app.test_client()
+
+        response = client.get('/graphql/subscriptions', query_string={'query': '{ getAllPosts { title } }'})
+
+        assert response.status_code == 400
+        assert response.get_json()['errors'][0]['message'] == 'Informe uma operação subscription'
+
+        response = client.get('/graphql/subscriptions', query_string={'query': 'subscription { nope }'})
+
+        assert response.status_code == 400
+
+        response = client.get('/graphql/subscriptions', query_string={
+            'query': 'subscription { ...created } fragment created on Subscription { postCreated { title } }'
+        })
+
+        assert response.status_code == 400
+        assert response.get_json()['errors'][0]['message'] == 'Uma subscription deve selecionar exatamente um campo'
+
+    def test_channel_name(self):
+        assert channel_name('postCreated') == 'postCreated'
+        assert channel_name('postUpdated', {'post_id': 7}) == 'postUpdated(post_id=7)'
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from main import db, Post
+from loaders import RelatedLoader
+from tracing import Trace, attributed_to, current_trace
+
+
+class TestTracing:
+
+    @pytest.fixture
+    def app(self, make_app):
+        return make_app(20)
+
+    def post(self, app, query, headers=None):
+        response = app.test_client().post('/graphql', json={"query": query}, headers=headers or {})
+
+        return json.loads(response.data)
+
+    def test_tracing_header_returns_resolver_timings(self, app):
+        query_graphql = '''
+            query UsersWithPosts {
+                getAllUsers {
+                    username
+                    posts {
+                        title
+                    }
+                }
+            }
+        '''
+
+        response = self.post(app, query_graphql, {'X-GraphQL-Tracing': '1'})
+        tracing = response['extensions']['tracing']
+
+        assert 'errors' not in response
+        assert tracing['version'] == 1 and tracing['duration'] > 0
+        assert tracing['execution']['duration'] <= tracing['duration']
+
+        paths = [resolver['path'] for resolver in tracing['execution']['resolvers']]
+
+        assert ['getAllUsers'] in paths
+        assert ['getAllUsers', 0, 'username'] in paths
+
+        assert tracing['sql']['count'] >= 1
+        assert tracing['sql']['fields']['Query.getAllUsers']['count'] >= 1
+
+    def test_without_header_only_aggregates(self, app):
+        query_graphql = '''
+            query CountedUsers {
+                getAllUsers {
+                    username
+                }
+            }
+        '''
+
+        tracing_stats = app.extensions['graphql']['tracing']
+        response = self.post(app, query_graphql)
+
+        assert 'tracing' not in response.get('extensions', {})
+        assert tracing_stats.snapshot()['CountedUsers']['count'] == 1
+
+    def test_operation_names_past_the_limit_are_totalled_as_other(self, make_app):
+        app = make_app(20, GRAPHQL_METRICS_MAX_OPERATIONS=1)
+
+        for name in ('First', 'Second', 'Third'):
+            self.post(app, 'query %s { getPost (postId: 1) { title } }' % name)
+
+        snapshot = app.extensions['graphql']['tracing'].snapshot()
+
+        assert {name: totals['count'] for name, totals in snapshot.items()} == {'First': 1, 'other': 2}
+
+    def test_loader_batch_is_counted_for_the_field_that_asked(self, app):
+        trace = Trace(detailed=True)
+        token = current_trace.set(trace)
+
+        try:
+            with app.test_request_context():
+                loader = RelatedLoader(db.session, Post, Post.author_id)
+
+                with attributed_to('UserType.posts'):
+                    promise = loader.load(1)
+
+                promise.get()
+        finally:
+            current_trace.reset(token)
+
+        trace.finish()
+
+        assert trace.to_dict()['sql']['fields']['UserType.posts']['count'] == 1
@@ -0,0 +1,75 @@
+import pytest
+
+from main import db, Post, User, table_versions
+from versions import read_versions
+
+GET_POSTS = '{ getAllPosts { uuid title } }'
+
+
+class TestVersions:
+
+    @pytest.fixture
+    def app(self, make_app):
+        app = make_app()
+
+        with app.app_context():
+            db.session.add(User(username='author', password='x'))
+            db.session.commit()
+            db.session.add(Post(title='title', body='body', author_id=1))
+            db.session.commit()
+            db.session.remove()
+
+            yield app
+
+            db.session.remove()
+
+    def get(self, app, query, etag=None):
+        del app.statements[:]
+
+        headers = {'If-None-Match': etag} if etag else {}
+
+        return app.test_client().get('/graphql', query_string={'query': query}, headers=headers)
+
+    def test_writes_bump_the_versions(self, app):
+        assert read_versions(db.session, table_versions) == {'users': 1, 'posts': 1}
+
+        db.session.query(Post).update({'title': 'new'})
+        db.session.query(Post).delete()
+        db.session.commit()
+
+        assert read_versions(db.session, table_versions) == {'users': 1, 'posts': 3}
+
+    def test_not_modified(self, app):
+        response = self.get(app, GET_POSTS)
+        etag = response.headers['ETag']
+
+        assert response.status_code == 200 and etag.startswith('W/')
+        assert response.headers['Cache-Control'] == 'no-cache'
+
+        response = self.get(app, GET_POSTS, etag)
+
+        assert response.status_code == 304 and response.data == b''
+        assert response.headers['ETag'] == etag
+
+        # only the versions were read
+        assert len(app.statements) == 1 and 'table_versions' in app.statements[0]
+
+    def test_mutations_change_the_etag(self, app):
+        etag = self.get(app, GET_POSTS).headers['ETag']
+
+        app.test_client().post('/graphql', json={"query": 'mutation { UpdatePost (postId: 1, title: "new") { ok } }'})
+
+        response = self.get(app, GET_POSTS, etag)
+
+        assert response.status_code == 200 and response.headers['ETag'] != etag
+        assert response.get_json()['data']['getAllPosts'] == [{'uuid': '1', 'title': 'new'}]
+
+    def test_etag_depends_on_the_query(self, app):
+        etag = self.get(app, GET_POSTS).headers['ETag']
+
+        assert self.get(app, '{ getAllUsers { username } }', etag).status_code == 200
+
+    def test_only_successful_get_queries_are_tagged(self, app):
+        assert 'ETag' not in app.test_client().post('/graphql', json={"query": GET_POSTS}).headers
+        assert 'ETag' not in self.get(app, '{ getPost (postId: 7) { title } }').headers
+        assert 'ETag' not in self.get(app, 'mutation { DeletePost (postId: 1) { ok } }').headers
@@ -0,0 +1,106 @@
+import pytest
+
+import writes
+from main import db, Post, User
+
+
+class TestWrites:
+
+    @pytest.fixture(params=[True, False], ids=['returning', 'fallback'])
+    def app(self, request, make_app, monkeypatch):
+        if not request.param:
+            # as on SQLite before 3.35
+            monkeypatch.setattr(writes, 'returning_supported', lambda dialect: False)
+
+        app = make_app()
+
+        with app.app_context():
+            db.session.add_all([User(username='author', password='x'), User(username='other', password='x')])
+            db.session.commit()
+            db.session.add(Post(title='title', body='body', author_id=1))
+            db.session.commit()
+            db.session.remove()
+
+        app.returning = request.param
+
+        return app
+
+    def execute(self, app, query):
+        del app.statements[:]
+
+        return app.test_client().post('/graphql', json={"query": query}).get_json()['data']
+
+    def test_update_post(self, app):
+        data = self.execute(app, 'mutation { UpdatePost (postId: 1, title: "new") { ok message post { title body } } }')
+
+        assert data['UpdatePost'] == {'ok': True, 'message': 'Post atualizado', 'post': {'title': 'new', 'body': 'body'}}
+
+        if app.returning:
+            assert len(app.statements) == 1 and 'RETURNING' in app.statements[0]
+
+        data = self.execute(app, 'mutation { UpdatePost (postId: 7, title: "new") { ok message post { title } } }')
+
+        assert data['UpdatePost'] == {'ok': False, 'message': 'Post não encontrado', 'post': None}
+
+        if app.returning:
+            assert len(app.statements) == 1
+
+    def test_create_post(self, app):
+        data = self.execute(app, 'mutation { CreatePost (title: "new", body: "b", username: "author") { ok message } }')
+
+        assert data['CreatePost'] == {'ok': True, 'message': 'Post criado'}
+
+        if app.returning:
+            assert len(app.statements) == 1 and app.statements[0].startswith('INSERT INTO posts')
+
+        data = self.execute(app, 'mutation { CreatePost (title: "new", body: "b", username: "nobody") { ok message } }')
+
+        assert data['CreatePost'] == {'ok': False, 'message': 'Usuário inválido'}
+
+        with app.app_context():
+            assert db.session.query(Post).count() == 2
+
+    def test_delete_post(self, app):
+        data = self.execute(app, 'mutation { DeletePost (postId: 1) { ok message } }')
+
+        assert data['DeletePost'] == {'ok': True, 'message': 'Post removido com sucesso.'}
+
+        if app.returning:
+            assert len(app.statements) == 1 and 'RETURNING' in app.statements[0]
+
+        data = self.execute(app, 'mutation { DeletePost (postId: 1) { ok message } }')
+
+        assert data['DeletePost'] == {'ok': False, 'message': 'Post inválido.'}
+
+    def test_delete_user_keeps_its_posts(self, app):
+        data = self.execute(app, 'mutation { DeleteUser (userId: 1) { ok message job { kind } } }')
+
+        # the testing profile runs the job inline
+        assert data['DeleteUser'] == {
+            'ok': True, 'message': 'Remoção do usuário agendada', 'job': {'kind': 'delete_user'}
+        }
+
+        data = self.execute(app, 'mutation { DeleteUser (userId: 1) { ok message job { kind } } }')
+
+        assert data['DeleteUser'] == {'ok': False, 'message': 'Falha ao remover usuário', 'job': None}
+        assert len(app.statements) == 1
+
+        with app.app_context():
+            assert db.session.query(Post.author_id).all() == [(None,)]
+
+    def test_duplicate_username_is_rejected_by_the_unique_index(self, app):
+        data = self.execute(app, 'mutation { CreateUser (username: "author", password: "y") { ok message } }')
+
+        assert data['CreateUser'] == {'ok': False, 'message': 'username já existe'}
+        assert len(app.statements) == 1 and app.statements[0].startswith('INSERT INTO users')
+
+        data = self.execute(app, 'mutation { UpdateUser (userId: 2, username: "author") { ok message } }')
+
+        assert data['UpdateUser'] == {'ok': False, 'message': 'username já existe'}
+
+        data = self.execute(app, 'mutation { UpdateUser (userId: 7, username: "new") { ok message } }')
+
+        assert data['UpdateUser'] == {'ok': False, 'message': 'Usuário não encontrado'}
+
+        with app.app_context():
+            assert [username for username, in db.session.query(User.username).order_by(User.uuid)] == ['author', 'other']
@@ -0,0 +1,263 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import partial
+from threading import Lock
+
+from graphql.backend.base import GraphQLBackend, GraphQLDocument
+from graphql.execution.middleware import MiddlewareManager
+from promise import is_thenable
+from sqlalchemy import event
+
+from cost import get_operation
+from metrics import MAX_OPERATION_NAMES, BoundedLabels
+
+# trace of the operation being parsed or executed
+current_trace = ContextVar('current_trace', default=None)
+
+# ``Type.field`` whose resolver is running, so its SQL statements are counted for it
+current_field = ContextVar('current_field', default=None)
+
+
+def nanoseconds(seconds):
+    return int(seconds * 1e9)
+
+
+class Trace(object):
+    """Timings of one operation: its phases and SQL statements, plus each
+    resolver and the SQL statements of each field when ``detailed``.
+    """
+
+    def __init__(self, detailed=False):
+        self.detailed = detailed
+        self.start_time = time.time()
+        self.start = time.perf_counter()
+        self.end = None
+        self.phases = {}
+        self.resolvers = []
+        self.sql_count = 0
+        self.sql_duration = 0.0
+        self.sql_fields = defaultdict(lambda: [0, 0.0])
+
+    def add_phase(self, name, start, end):
+        self.phases[name] = (start - self.start, end - start)
+
+    def add_statement(self, duration):
+        self.sql_count += 1
+        self.sql_duration += duration
+
+        if self.detailed:
+            field = self.sql_fields[current_field.get()]
+            field[0] += 1
+            field[1] += duration
+
+    def finish(self):
+        self.end = time.perf_counter()
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    def to_dict(self):
+        """The Apollo tracing format, plus SQL statement counts and times."""
+        tracing = {
+            'version': 1,
+            'startTime': datetime.fromtimestamp(self.start_time, timezone.utc).isoformat(),
+            'endTime': datetime.fromtimestamp(self.start_time + self.duration, timezone.utc).isoformat(),
+            'duration': nanoseconds(self.duration),
+        }
+
+        for name, (offset, duration) in self.phases.items():
+            tracing[name] = {'startOffset': nanoseconds(offset), 'duration': nanoseconds(duration)}
+
+        tracing.setdefault('execution', {})['resolvers'] = self.resolvers
+        tracing['sql'] = {
+            'count': self.sql_count,
+            'duration': nanoseconds(self.sql_duration),
+            'fields': {
+                field: {'count': count, 'duration': nanoseconds(duration)}
+                for field, (count, duration) in self.sql_fields.items() if field is not None
+            },
+        }
+
+        return tracing
+
+
+@contextmanager
+def phase(name):
+    """Times ``name`` (e.g. parsing) in the trace of the current operation."""
+    trace = current_trace.get()
+
+    if trace is None:
+        yield
+        return
+
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        trace.add_phase(name, start, time.perf_counter())
+
+
+@contextmanager
+def attributed_to(field):
+    """Counts the SQL statements run inside it for ``field``; for work that
+    runs after the resolver of ``field`` returned, like a DataLoader batch.
+    """
+    token = current_field.set(field)
+
+    try:
+        yield
+    finally:
+        current_field.reset(token)
+
+
+class TracingMiddleware(object):
+    """Records the path, type and wall time of every resolver into ``trace``,
+    up to the resolution of the promise it returns, if any.
+    """
+
+    def __init__(self, trace):
+        self.trace = trace
+
+    def resolve(self, next, root, info, **args):
+        trace = self.trace
+        field = '%s.%s' % (info.parent_type.name, info.field_name)
+        start = time.perf_counter()
+
+        with attributed_to(field):
+            result = next(root, info, **args)
+
+        def record(value):
+            trace.resolvers.append({
+                'path': list(info.path),
+                'parentType': info.parent_type.name,
+                'fieldName': info.field_name,
+                'returnType': str(info.return_type),
+                'startOffset': nanoseconds(start - trace.start),
+                'duration': nanoseconds(time.perf_counter() - start),
+            })
+
+            return value
+
+        if is_thenable(result):
+            return result.then(record)
+
+        return record(result)
+
+
+class TracingStats(object):
+    """Totals of every traced operation by operation name: how many ran, for
+    how long, and how many SQL statements they issued, in how long. Past
+    ``max_operations`` distinct names, the others are totalled as ``other``.
+    """
+
+    def __init__(self, max_operations=MAX_OPERATION_NAMES):
+        self.operations = defaultdict(lambda: defaultdict(int))
+        self.operation_names = BoundedLabels(max_operations)
+        self._lock = Lock()
+
+    def add(self, operation_name, trace):
+        name = self.operation_names(operation_name or 'anonymous')
+
+        with self._lock:
+            totals = self.operations[name]
+            totals['count'] += 1
+            totals['duration'] += trace.duration
+            totals['sql_count'] += trace.sql_count
+            totals['sql_duration'] += trace.sql_duration
+
+            for name, (offset, duration) in trace.phases.items():
+                totals[name] += duration
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(totals) for name, totals in self.operations.items()}
+
+
+class TracingBackend(GraphQLBackend):
+    """Wraps ``backend`` to trace every operation into ``stats``.
+
+    When ``detailed()`` is true, e.g. a debug header is present, every
+    resolver is timed as well and the trace is returned to the client in
+    ``extensions.tracing``; otherwise only the phases and the SQL totals
+    are measured, which costs a few clock reads per operation.
+
+    Every trace is also observed by ``metrics``, if given.
+    """
+
+    def __init__(self, backend, stats=None, detailed=None, metrics=None):
+        self.backend = backend
+        self.stats = stats if stats is not None else TracingStats()
+        self.detailed = detailed or (lambda: False)
+        self.metrics = metrics
+
+    def document_from_string(self, schema, request_string):
+        trace = Trace(detailed=bool(self.detailed()))
+        token = current_trace.set(trace)
+
+        try:
+            document = self.backend.document_from_string(schema, request_string)
+        finally:
+            current_trace.reset(token)
+
+        return GraphQLDocument(
+            schema=document.schema,
+            document_string=document.document_string,
+            document_ast=document.document_ast,
+            execute=partial(self.execute, document, trace),
+        )
+
+    def execute(self, document, trace, *args, **kwargs):
+        if trace.detailed:
+            kwargs['middleware'] = self.middleware(kwargs.get('middleware'), trace)
+
+        token = current_trace.set(trace)
+
+        try:
+            with phase('execution'):
+                result = document.execute(*args, **kwargs)
+        finally:
+            current_trace.reset(token)
+
+        trace.finish()
+
+        operation = get_operation(document.document_ast, kwargs.get('operation_name'))
+        self.stats.add(operation.name.value if operation and operation.name else None, trace)
+
+        if self.metrics is not None:
+            self.metrics.observe(operation, trace, result)
+
+        if trace.detailed:
+            result.extensions = dict(result.extensions or {}, tracing=trace.to_dict())
+
+        return result
+
+    @staticmethod
+    def middleware(middleware, trace):
+        if isinstance(middleware, MiddlewareManager):
+            middleware = middleware.middlewares
+
+        return list(middleware or []) + [TracingMiddleware(trace)]
+
+
+def track_statements(engine):
+    """Adds the count and time of the SQL statements run on ``engine`` to
+    the trace of the operation that ran them.
+    """
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_trace.get() is not None:
+            conn.info.setdefault('tracing_start', []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        trace = current_trace.get()
+
+        if trace is not None and conn.info.get('tracing_start'):
+            trace.add_statement(time.perf_counter() - conn.info['tracing_start'].pop())
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
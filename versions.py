@@ -0,0 +1,35 @@
+from sqlalchemy import DDL, event, select
+
+# bumped in the transaction of every write, by any client of the database
+VERSION_TRIGGER = '''CREATE TRIGGER IF NOT EXISTS {table}_version_{event} AFTER {operation} ON {table} BEGIN
+    INSERT INTO table_versions (name, version) VALUES ('{table}', 1)
+    ON CONFLICT (name) DO UPDATE SET version = version + 1;
+END'''
+
+OPERATIONS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def version_triggers(table_name):
+    return [
+        VERSION_TRIGGER.format(table=table_name, event=operation.lower(), operation=operation)
+        for operation in OPERATIONS
+    ]
+
+
+def track_versions(table):
+    """Creates, with ``table``, the triggers that count its writes in the
+    ``table_versions`` table.
+    """
+    for statement in version_triggers(table.name):
+        event.listen(table, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+
+
+def read_versions(session, versions):
+    """The version of every table written to so far, from the ``versions``
+    table, or None when the database does not keep them (the triggers only
+    exist on SQLite).
+    """
+    if session.get_bind().dialect.name != 'sqlite':
+        return None
+
+    return dict(session.execute(select(versions.c.name, versions.c.version)).all())
@@ -0,0 +1,246 @@
+import json
+from contextlib import contextmanager, nullcontext
+from hashlib import sha256
+
+from flask import Response, request
+from flask_graphql import GraphQLView
+from graphql_server import HttpQueryError, run_http_query
+
+from admission import Rejected
+from cost import budget
+from encoding import encode, has_large_list, iter_encode
+from loaders import shared_entities
+
+
+def rejections(execution_results):
+    return [
+        error for result in execution_results if result is not None
+        for error in result.errors or [] if isinstance(error, Rejected)
+    ]
+
+
+class GraphQLAppView(GraphQLView):
+    """The GraphQL endpoint.
+
+    With ``batch`` on, a POST may carry a list of operations. They run one
+    after another in the same request, so they share its database session
+    and DataLoaders: a row loaded by one operation is not fetched again by
+    the next. A batch holds at most ``max_batch_size`` operations, costing
+    at most ``max_batch_cost`` in total.
+
+    Responses are encoded with orjson when it is installed. Those holding a
+    list of ``stream_min_items`` items or more are streamed with chunked
+    transfer, ``stream_chunk_items`` items at a time, instead of being
+    encoded into one string first.
+
+    With ``table_versions``, a function returning the version of every table
+    (or None when they are unknown), the successful results of GET queries
+    carry an ETag made of the request and those versions, and a
+    ``Cache-Control`` of ``cache_control``. A GET whose ``If-None-Match``
+    holds the current ETag is answered 304 without executing anything.
+
+    Operations turned away by admission control (see ``AdmissionBackend``)
+    are answered 429, with the ``Retry-After`` of the longest wait.
+    """
+    persisted_queries = None
+    executor_factory = None
+    max_batch_size = None
+    max_batch_cost = None
+    stream_min_items = None
+    stream_chunk_items = 200
+    table_versions = None
+    cache_control = 'no-cache'
+
+    encode = staticmethod(encode)
+
+    def get_executor(self):
+        if self.executor_factory is not None:
+            return self.executor_factory()
+
+        return self.executor
+
+    def dispatch_request(self):
+        try:
+            request_method = request.method.lower()
+            data = self.parse_body()
+
+            show_graphiql = request_method == 'get' and self.should_display_graphiql()
+            catch = show_graphiql
+
+            pretty = self.pretty or show_graphiql or request.args.get('pretty')
+
+            etag = None if show_graphiql else self.etag(data)
+
+            if etag is not None and request.if_none_match.contains_weak(etag):
+                return self.cacheable(Response(status=304), etag)
+
+            extra_options = {}
+            executor = self.get_executor()
+            if executor:
+                extra_options['executor'] = executor
+
+            with self.batch_scope() if isinstance(data, list) else nullcontext():
+                execution_results, all_params = run_http_query(
+                    self.schema,
+                    request_method,
+                    data,
+                    query_data=request.args,
+                    batch_enabled=self.batch,
+                    catch=catch,
+                    backend=self.get_backend(),
+
+                    # Execute options
+                    root_value=self.get_root_value(),
+                    context_value=self.get_context(),
+                    middleware=self.get_middleware(),
+                    **extra_options
+                )
+            is_batch = isinstance(data, list)
+            payload, status_code = self.format_execution_results(execution_results, is_batch)
+
+            if show_graphiql:
+                return self.render_graphiql(
+                    params=all_params[0],
+                    result=self.encode(payload, pretty=pretty)
+                )
+
+            if not pretty and self.should_stream(payload, is_batch):
+                result = iter_encode(payload, self.stream_min_items, self.stream_chunk_items, batch=is_batch)
+            else:
+                result = self.encode(payload, pretty=pretty)
+
+            response = Response(
+                result,
+                status=status_code,
+                content_type='application/json'
+            )
+
+            if status_code == 429:
+                response.headers['Retry-After'] = str(max(error.retry_after for error in rejections(execution_results)))
+
+            if etag is not None and status_code == 200 and 'errors' not in payload:
+                return self.cacheable(response, etag)
+
+            return response
+
+        except HttpQueryError as e:
+            return Response(
+                self.encode({
+                    'errors': [self.format_error(e)]
+                }),
+                status=e.status_code,
+                headers=e.headers,
+                content_type='application/json'
+            )
+
+    @contextmanager
+    def batch_scope(self):
+        with budget(self.max_batch_cost), shared_entities():
+            yield
+
+    def format_execution_result(self, execution_result):
+        if execution_result is None:
+            return None, 200
+
+        response = execution_result.to_dict(format_error=self.format_error)
+
+        if execution_result.extensions:
+            response['extensions'] = execution_result.extensions
+
+        if rejections([execution_result]):
+            return response, 429
+
+        return response, 400 if execution_result.invalid else 200
+
+    def format_execution_results(self, execution_results, is_batch):
+        responses, status_codes = zip(*map(self.format_execution_result, execution_results))
+
+        return list(responses) if is_batch else responses[0], max(status_codes)
+
+    def etag(self, data):
+        """The ETag of the result of a GET query, or None if it has none.
+
+        The versions are read before the operation runs, so a write racing
+        it changes the next ETag rather than labeling the newer data with
+        the older versions.
+        """
+        if self.table_versions is None or request.method.lower() != 'get' or not isinstance(data, dict):
+            return None
+
+        versions = self.table_versions()
+
+        if versions is None:
+            return None
+
+        payload = json.dumps([dict(request.args.items(), **data), versions], sort_keys=True, default=str)
+
+        return sha256(payload.encode('utf8')).hexdigest()
+
+    def cacheable(self, response, etag):
+        # weak: the same data may be encoded differently (e.g. timings in extensions)
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = self.cache_control
+
+        return response
+
+    def should_stream(self, payload, is_batch):
+        if self.stream_min_items is None:
+            return False
+
+        return any(has_large_list(response, self.stream_min_items) for response in (payload if is_batch else [payload]))
+
+    def parse_body(self):
+        data = super(GraphQLAppView, self).parse_body()
+
+        if request.method.lower() == 'get' and 'extensions' in request.args:
+            data = dict(request.args.items(), **data)
+
+        if isinstance(data, list) and self.max_batch_size is not None and len(data) > self.max_batch_size:
+            raise HttpQueryError(400, 'O lote excede o máximo de %d operações' % self.max_batch_size)
+
+        if self.persisted_queries is None:
+            return data
+
+        if isinstance(data, list):
+            return [self.load_persisted_query(entry) for entry in data]
+
+        return self.load_persisted_query(data)
+
+    def load_persisted_query(self, data):
+        if not isinstance(data, dict):
+            return data
+
+        extensions = data.get('extensions') or {}
+
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpQueryError(400, 'Extensions are invalid JSON.')
+
+        if not isinstance(extensions, dict):
+            raise HttpQueryError(400, 'Extensions must be an object.')
+
+        persisted_query = extensions.get('persistedQuery')
+
+        if not persisted_query:
+            return data
+
+        if not isinstance(persisted_query, dict):
+            raise HttpQueryError(400, 'persistedQuery must be an object.')
+
+        sha256_hash = persisted_query.get('sha256Hash')
+        query = data.get('query')
+
+        if query:
+            if not self.persisted_queries.register(sha256_hash, query):
+                raise HttpQueryError(400, 'provided sha does not match query')
+
+            return data
+
+        query = self.persisted_queries.lookup(sha256_hash)
+
+        if query is None:
+            raise HttpQueryError(400, 'PersistedQueryNotFound')
+
+        return dict(data.items(), query=query)
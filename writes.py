@@ -0,0 +1,98 @@
+from sqlalchemy import delete, insert, inspect, literal, select, update
+from sqlalchemy.orm.attributes import QueryableAttribute
+from sqlalchemy.sql.expression import ColumnElement
+
+from database import returning_supported
+
+
+def has_returning(session, model):
+    """Tells whether the database of ``model`` runs ``RETURNING``; when it
+    does not, the helpers below read the row before writing it instead.
+    """
+    return returning_supported(session.connection(bind_arguments={'mapper': inspect(model)}).dialect)
+
+
+def primary_key(model):
+    """The mapped attribute of the (single column) primary key of ``model``."""
+    mapper = inspect(model)
+
+    return getattr(model, mapper.get_property_by_column(mapper.primary_key[0]).key)
+
+
+def returning(session, statement, model):
+    """Executes ``statement``, an ``INSERT`` or ``UPDATE`` of one row of
+    ``model``, with ``RETURNING`` the whole row, and gives back the row as
+    an instance of ``model`` (refreshed if it was already in ``session``),
+    or None when no row was written.
+    """
+    statement = select(model).from_statement(statement.returning(model))
+
+    return session.execute(statement, execution_options={'populate_existing': True}).scalars().one_or_none()
+
+
+def update_row(session, model, key, **values):
+    """Changes the row of ``model`` with primary key ``key`` with a single
+    ``UPDATE ... RETURNING``, without reading it first. Returns the updated
+    row, or None when there is no such row.
+    """
+    if not values:
+        return session.query(model).get(key)
+
+    if not has_returning(session, model):
+        instance = session.query(model).get(key)
+
+        if instance is not None:
+            for name, value in values.items():
+                setattr(instance, name, value)
+
+            session.flush()
+
+        return instance
+
+    return returning(session, update(model).where(primary_key(model) == key).values(**values), model)
+
+
+def delete_row(session, model, key):
+    """Deletes the row of ``model`` with primary key ``key`` with a single
+    ``DELETE ... RETURNING``. Returns whether there was such a row.
+    """
+    if not has_returning(session, model):
+        instance = session.query(model).get(key)
+
+        if instance is not None:
+            session.delete(instance)
+            session.flush()
+
+        return instance is not None
+
+    statement = delete(model).where(primary_key(model) == key).returning(primary_key(model))
+
+    return session.execute(statement).scalar() is not None
+
+
+def insert_where(session, model, whereclause, **values):
+    """Inserts a row of ``model`` with a single ``INSERT ... SELECT ...
+    RETURNING``: ``values`` are Python values or column expressions, e.g.
+    ``author_id=User.uuid`` with ``User.username == username`` as
+    ``whereclause``, so the author is looked up by the insert itself.
+    Returns the new row, or None when ``whereclause`` matches no row.
+    """
+    columns = [
+        value if isinstance(value, (ColumnElement, QueryableAttribute)) else literal(value)
+        for value in values.values()
+    ]
+    query = select(*columns).where(whereclause).limit(1)
+
+    if not has_returning(session, model):
+        row = session.execute(query).first()
+
+        if row is None:
+            return None
+
+        instance = model(**dict(zip(values, row)))
+        session.add(instance)
+        session.flush()
+
+        return instance
+
+    return returning(session, insert(model).from_select(list(values), query), model)